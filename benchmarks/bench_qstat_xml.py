@@ -0,0 +1,96 @@
+"""
+Benchmark of the streaming ``qstat -xml`` parser against parsing the whole
+document at once, on synthetic output for 50k jobs.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_qstat_xml [number_of_jobs]
+"""
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ElementTree
+
+from tests.src.qstat_snapshot import QstatSnapshot
+
+JOB_LIST = """    <job_list state="{category}">
+      <JB_job_number>{jobid}</JB_job_number>
+      <JAT_prio>0.50500</JAT_prio>
+      <JB_name>smk.rule_{jobid}</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>{state}</state>
+      <JAT_start_time>2020-08-06T11:02:33</JAT_start_time>
+      <cpu_usage>{cpu}</cpu_usage>
+      <queue_name>{queue}</queue_name>
+      <slots>4</slots>
+    </job_list>
+"""
+
+
+def write_qstat_xml(stream, number_of_jobs: int):
+    stream.write(b"<?xml version='1.0'?>\n<job_info>\n  <queue_info>\n")
+    for jobid in range(1, number_of_jobs + 1):
+        running = jobid % 3 != 0
+        if jobid == number_of_jobs // 3 * 2:
+            stream.write(b"  </queue_info>\n  <job_info>\n")
+        stream.write(
+            JOB_LIST.format(
+                category="running" if running else "pending",
+                jobid=jobid,
+                state="r" if running else "qw",
+                cpu=jobid % 1000,
+                queue="all.q@node{}".format(jobid % 100) if running else "",
+            ).encode()
+        )
+    stream.write(b"  </job_info>\n</job_info>\n")
+
+
+def parse_whole_document(stream):
+    """The same job and task states as the streaming parser, from the whole tree."""
+    jobs = {}
+    for job_list in ElementTree.parse(stream).getroot().iter("job_list"):
+        jobid = job_list.findtext("JB_job_number")
+        state = job_list.findtext("state") or ""
+        jobs.setdefault(jobid, state)
+        for task_id in QstatSnapshot.task_ids(job_list.findtext("tasks")):
+            task = "{jobid}.{task_id}".format(jobid=jobid, task_id=task_id)
+            jobs.setdefault(task, state)
+    return jobs
+
+
+def measure(name: str, parse, path: str, number_of_jobs: int):
+    # timed without tracemalloc, which slows down allocations unevenly
+    started = time.perf_counter()
+    with open(path, "rb") as stream:
+        jobs = parse(stream)
+    elapsed = time.perf_counter() - started
+    assert len(jobs) == number_of_jobs
+
+    tracemalloc.start()
+    with open(path, "rb") as stream:
+        parse(stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        "{name:<12} {elapsed:8.3f} s {peak:10.1f} MiB peak".format(
+            name=name, elapsed=elapsed, peak=peak / 2 ** 20
+        )
+    )
+
+
+def main(number_of_jobs: int = 50000):
+    with tempfile.NamedTemporaryFile(suffix=".xml") as output:
+        write_qstat_xml(output, number_of_jobs)
+        output.flush()
+        print(
+            "{jobs} jobs, {size:.1f} MiB of qstat -xml output".format(
+                jobs=number_of_jobs, size=output.tell() / 2 ** 20
+            )
+        )
+        measure("streaming", QstatSnapshot.parse_qstat_xml, output.name, number_of_jobs)
+        measure("whole tree", parse_whole_document, output.name, number_of_jobs)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
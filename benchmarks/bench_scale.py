@@ -0,0 +1,223 @@
+"""
+Throughput benchmark of job submission and status checks against stub
+qsub/qstat/qacct/qdel executables (see stub_scheduler.py) that simulate
+scheduler latency, failures and queue sizes.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_scale --jobs 1000 --latency 0.05
+    python -m benchmarks.bench_scale --jobs 50000 --queue-jobs 50000 \\
+        --set use_qstat_snapshot=True --workers 8
+
+Profile settings default to cookiecutter.json and can be overridden with
+--set. Status checks run in this process, so interpreter start-up of the
+status script is not included. With --set scheduler_backend=drmaa (and
+--set submission_mode=async), jobs go through an in-process fake of the
+drmaa bindings with the same latency instead of the stub executables.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest.mock import patch
+
+from tests import fake_drmaa
+from tests.src.CookieCutter import CookieCutter
+from tests.src.uge_status import StatusChecker
+from tests.src.uge_submit import Submitter
+
+REPO = Path(__file__).resolve().parent.parent
+STUB = Path(__file__).resolve().parent / "stub_scheduler.py"
+COMMANDS = ("qsub", "qstat", "qacct", "qdel")
+
+
+def rendered_settings(overrides: Dict[str, str]) -> dict:
+    settings = json.loads((REPO / "cookiecutter.json").read_text())
+    for key, value in settings.items():
+        if isinstance(value, list):
+            settings[key] = value[0]
+    settings.update(overrides)
+    return settings
+
+
+@contextmanager
+def patched_cookiecutter(settings: dict):
+    """
+    Renders CookieCutter.py with the given settings, as cookiecutter would,
+    and patches its getters into the class used by the profile modules.
+    """
+    template = REPO / "{{cookiecutter.profile_name}}" / "CookieCutter.py"
+    source = re.sub(
+        r"\{\{cookiecutter\.(\w+)\}\}",
+        lambda match: str(settings[match.group(1)]),
+        template.read_text(),
+    )
+    namespace = {}
+    exec(source, namespace)
+    rendered = namespace["CookieCutter"]
+    with ExitStack() as stack:
+        for name, getter in vars(rendered).items():
+            if name.startswith("get_"):
+                stack.enter_context(patch.object(CookieCutter, name, getter))
+        yield
+
+
+def install_stubs(workdir: Path, args) -> Path:
+    bin_dir = workdir / "bin"
+    state_dir = workdir / "stub_state"
+    bin_dir.mkdir()
+    state_dir.mkdir()
+    for command in COMMANDS:
+        (bin_dir / command).symlink_to(STUB)
+    os.environ["PATH"] = "{}:{}".format(bin_dir, os.environ["PATH"])
+    os.environ.update(
+        STUB_STATE_DIR=str(state_dir),
+        STUB_LATENCY=str(args.latency),
+        STUB_JITTER=str(args.jitter),
+        STUB_FAILURE_RATE=str(args.failure_rate),
+        STUB_QUEUE_JOBS=str(args.queue_jobs),
+    )
+    return state_dir / "calls.log"
+
+
+def subprocess_counts(calls_log: Path) -> Counter:
+    if not calls_log.exists():
+        return Counter()
+    counts = Counter(calls_log.read_text().split())
+    calls_log.unlink()
+    return counts
+
+
+def timed(operations: List[Callable], workers: int) -> List[float]:
+    def run(operation):
+        started = time.perf_counter()
+        operation()
+        return time.perf_counter() - started
+
+    if workers == 1:
+        return [run(operation) for operation in operations]
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(run, operations))
+
+
+def report(name: str, latencies: List[float], elapsed: float, counts: Counter):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        "{name:<14} {count:7d} ops {rate:10.1f} ops/s  p50 {p50:8.4f} s  "
+        "p99 {p99:8.4f} s  subprocesses {calls}".format(
+            name=name,
+            count=len(latencies),
+            rate=len(latencies) / elapsed,
+            p50=statistics.median(latencies),
+            p99=p99,
+            calls=", ".join(
+                "{}={}".format(command, counts[command])
+                for command in COMMANDS
+                if counts[command]
+            )
+            or "none",
+        )
+    )
+
+
+def write_jobscripts(workdir: Path, jobs: int) -> List[Path]:
+    jobscripts = []
+    for jobid in range(1, jobs + 1):
+        properties = {
+            "type": "single",
+            "rule": "bench",
+            "jobid": jobid,
+            "threads": 1,
+            "wildcards": {"sample": str(jobid)},
+            "resources": {"mem_mb": 1000},
+            "cluster": {},
+        }
+        jobscript = workdir / "jobscripts" / "snakejob.bench.{}.sh".format(jobid)
+        jobscript.parent.mkdir(exist_ok=True)
+        jobscript.write_text(
+            "#!/bin/sh\n# properties = {}\ntrue\n".format(json.dumps(properties))
+        )
+        jobscripts.append(jobscript)
+    return jobscripts
+
+
+def bench_submit(workdir: Path, args, calls_log: Path):
+    jobscripts = write_jobscripts(workdir, args.jobs)
+    submitters = [Submitter(str(jobscript)) for jobscript in jobscripts]
+    started = time.perf_counter()
+    latencies = timed([submitter.submit for submitter in submitters], args.workers)
+    elapsed = time.perf_counter() - started
+    report("submit", latencies, elapsed, subprocess_counts(calls_log))
+
+
+def bench_status(workdir: Path, args, calls_log: Path):
+    # the stub qsub hands out jobids counting up from 1000001
+    jobids = range(1000001, 1000001 + args.jobs)
+    outlog = str(workdir / "cluster_logs" / "bench" / "smk.bench.out")
+    statuses = Counter()
+
+    def check(jobid):
+        return lambda: statuses.update([StatusChecker(jobid, outlog).get_status()])
+
+    started = time.perf_counter()
+    latencies = timed([check(jobid) for jobid in jobids], args.workers)
+    elapsed = time.perf_counter() - started
+    report("status", latencies, elapsed, subprocess_counts(calls_log))
+    print("statuses       {}".format(dict(statuses)))
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--queue-jobs", type=int, default=100)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="override a cookiecutter.json setting",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]):
+    args = parse_args(argv)
+    overrides = dict(item.split("=", 1) for item in args.set)
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        overrides.setdefault(
+            "default_cluster_logdir", str(workdir / "cluster_logs")
+        )
+        settings = rendered_settings(overrides)
+        calls_log = install_stubs(workdir, args)
+        if settings["scheduler_backend"] == "drmaa":
+            sys.modules["drmaa"] = fake_drmaa
+            fake_drmaa.Session.latency = args.latency
+        os.chdir(str(workdir))
+        print(
+            "{jobs} jobs, {workers} worker(s), latency {latency}s, "
+            "failure rate {failure_rate}, {queue_jobs} jobs in queue".format(
+                **vars(args)
+            )
+        )
+        with patched_cookiecutter(settings):
+            bench_submit(workdir, args, calls_log)
+            bench_status(workdir, args, calls_log)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
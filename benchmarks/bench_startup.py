@@ -0,0 +1,123 @@
+"""
+Start-up cost of the profile's entry points. snakemake starts a new python
+process for every submission and status check, so the time spent importing
+the entry point is paid once per job and check.
+
+Each entry point is imported in a fresh interpreter with
+``python -X importtime`` from a copy of the profile with warm bytecode
+caches, as in an installed profile, and the median cumulative import time is
+compared against its budget. Run from the repository root, e.g.:
+
+    python -m benchmarks.bench_startup --repeat 20
+    python -m benchmarks.bench_startup --budget uge_submit=40 --top 10
+
+Exits with status 1 if an entry point is over budget or imports snakemake.
+"""
+import argparse
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Tuple
+
+TEMPLATE = Path(__file__).resolve().parent.parent / "{{cookiecutter.profile_name}}"
+# milliseconds of cumulative import time; importing snakemake alone takes
+# several times as long
+BUDGETS = {"uge_submit": 100.0, "uge_status": 100.0, "uge_submit_client": 80.0}
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_times(module: str, profile: Path) -> List[Tuple[str, float, float]]:
+    """
+    Imports the module in a new interpreter and returns (module, self ms,
+    cumulative ms) for every module imported on the way.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=str(profile),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.strip().splitlines()[-1])
+    times = []
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            times.append((name, int(self_us) / 1000, int(cumulative_us) / 1000))
+    return times
+
+
+def bench(module: str, profile: Path, repeat: int, top: int, budget: float) -> bool:
+    import_times(module, profile)  # compiles the bytecode
+    cumulative = []
+    self_times = defaultdict(list)
+    for _ in range(repeat):
+        times = import_times(module, profile)
+        for name, self_ms, cumulative_ms in times:
+            self_times[name].append(self_ms)
+            if name == module:
+                cumulative.append(cumulative_ms)
+
+    median = statistics.median(cumulative)
+    imports_snakemake = any(name.split(".")[0] == "snakemake" for name in self_times)
+    within_budget = median <= budget and not imports_snakemake
+    print(
+        "{module:<18} {median:8.1f} ms  (budget {budget:.0f} ms, {count} modules)"
+        "{snakemake}  {verdict}".format(
+            module=module,
+            median=median,
+            budget=budget,
+            count=len(self_times),
+            snakemake="  imports snakemake" if imports_snakemake else "",
+            verdict="ok" if within_budget else "OVER BUDGET",
+        )
+    )
+    slowest = sorted(
+        self_times.items(), key=lambda item: statistics.median(item[1]), reverse=True
+    )
+    for name, times in slowest[:top]:
+        print("    {time:7.2f} ms  {name}".format(time=statistics.median(times), name=name))
+    return within_budget
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--top", type=int, default=5, help="list the slowest modules by self time"
+    )
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="MODULE=MS",
+        help="override the budget of an entry point",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        module, budget = item.split("=", 1)
+        budgets[module] = float(budget)
+    with tempfile.TemporaryDirectory() as tmp:
+        profile = Path(tmp) / "profile"
+        shutil.copytree(str(TEMPLATE), str(profile))
+        results = [
+            bench(module, profile, args.repeat, args.top, budget)
+            for module, budget in budgets.items()
+        ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
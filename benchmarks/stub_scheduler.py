@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Stand-in for qsub, qstat, qacct and qdel used by the scale benchmark. The
+command is chosen by the name the script is called under; bench_scale links
+it into a bin directory that is put first on PATH.
+
+Behaviour is configured through environment variables:
+
+    STUB_STATE_DIR     directory holding the job counter and the call log
+    STUB_LATENCY       seconds every call takes (default 0)
+    STUB_JITTER        up to this many extra seconds, uniformly (default 0)
+    STUB_FAILURE_RATE  fraction of calls failing as an unreachable qmaster
+    STUB_QUEUE_JOBS    jobs listed by ``qstat -u`` (default 100)
+    STUB_FINISHED_EVERY  every n-th job is reported as finished (default 2)
+"""
+import fcntl
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+
+def setting(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+def next_jobid(state_dir: Path) -> int:
+    with (state_dir / "jobid").open("a+") as stream:
+        fcntl.flock(stream, fcntl.LOCK_EX)
+        stream.seek(0)
+        jobid = int(stream.read() or 1000000) + 1
+        stream.seek(0)
+        stream.truncate()
+        stream.write(str(jobid))
+    return jobid
+
+
+def is_finished(jobid: int) -> bool:
+    return jobid % int(setting("STUB_FINISHED_EVERY", 2)) == 0
+
+
+def qsub(args) -> int:
+    name = args[args.index("-N") + 1] if "-N" in args else "job"
+    jobid = next_jobid(Path(os.environ["STUB_STATE_DIR"]))
+    print('Your job {jobid} ("{name}") has been submitted'.format(
+        jobid=jobid, name=name.strip('"')))
+    return 0
+
+
+def qstat(args) -> int:
+    if "-j" in args:
+        jobid = int(args[args.index("-j") + 1])
+        if is_finished(jobid):
+            print("Following jobs do not exist:\n{}".format(jobid), file=sys.stderr)
+            return 1
+        print("job_number:                 {}".format(jobid))
+        print("job_state             1:    r")
+        print("usage                 1:    wallclock=00:10:00, cpu=00:09:30, "
+              "mem=1.00000 GBs, io=0.10000 GB, vmem=1.000G, maxvmem=1.000G")
+        return 0
+
+    jobs = int(setting("STUB_QUEUE_JOBS", 100))
+    if "-xml" in args:
+        print("<?xml version='1.0'?>\n<job_info>\n  <queue_info>")
+        for jobid in range(1000001, 1000001 + jobs):
+            print("    <job_list state=\"running\">\n"
+                  "      <JB_job_number>{jobid}</JB_job_number>\n"
+                  "      <JB_name>smk.rule.{jobid}</JB_name>\n"
+                  "      <state>r</state>\n"
+                  "      <JAT_start_time>2020-08-06T11:02:33</JAT_start_time>\n"
+                  "      <cpu_usage>570</cpu_usage>\n"
+                  "      <queue_name>all.q@node1</queue_name>\n"
+                  "      <slots>1</slots>\n"
+                  "    </job_list>".format(jobid=jobid))
+        print("  </queue_info>\n</job_info>")
+        return 0
+    print("job-ID  prior   name  user  state submit/start at  queue  slots\n"
+          + "-" * 80)
+    for jobid in range(1000001, 1000001 + jobs):
+        print("{} 0.50500 smk.rule user r 08/06/2020 11:02:33 all.q@node1 1"
+              .format(jobid))
+    return 0
+
+
+def qacct(args) -> int:
+    jobid = int(args[args.index("-j") + 1])
+    print("=" * 62)
+    print("jobnumber    {}".format(jobid))
+    print("failed       0")
+    print("exit_status  0")
+    return 0
+
+
+def qdel(args) -> int:
+    print("user has deleted job {}".format(args[-1]))
+    return 0
+
+
+COMMANDS = {"qsub": qsub, "qstat": qstat, "qacct": qacct, "qdel": qdel}
+
+
+def main() -> int:
+    command = Path(sys.argv[0]).name
+    state_dir = Path(os.environ["STUB_STATE_DIR"])
+    with (state_dir / "calls.log").open("a") as log:
+        log.write(command + "\n")
+
+    time.sleep(setting("STUB_LATENCY", 0) + random.uniform(0, setting("STUB_JITTER", 0)))
+    if random.random() < setting("STUB_FAILURE_RATE", 0):
+        print("error: commlib error: got select error (Connection refused)",
+              file=sys.stderr)
+        return 1
+    return COMMANDS[command](sys.argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+In-process stand-in for the ``drmaa`` python bindings, so the DRMAA backend
+can be tested and benchmarked without a cluster. Jobs are kept in
+``Session.jobs`` and stay queued until their state is changed with
+``set_state``; ``Session.latency`` adds a delay to every library call.
+"""
+import itertools
+import threading
+import time
+
+
+class DrmaaException(Exception):
+    pass
+
+
+class InvalidJobException(DrmaaException):
+    pass
+
+
+class DeniedByDrmException(DrmaaException):
+    pass
+
+
+class NoActiveSessionException(DrmaaException):
+    pass
+
+
+class JobState:
+    UNDETERMINED = "undetermined"
+    QUEUED_ACTIVE = "queued_active"
+    SYSTEM_ON_HOLD = "system_on_hold"
+    USER_ON_HOLD = "user_on_hold"
+    USER_SYSTEM_ON_HOLD = "user_system_on_hold"
+    RUNNING = "running"
+    SYSTEM_SUSPENDED = "system_suspended"
+    USER_SUSPENDED = "user_suspended"
+    USER_SYSTEM_SUSPENDED = "user_system_suspended"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobControlAction:
+    SUSPEND = "suspend"
+    RESUME = "resume"
+    HOLD = "hold"
+    RELEASE = "release"
+    TERMINATE = "terminate"
+
+
+class JobTemplate:
+    def __init__(self):
+        self.remoteCommand = None
+        self.args = []
+        self.workingDirectory = None
+        self.nativeSpecification = ""
+        self.jobName = None
+
+
+class Session:
+    jobs = {}  # jobid -> dict(template attributes, state)
+    latency = 0.0
+    # message of the DeniedByDrmException raised by runJob, if set
+    deny_submission = None
+    _ids = itertools.count(1000001)
+    _lock = threading.Lock()
+
+    def __init__(self, contactString=None):
+        self._active = False
+
+    def initialize(self, contactString=None):
+        self._active = True
+
+    def exit(self):
+        self._check_active()
+        self._active = False
+
+    def createJobTemplate(self) -> JobTemplate:
+        self._check_active()
+        return JobTemplate()
+
+    def deleteJobTemplate(self, jobTemplate: JobTemplate):
+        self._check_active()
+
+    def runJob(self, jobTemplate: JobTemplate) -> str:
+        self._call()
+        if self.deny_submission is not None:
+            raise DeniedByDrmException(self.deny_submission)
+        with self._lock:
+            jobid = str(next(self._ids))
+            self.jobs[jobid] = dict(
+                vars(jobTemplate), state=JobState.QUEUED_ACTIVE
+            )
+        return jobid
+
+    def jobStatus(self, jobId: str) -> str:
+        self._call()
+        job = self.jobs.get(jobId)
+        if job is None:
+            raise InvalidJobException("job {} does not exist".format(jobId))
+        return job["state"]
+
+    def control(self, jobId: str, operation: str):
+        self._call()
+        job = self.jobs.get(jobId)
+        if job is None:
+            raise InvalidJobException("job {} does not exist".format(jobId))
+        if operation == JobControlAction.TERMINATE:
+            job["state"] = JobState.FAILED
+
+    def _check_active(self):
+        if not self._active:
+            raise NoActiveSessionException("no active session")
+
+    def _call(self):
+        self._check_active()
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def set_state(jobid: str, state: str):
+    Session.jobs[jobid]["state"] = state
+
+
+def reset():
+    Session.jobs.clear()
+    Session.latency = 0.0
+    Session.deny_submission = None
@@ -0,0 +1,168 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer
+from tests.src.CookieCutter import CookieCutter
+from tests.src.accounting import AccountingIndex, AccountingError
+from tests.src.uge_status import StatusChecker
+
+
+def accounting_line(
+    job_number, exit_status=0, failed=0, task_number=0, maxvmem=1073741824.0
+):
+    fields = [
+        "all.q", "node1", "group", "user", "smk.search.0", str(job_number),
+        "sge", "0", "1596700000", "1596700010", "1596700070", str(failed),
+        str(exit_status), "60.0",
+    ]
+    fields += ["0"] * 20  # ru_utime ... granted_pe
+    fields += ["1", str(task_number), "42.5", "1.0", "0.1", "-U users", "0.0",
+               "NONE", str(maxvmem), "0", "0"]
+    return ":".join(fields) + "\n"
+
+
+class TestParseLine(unittest.TestCase):
+    def test_parse_line_extracts_fields(self):
+        record = AccountingIndex.parse_line(accounting_line(123, exit_status=2))
+
+        self.assertEqual(record.job_number, 123)
+        self.assertEqual(record.exit_status, 2)
+        self.assertEqual(record.failed, 0)
+        self.assertEqual(record.wallclock, 60.0)
+        self.assertEqual(record.cpu, 42.5)
+        self.assertEqual(record.maxvmem, 1073741824.0)
+
+    def test_comment_is_skipped(self):
+        self.assertIsNone(AccountingIndex.parse_line("# Version: 8.6.4\n"))
+
+    def test_short_line_is_skipped(self):
+        self.assertIsNone(AccountingIndex.parse_line("all.q:node1:group\n"))
+
+
+class TestAccountingIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.accounting = self.directory / "accounting"
+        self.accounting.write_text("# Version: 8.6.4\n" + accounting_line(1))
+        self.index = AccountingIndex(self.accounting, self.directory)
+
+    def test_lookup_finds_job(self):
+        self.assertEqual(self.index.lookup(1).exit_status, 0)
+
+    def test_lookup_missing_job_raises_AccountingError(self):
+        self.assertRaises(AccountingError, self.index.lookup, 2)
+
+    def test_missing_accounting_file_raises_AccountingError(self):
+        index = AccountingIndex(self.directory / "missing", self.directory)
+        self.assertRaises(AccountingError, index.lookup, 1)
+
+    def test_locked_index_raises_AccountingError(self):
+        self.index.lookup(1)
+        with patch.object(
+            AccountingIndex,
+            "_connect",
+            side_effect=sqlite3.OperationalError("database is locked"),
+        ):
+            self.assertRaises(AccountingError, self.index.lookup, 1)
+            self.assertRaises(AccountingError, self.index.update)
+
+    def test_only_appended_lines_are_parsed(self):
+        self.index.lookup(1)
+        with self.accounting.open("a") as stream:
+            stream.write(accounting_line(2, exit_status=1))
+
+        with patch.object(
+            AccountingIndex, "parse_line", wraps=AccountingIndex.parse_line
+        ) as parse_mock:
+            self.assertEqual(self.index.lookup(2).exit_status, 1)
+            self.assertEqual(parse_mock.call_count, 1)
+
+    def test_incomplete_last_line_is_parsed_once_complete(self):
+        line = accounting_line(2)
+        with self.accounting.open("a") as stream:
+            stream.write(line[:20])
+        self.assertRaises(AccountingError, self.index.lookup, 2)
+
+        with self.accounting.open("a") as stream:
+            stream.write(line[20:])
+        self.assertEqual(self.index.lookup(2).job_number, 2)
+
+    def test_latest_record_of_rerun_job_wins(self):
+        with self.accounting.open("a") as stream:
+            stream.write(accounting_line(1, exit_status=137))
+        self.assertEqual(self.index.lookup(1).exit_status, 137)
+
+    def test_array_tasks_are_indexed_by_task(self):
+        with self.accounting.open("a") as stream:
+            stream.write(accounting_line(3, exit_status=0, task_number=1))
+            stream.write(accounting_line(3, exit_status=1, task_number=2))
+        self.assertEqual(self.index.lookup(3, 1).exit_status, 0)
+        self.assertEqual(self.index.lookup(3, 2).exit_status, 1)
+
+    def test_rotated_file_is_reindexed_from_start(self):
+        self.index.lookup(1)
+        self.accounting.unlink()
+        self.accounting.write_text(accounting_line(4))
+        self.assertEqual(self.index.lookup(4).job_number, 4)
+
+    def test_fresh_index_starts_within_backlog(self):
+        with patch.object(AccountingIndex, "INITIAL_BACKLOG", 10):
+            with self.accounting.open("a") as stream:
+                stream.write(accounting_line(5))
+            self.assertRaises(AccountingError, self.index.lookup, 1)
+            with self.accounting.open("a") as stream:
+                stream.write(accounting_line(6))
+            self.assertEqual(self.index.lookup(6).job_number, 6)
+
+
+class TestStatusCheckerWithAccountingIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        accounting = self.directory / "default" / "common" / "accounting"
+        accounting.parent.mkdir(parents=True)
+        accounting.write_text(accounting_line(123) + accounting_line(124, 1))
+        for patcher in [
+            patch.dict("os.environ", {"SGE_ROOT": str(self.directory)}),
+            patch.object(CookieCutter, "get_log_dir", return_value=self.directory),
+            patch.object(CookieCutter, "get_use_accounting_index", return_value=True),
+            patch.object(CookieCutter, "get_max_qstat_checks", return_value=1),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch.object(
+        OSLayer,
+        "run_process",
+        return_value=(1, "", "Following jobs do not exist: 123"),
+    )
+    def test_finished_job_is_answered_from_index(self, run_process_mock):
+        actual = StatusChecker(123, "test").get_status()
+        self.assertEqual(actual, "success")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
+
+    @patch.object(
+        OSLayer,
+        "run_process",
+        return_value=(1, "", "Following jobs do not exist: 124"),
+    )
+    def test_failed_job_is_answered_from_index(self, run_process_mock):
+        actual = StatusChecker(124, "test").get_status()
+        self.assertEqual(actual, "failed")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "124"])
+
+    @patch.object(OSLayer, "run_process")
+    def test_job_missing_from_index_falls_back_to_qacct(self, run_process_mock):
+        run_process_mock.side_effect = [
+            (1, "", "Following jobs do not exist: 125"),
+            (0, "exit_status 0\nfailed 0", ""),
+        ]
+        actual = StatusChecker(125, "test").get_status()
+        self.assertEqual(actual, "success")
+        self.assertEqual(run_process_mock.call_args[0][0], ["qacct", "-j", "125"])
+
+
+if __name__ == "__main__":
+    unittest.main()
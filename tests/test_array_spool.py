@@ -0,0 +1,171 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer
+from tests.src.array_spool import (
+    SpooledJob,
+    SpoolError,
+    SubmitSpool,
+    close_overdue_arrays,
+    flush_when_due,
+    read_state,
+    spool_lock,
+    write_state,
+)
+
+
+def array_submit_cmd(tasks, array_jobscript):
+    return ["qsub", "-h", "-t", "1-{tasks}".format(tasks=tasks), str(array_jobscript)]
+
+
+def submitted(output="Your job-array 123.1-4:1 (\"smk.a\") has been submitted"):
+    return (0, output, "")
+
+
+@patch.object(SubmitSpool, "_start_flusher")
+class TestSubmitSpool(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    def job(self, name):
+        return SpooledJob(
+            "/jobs/{}.sh".format(name),
+            "/logs/{}.out".format(name),
+            "/logs/{}.err".format(name),
+        )
+
+    def spool(self, **kwargs):
+        return SubmitSpool(self.directory, "-l h_vmem=1G", **kwargs)
+
+    @patch.object(OSLayer, "run_process", return_value=submitted())
+    def test_serial_submissions_do_not_wait_for_the_window(
+        self, run_process_mock, start_flusher_mock
+    ):
+        spool = self.spool(window=60, max_tasks=4)
+        jobids = []
+        for name in ("first", "second", "third"):
+            started = time.monotonic()
+            jobids.append(spool.submit(self.job(name), array_submit_cmd))
+            self.assertLess(time.monotonic() - started, 1)
+
+        self.assertEqual(jobids, ["123.1", "123.2", "123.3"])
+        cmd = run_process_mock.call_args[0][0]
+        self.assertEqual(cmd[:4], ["qsub", "-h", "-t", "1-4"])
+        run_process_mock.assert_called_once()
+        start_flusher_mock.assert_called_once_with("123")
+        tasks = Path(cmd[-1]).with_suffix(".tasks").read_text()
+        self.assertEqual(
+            tasks.splitlines(),
+            [
+                "/jobs/first.sh\t/logs/first.out\t/logs/first.err",
+                "/jobs/second.sh\t/logs/second.out\t/logs/second.err",
+                "/jobs/third.sh\t/logs/third.out\t/logs/third.err",
+            ],
+        )
+
+    @patch.object(OSLayer, "run_process", return_value=submitted())
+    def test_taken_tasks_are_released_after_the_window(self, run_process_mock, *mocks):
+        spool = self.spool(window=0.1, max_tasks=4)
+        spool.submit(self.job("first"), array_submit_cmd)
+        spool.submit(self.job("second"), array_submit_cmd)
+        flush_when_due(spool.directory, "123")
+        self.assertEqual(
+            [call[0][0] for call in run_process_mock.call_args_list[1:]],
+            [["qrls", "-h", "u", "123.1-2"], ["qdel", "123.3-4"]],
+        )
+        self.assertIsNone(read_state(spool.directory))
+
+    @patch.object(OSLayer, "run_process", return_value=submitted())
+    def test_full_array_is_released_at_once(self, run_process_mock, *mocks):
+        spool = self.spool(window=60, max_tasks=2)
+        spool.submit(self.job("first"), array_submit_cmd)
+        spool.submit(self.job("second"), array_submit_cmd)
+        run_process_mock.assert_called_with(["qrls", "-h", "u", "123.1-2"])
+        self.assertIsNone(read_state(spool.directory))
+
+    @patch.object(OSLayer, "run_process")
+    def test_next_submission_releases_an_expired_array(self, run_process_mock, *mocks):
+        run_process_mock.return_value = submitted()
+        spool = self.spool(window=0, max_tasks=4)
+        spool.submit(self.job("first"), array_submit_cmd)
+        run_process_mock.return_value = submitted(
+            "Your job-array 124.1-4:1 (\"smk.a\") has been submitted"
+        )
+        self.assertEqual(spool.submit(self.job("second"), array_submit_cmd), "124.1")
+        self.assertEqual(
+            run_process_mock.call_args_list[1][0][0], ["qrls", "-h", "u", "123.1-1"]
+        )
+
+    @patch.object(OSLayer, "run_process")
+    def test_task_of_a_failed_submission_is_not_run(self, run_process_mock, *mocks):
+        run_process_mock.side_effect = [submitted(), (1, "", "qmaster down")]
+        spool = self.spool(window=60, max_tasks=2)
+        spool.submit(self.job("first"), array_submit_cmd)
+        with self.assertRaises(SpoolError):
+            spool.submit(self.job("second"), array_submit_cmd)
+        state = read_state(spool.directory)
+        self.assertEqual(state["tasks"], 1)
+        self.assertEqual(len(Path(state["task_list"]).read_text().splitlines()), 1)
+
+        run_process_mock.side_effect = None
+        run_process_mock.return_value = (0, "", "")
+        self.assertEqual(spool.submit(self.job("third"), array_submit_cmd), "123.2")
+        self.assertEqual(
+            Path(state["task_list"]).read_text().splitlines()[1],
+            "/jobs/third.sh\t/logs/third.out\t/logs/third.err",
+        )
+
+    @patch("tests.src.array_spool.time.sleep")
+    @patch.object(OSLayer, "run_process")
+    def test_flusher_keeps_trying(self, run_process_mock, *mocks):
+        run_process_mock.return_value = submitted()
+        spool = self.spool(window=0, max_tasks=4)
+        spool.submit(self.job("first"), array_submit_cmd)
+        run_process_mock.side_effect = [(1, "", "qmaster down")] * 10 + [(0, "", "")] * 2
+        flush_when_due(spool.directory, "123")
+        self.assertIsNone(read_state(spool.directory))
+
+    @patch.object(OSLayer, "run_process")
+    def test_submissions_close_overdue_arrays_of_other_groups(
+        self, run_process_mock, *mocks
+    ):
+        run_process_mock.return_value = submitted()
+        first = SubmitSpool(self.directory, "-l h_vmem=1G", window=0, max_tasks=4)
+        first.submit(self.job("first"), array_submit_cmd)
+        run_process_mock.return_value = submitted(
+            "Your job-array 124.1-4:1 (\"smk.a\") has been submitted"
+        )
+        second = SubmitSpool(self.directory, "-l h_vmem=2G", window=60, max_tasks=4)
+        second.submit(self.job("second"), array_submit_cmd)
+        self.assertIsNone(read_state(first.directory))
+        self.assertEqual(
+            run_process_mock.call_args_list[1][0][0], ["qrls", "-h", "u", "123.1-1"]
+        )
+
+    def test_locked_groups_are_left_alone(self, *mocks):
+        spool = self.spool(window=0, max_tasks=4)
+        spool.directory.mkdir(parents=True)
+        state = dict(jobid="123", task_list="", tasks=1, max_tasks=4, closes=0)
+        write_state(spool.directory, state)
+        with spool_lock(spool.directory):
+            close_overdue_arrays(self.directory)
+        self.assertEqual(read_state(spool.directory), state)
+
+    @patch.object(OSLayer, "run_process", return_value=(1, "", "denied"))
+    def test_failing_qsub_raises_SpoolError(self, *mocks):
+        spool = self.spool(window=0, max_tasks=1000)
+        with self.assertRaises(SpoolError) as context:
+            spool.submit(self.job("only"), array_submit_cmd)
+        self.assertIn("denied", str(context.exception))
+
+    def test_groups_have_separate_spools(self, *mocks):
+        first = SubmitSpool(self.directory, "-l h_vmem=1G", window=0, max_tasks=1)
+        second = SubmitSpool(self.directory, "-l h_vmem=2G", window=0, max_tasks=1)
+        self.assertNotEqual(first.directory, second.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.src.job_dependencies import DependencyError, JobidMap, parent_jobs_variable
+from tests.src.uge_submit import split_arguments
+
+
+class TestSplitArguments(unittest.TestCase):
+    def test_without_dependencies(self):
+        self.assertEqual(split_arguments(["-P", "p"]), (["-P", "p"], None))
+
+    def test_dependencies_follow_the_qsub_parameters(self):
+        self.assertEqual(
+            split_arguments(["-P", "p", "--dependencies", "12", "logs/a.out"]),
+            (["-P", "p"], ["12", "logs/a.out"]),
+        )
+
+    def test_job_without_parents(self):
+        self.assertEqual(split_arguments(["--dependencies"]), ([], []))
+
+
+class TestJobidMap(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = Path(tempfile.mkdtemp())
+        self.jobid_map = JobidMap(self.log_dir)
+
+    def test_parents_are_read_from_the_arguments(self):
+        parents = self.jobid_map.parents(["12", "logs/a.out", "13.2", "logs/b.out"])
+        self.assertEqual(parents, [("12", "logs/a.out"), ("13.2", "logs/b.out")])
+        self.assertEqual(
+            parent_jobs_variable(parents),
+            "UGE_PARENT_JOBS=12=logs/a.out:13.2=logs/b.out",
+        )
+
+    def test_recorded_jobs_are_looked_up(self):
+        self.jobid_map.record("12", "/logs/a.out", [])
+        self.assertEqual(self.jobid_map.parents(["12"]), [("12", "/logs/a.out")])
+
+    def test_array_tasks_are_held_on_by_job_number(self):
+        parents = [("13.1", "a.out"), ("13.2", "b.out"), ("12", "c.out")]
+        self.assertEqual(self.jobid_map.hold_jids(parents), ["13", "12"])
+
+    def test_jobs_off_the_cluster_cannot_be_held_on(self):
+        with self.assertRaises(DependencyError):
+            self.jobid_map.parents(["local:17a-ff", "logs/a.out"])
+        with self.assertRaises(DependencyError):
+            self.jobid_map.record("pilot:17a-1-ff", "logs/a.out", [])
+
+
+if __name__ == "__main__":
+    unittest.main()
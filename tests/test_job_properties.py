@@ -0,0 +1,46 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.src.job_properties import JobPropertiesError, read_job_properties
+
+
+def jobscript_with(text: str) -> Path:
+    with tempfile.NamedTemporaryFile("w", suffix=".sh", delete=False) as stream:
+        stream.write(text)
+    return Path(stream.name)
+
+
+class TestReadJobProperties(unittest.TestCase):
+    def test_properties_are_read_from_jobscript(self):
+        properties = read_job_properties(Path(__file__).parent / "real_jobscript.sh")
+        self.assertEqual(properties["rule"], "search_fasta_on_index")
+        self.assertEqual(properties["threads"], 4)
+
+    def test_properties_line_after_shebang(self):
+        jobscript = jobscript_with(
+            '#!/bin/sh\n# properties = {"rule": "a", "resources": {"mem_mb": 1}}\n'
+            "echo '# properties = {}'\n"
+        )
+        self.assertEqual(
+            read_job_properties(jobscript), {"rule": "a", "resources": {"mem_mb": 1}}
+        )
+
+    def test_missing_properties_raise(self):
+        jobscript = jobscript_with("#!/bin/sh\necho hello\n")
+        with self.assertRaises(JobPropertiesError):
+            read_job_properties(jobscript)
+
+    def test_properties_beyond_header_are_ignored(self):
+        jobscript = jobscript_with('#!/bin/sh\n' + "true\n" * 100 + '# properties = {}\n')
+        with self.assertRaises(JobPropertiesError):
+            read_job_properties(jobscript)
+
+    def test_invalid_properties_raise(self):
+        jobscript = jobscript_with('#!/bin/sh\n# properties = {"rule": \n')
+        with self.assertRaises(JobPropertiesError):
+            read_job_properties(jobscript)
+
+
+if __name__ == "__main__":
+    unittest.main()
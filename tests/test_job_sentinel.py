@@ -0,0 +1,103 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer
+from tests.src.CookieCutter import CookieCutter
+from tests.src.job_sentinel import JobSentinel
+from tests.src.uge_status import StatusChecker
+
+SENTINEL = (
+    "state={state}\njob_id={jobid}\ntask_id=undefined\nhost=node1\n"
+    "started=1596700010\nfinished=1596700070\nexit_status={exit_status}\n"
+)
+
+
+class TestJobSentinel(unittest.TestCase):
+    def setUp(self):
+        self.logdir = Path(tempfile.mkdtemp())
+        self.outlog = self.logdir / "smk.search.0.out"
+
+    def write(self, state="finished", jobid=123, exit_status=0):
+        (self.logdir / "smk.search.0.status").write_text(
+            SENTINEL.format(state=state, jobid=jobid, exit_status=exit_status)
+        )
+
+    def test_path_replaces_out_suffix(self):
+        self.assertEqual(
+            JobSentinel(self.outlog).path, self.logdir / "smk.search.0.status"
+        )
+
+    def test_path_without_out_suffix_appends_status(self):
+        self.assertEqual(
+            JobSentinel("logs/job.log").path, Path("logs/job.log.status")
+        )
+
+    def test_parse_returns_key_values(self):
+        actual = JobSentinel.parse("state=finished\nexit_status=1\nbroken\n")
+        self.assertEqual(actual, {"state": "finished", "exit_status": "1"})
+
+    def test_missing_sentinel_has_no_exit_status(self):
+        self.assertIsNone(JobSentinel(self.outlog).exit_status(123))
+
+    def test_finished_sentinel_returns_exit_status(self):
+        self.write(exit_status=2)
+        self.assertEqual(JobSentinel(self.outlog).exit_status(123), 2)
+
+    def test_started_sentinel_has_no_exit_status(self):
+        self.write(state="started", exit_status="")
+        self.assertIsNone(JobSentinel(self.outlog).exit_status(123))
+
+    def test_task_of_array_job_returns_its_exit_status(self):
+        (self.logdir / "smk.search.0.status").write_text(
+            SENTINEL.replace("task_id=undefined", "task_id=4").format(
+                state="finished", jobid=123, exit_status=1
+            )
+        )
+        self.assertEqual(JobSentinel(self.outlog).exit_status("123.4"), 1)
+        self.assertIsNone(JobSentinel(self.outlog).exit_status("123.5"))
+
+    def test_sentinel_of_other_job_is_ignored(self):
+        self.write(jobid=122)
+        self.assertIsNone(JobSentinel(self.outlog).exit_status(123))
+
+
+class TestStatusCheckerWithSentinel(unittest.TestCase):
+    def setUp(self):
+        self.logdir = Path(tempfile.mkdtemp())
+        self.outlog = str(self.logdir / "smk.search.0.out")
+
+    @patch.object(OSLayer, "run_process")
+    def test_finished_job_never_queries_scheduler(self, run_process_mock):
+        (self.logdir / "smk.search.0.status").write_text(
+            SENTINEL.format(state="finished", jobid=123, exit_status=0)
+        )
+        actual = StatusChecker(123, self.outlog).get_status()
+        self.assertEqual(actual, "success")
+        run_process_mock.assert_not_called()
+
+    @patch.object(OSLayer, "run_process")
+    def test_failed_job_never_queries_scheduler(self, run_process_mock):
+        (self.logdir / "smk.search.0.status").write_text(
+            SENTINEL.format(state="finished", jobid=123, exit_status=1)
+        )
+        actual = StatusChecker(123, self.outlog).get_status()
+        self.assertEqual(actual, "failed")
+        run_process_mock.assert_not_called()
+
+    @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
+    @patch.object(
+        OSLayer, "run_process", return_value=(0, "job_state    1: r", "")
+    )
+    def test_started_job_queries_scheduler(self, run_process_mock, *othermocks):
+        (self.logdir / "smk.search.0.status").write_text(
+            SENTINEL.format(state="started", jobid=123, exit_status="")
+        )
+        actual = StatusChecker(123, self.outlog).get_status()
+        self.assertEqual(actual, "running")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.CookieCutter import CookieCutter
+from tests.src.job_sentinel import JobSentinel
+from tests.src.local_lane import JOBID_PREFIX, LocalLane, local_lane_directory
+from tests.src.uge_status import StatusChecker, parse_jobid
+
+
+class TestLocalLane(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = Path(tempfile.mkdtemp())
+        self.lane = LocalLane(local_lane_directory(self.log_dir))
+        log_dir_patch = patch.object(
+            CookieCutter, "get_log_dir", return_value=str(self.log_dir)
+        )
+        log_dir_patch.start()
+        self.addCleanup(log_dir_patch.stop)
+
+    def start(self, script: str, name: str = "job", max_jobs: int = 2):
+        jobscript = self.log_dir / "{name}.sh".format(name=name)
+        jobscript.write_text(script)
+        outlog = self.log_dir / "{name}.out".format(name=name)
+        errlog = self.log_dir / "{name}.err".format(name=name)
+        return self.lane.start(jobscript, outlog, errlog, max_jobs), outlog
+
+    def wait_for(self, jobid: str, outlog: Path) -> str:
+        checker = StatusChecker(jobid, str(outlog))
+        for _ in range(100):
+            status = checker.get_status()
+            if status != StatusChecker.RUNNING:
+                return status
+            time.sleep(0.05)
+        self.fail("local job {jobid} did not finish".format(jobid=jobid))
+
+    def test_job_leaves_logs_and_sentinel(self):
+        jobid, outlog = self.start("echo out; echo err >&2; exit 3\n")
+        self.assertTrue(jobid.startswith(JOBID_PREFIX))
+        self.assertEqual(parse_jobid(jobid), jobid)
+        self.assertEqual(self.wait_for(jobid, outlog), StatusChecker.FAILED)
+        self.assertEqual(outlog.read_text(), "out\nEXIT_STATUS: 3\n")
+        self.assertEqual(outlog.with_suffix(".err").read_text(), "err\n")
+        self.assertEqual(JobSentinel(outlog).exit_status(jobid), 3)
+
+    def test_successful_job(self):
+        jobid, outlog = self.start("true\n")
+        self.assertEqual(self.wait_for(jobid, outlog), StatusChecker.SUCCESS)
+
+    def test_lane_is_bounded(self):
+        jobid, outlog = self.start("sleep 30\n", max_jobs=1)
+        self.assertIsNone(self.start("true\n", name="other", max_jobs=1)[0])
+        self.assertEqual(StatusChecker(jobid, str(outlog)).get_status(), "running")
+        self.assertTrue(self.lane.cancel(jobid[len(JOBID_PREFIX):]))
+        self.assertEqual(self.wait_for(jobid, outlog), StatusChecker.FAILED)
+        self.assertIsNotNone(self.start("true\n", name="other", max_jobs=1)[0])
+
+    def test_job_without_runner_has_failed(self):
+        self.assertFalse(self.lane.is_running("0-0"))
+        checker = StatusChecker(JOBID_PREFIX + "0-0", str(self.log_dir / "job.out"))
+        self.assertEqual(checker.get_status(), StatusChecker.FAILED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.log_layout import ShardedLogLayout, sweep
+
+
+class TestShardedLogLayout(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = Path(tempfile.mkdtemp())
+        self.layout = ShardedLogLayout(self.log_dir, shard_width=2)
+
+    def test_shards(self):
+        shards = self.layout.shards()
+        self.assertEqual(len(shards), 256)
+        self.assertEqual(shards[:2], ["00", "01"])
+        self.assertIn(self.layout.shard("smk.search.0"), shards)
+
+    def test_run_id_is_the_same_for_jobscripts_of_a_run(self):
+        self.assertEqual(
+            self.layout.run_id("/work/.snakemake/tmp.a/snakejob.a.1.sh"),
+            self.layout.run_id("/work/.snakemake/tmp.a/snakejob.b.2.sh"),
+        )
+        self.assertNotEqual(
+            self.layout.run_id("/work/.snakemake/tmp.a/snakejob.a.1.sh"),
+            self.layout.run_id("/work/.snakemake/tmp.b/snakejob.a.1.sh"),
+        )
+
+    def test_first_job_of_a_rule_creates_all_shards(self):
+        directory = self.layout.directory("search", "smk.search.0")
+        self.layout.prepare(directory)
+        self.assertEqual(len(list((self.log_dir / "search").iterdir())), 256)
+
+    def test_prepared_directories_are_remembered(self):
+        directory = self.layout.directory("search", "smk.search.1")
+        self.layout.prepare(directory)
+        with patch("tests.src.log_layout.os.mkdir") as mkdir_mock:
+            self.layout.prepare(directory)
+        mkdir_mock.assert_not_called()
+
+    @patch("tests.src.log_layout.subprocess.Popen")
+    def test_sweep_is_started_once_per_run(self, popen_mock):
+        run_directory = Path(tempfile.mkdtemp())
+        self.layout.start_sweep(run_directory / "snakejob.a.1.sh")
+        self.layout.start_sweep(run_directory / "snakejob.a.2.sh")
+        popen_mock.assert_called_once()
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.shard = Path(tempfile.mkdtemp()) / "search" / "0a"
+        self.shard.mkdir(parents=True)
+
+    def touch(self, name: str, mtime: float) -> Path:
+        path = self.shard / name
+        path.write_text("")
+        os.utime(str(path), (mtime, mtime))
+        return path
+
+    def test_earlier_runs_of_a_job_are_removed(self):
+        old = [
+            self.touch("smk.search.0.r00000001.out", 100),
+            self.touch("smk.search.0.r00000001.err", 100),
+            self.touch("smk.search.0.r00000001.status", 100),
+        ]
+        new = [
+            self.touch("smk.search.0.r00000002.out", 200),
+            self.touch("smk.search.0.r00000002.err", 200),
+        ]
+
+        self.assertEqual(sweep(self.shard.parent.parent), 2)
+
+        self.assertFalse(any(path.exists() for path in old))
+        self.assertTrue(all(path.exists() for path in new))
+
+    def test_logs_of_other_jobs_and_other_files_are_kept(self):
+        kept = [
+            self.touch("smk.search.0.r00000001.out", 100),
+            self.touch("smk.search.1.r00000002.out", 200),
+            self.touch("notes.txt", 100),
+        ]
+
+        self.assertEqual(sweep(self.shard.parent.parent), 2)
+
+        self.assertTrue(all(path.exists() for path in kept))
+
+
+if __name__ == "__main__":
+    unittest.main()
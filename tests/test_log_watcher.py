@@ -0,0 +1,113 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.src.log_watcher import (
+    InotifyWatcher,
+    PollingWatcher,
+    WatcherError,
+    create_watcher,
+    filesystem_type,
+)
+from tests.src.uge_status_server import StatusServer
+
+FINISHED = (
+    "state=finished\njob_id={jobid}\nhost=node1\nstarted=1\nfinished=2\n"
+    "exit_status=0\n"
+)
+
+
+def write_sentinel(path: Path, content: str):
+    tmp_path = path.with_name(path.name + ".tmp.1")
+    tmp_path.write_text(content)
+    os.replace(str(tmp_path), str(path))
+
+
+class TestFilesystemType(unittest.TestCase):
+    def test_longest_mount_point_wins(self):
+        mounts = Path(tempfile.mkdtemp()) / "mounts"
+        mounts.write_text(
+            "rootfs / ext4 rw 0 0\n"
+            "server:/home /home nfs4 rw 0 0\n"
+        )
+        self.assertEqual(filesystem_type("/home/user", str(mounts)), "nfs4")
+        self.assertEqual(filesystem_type("/homework", str(mounts)), "ext4")
+
+
+class TestPollingWatcher(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        (self.root / "rule").mkdir()
+
+    def test_new_and_changed_sentinels_are_reported(self):
+        watcher = PollingWatcher(self.root, poll_interval=0)
+        sentinel = self.root / "rule" / "smk.rule.0.status"
+        write_sentinel(sentinel, "state=started\n")
+        self.assertEqual(watcher.wait_for_changes(0), [str(sentinel.resolve())])
+
+        self.assertEqual(watcher.wait_for_changes(0), [])
+        write_sentinel(sentinel, FINISHED.format(jobid=1))
+        self.assertEqual(watcher.wait_for_changes(0), [str(sentinel.resolve())])
+
+    def test_logs_are_ignored(self):
+        watcher = PollingWatcher(self.root, poll_interval=0)
+        (self.root / "rule" / "smk.rule.0.out").write_text("output")
+        self.assertEqual(watcher.wait_for_changes(0), [])
+
+
+class TestInotifyWatcher(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        try:
+            self.watcher = InotifyWatcher(self.root)
+        except (WatcherError, OSError) as error:
+            self.skipTest("inotify unavailable: {}".format(error))
+        self.addCleanup(self.watcher.close)
+
+    def test_renamed_sentinel_is_reported(self):
+        sentinel = self.root / "smk.rule.0.status"
+        write_sentinel(sentinel, "state=started\n")
+        self.assertEqual(self.watcher.wait_for_changes(1), [str(sentinel)])
+
+    def test_sentinels_in_new_directories_are_reported(self):
+        (self.root / "rule").mkdir()
+        self.assertEqual(self.watcher.wait_for_changes(1), [])
+        sentinel = self.root / "rule" / "smk.rule.0.status"
+        write_sentinel(sentinel, "state=started\n")
+        self.assertEqual(self.watcher.wait_for_changes(1), [str(sentinel)])
+
+
+class TestCreateWatcher(unittest.TestCase):
+    def test_creates_missing_log_dir(self):
+        root = Path(tempfile.mkdtemp()) / "cluster_logs"
+        watcher = create_watcher(root, poll_interval=1)
+        self.addCleanup(watcher.close)
+        self.assertTrue(root.is_dir())
+
+
+class TestStatusServerWithWatcher(unittest.TestCase):
+    def test_changed_sentinel_updates_tracked_job(self):
+        root = Path(tempfile.mkdtemp())
+        server = StatusServer(
+            root / "server.sock",
+            poll_interval=0.01,
+            idle_timeout=1,
+            user="user",
+            watcher=PollingWatcher(root, poll_interval=0),
+        )
+        outlog = root / "smk.rule.0.out"
+
+        async def scenario():
+            before = await server.status(123, str(outlog))
+            sentinel = root / "smk.rule.0.status"
+            write_sentinel(sentinel, FINISHED.format(jobid=123))
+            server.sentinels_changed([str(sentinel.resolve())])
+            return before, await server.status(123, str(outlog))
+
+        self.assertEqual(asyncio.run(scenario()), ("running", "success"))
+
+
+if __name__ == "__main__":
+    unittest.main()
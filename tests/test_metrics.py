@@ -0,0 +1,95 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from tests.src.OSLayer import OSLayer
+from tests.src.metrics import SchedulerMetrics, command_kind
+
+
+class TestCommandKind(unittest.TestCase):
+    def test_scheduler_commands_are_recognised(self):
+        self.assertEqual(command_kind("qstat -j 123"), "qstat")
+        self.assertEqual(command_kind("/opt/uge/bin/qsub -cwd job.sh"), "qsub")
+        self.assertEqual(command_kind(["qacct", "-j", "123"]), "qacct")
+
+    def test_other_commands(self):
+        self.assertEqual(command_kind("tail -n 1 log"), "other")
+        self.assertEqual(command_kind(""), "other")
+        self.assertEqual(command_kind([]), "other")
+
+
+class TestSchedulerMetrics(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    def test_flush_merges_counts_of_several_processes(self):
+        first = SchedulerMetrics(self.directory)
+        first.record_call("qstat -j 1", 0, 0.2)
+        first.record_retry("qstat -j 1")
+        first.flush()
+        second = SchedulerMetrics(self.directory)
+        second.record_call("qstat -j 2", 0, 3.0)
+        second.record_call("qstat -j 3", 1, 0.01)
+        second.flush()
+
+        state = json.loads(second.state_path.read_text())
+        self.assertEqual(state["calls"], {"qstat": {"0": 2, "1": 1}})
+        self.assertEqual(state["latency"]["qstat"]["count"], 3)
+        self.assertEqual(state["latency"]["qstat"]["buckets"][0], 1)
+        self.assertEqual(state["latency"]["qstat"]["buckets"][3], 2)
+        self.assertEqual(state["retries"], {"qstat": 1})
+
+    def test_flush_writes_textfile(self):
+        metrics = SchedulerMetrics(self.directory)
+        metrics.record_call("qacct -j 1", 0, 0.3)
+        metrics.flush()
+
+        textfile = metrics.textfile_path.read_text().splitlines()
+        workflow = str(self.directory.resolve())
+        self.assertIn(
+            'snakemake_uge_scheduler_calls_total{workflow="%s",command="qacct",'
+            'returncode="0"} 1' % workflow,
+            textfile,
+        )
+        self.assertIn(
+            'snakemake_uge_scheduler_call_duration_seconds_bucket{workflow="%s",'
+            'command="qacct",le="+Inf"} 1' % workflow,
+            textfile,
+        )
+        self.assertIn(
+            "# TYPE snakemake_uge_scheduler_call_duration_seconds histogram",
+            textfile,
+        )
+
+    def test_flush_without_calls_writes_nothing(self):
+        metrics = SchedulerMetrics(self.directory)
+        metrics.flush()
+        self.assertFalse(metrics.textfile_path.exists())
+
+    def test_flush_resets_counts(self):
+        metrics = SchedulerMetrics(self.directory)
+        metrics.record_call("qdel 1", 0, 0.1)
+        metrics.flush()
+        metrics.flush()
+        state = json.loads(metrics.state_path.read_text())
+        self.assertEqual(state["calls"], {"qdel": {"0": 1}})
+
+
+class TestOSLayerMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = SchedulerMetrics(Path(tempfile.mkdtemp()))
+        OSLayer.metrics = self.metrics
+        self.addCleanup(setattr, OSLayer, "metrics", None)
+
+    def test_run_process_is_recorded(self):
+        OSLayer.run_process("exit 3")
+        with OSLayer.stream_process("true") as stream:
+            stream.read()
+        self.metrics.flush()
+        state = json.loads(self.metrics.state_path.read_text())
+        self.assertEqual(state["calls"], {"other": {"0": 1, "3": 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()
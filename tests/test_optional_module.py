@@ -0,0 +1,11 @@
+import sys
+import unittest
+
+from tests.src.optional_module import optional_module
+
+
+class TestOptionalModule(unittest.TestCase):
+    def test_imports_the_module_of_the_profile(self):
+        module = optional_module("pilot")
+        self.assertIs(module, sys.modules["tests.src.pilot"])
+        self.assertEqual(module.JOBID_PREFIX, "pilot:")
@@ -0,0 +1,167 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.pilot import HEARTBEAT_TIMEOUT, PilotQueue, Worker
+
+
+class TestPilotQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.queue = PilotQueue(self.tmpdir / ".pilot")
+
+    def enqueue(self) -> str:
+        return self.queue.enqueue(
+            self.tmpdir / "job.sh", self.tmpdir / "job.out", self.tmpdir / "job.err"
+        )
+
+    def test_tasks_are_claimed_in_order_once(self):
+        first = self.enqueue()
+        second = self.enqueue()
+        self.assertEqual(self.queue.claim(), first)
+        self.assertEqual(self.queue.claim(), second)
+        self.assertIsNone(self.queue.claim())
+
+    def add_worker(self, worker_id: str = "1"):
+        self.queue.ensure_workers(1, lambda: worker_id)
+
+    def test_task_states(self):
+        task_id = self.enqueue()
+        self.add_worker()
+        self.assertEqual(self.queue.status(task_id), "running")
+        self.queue.claim()
+        self.assertEqual(self.queue.status(task_id), "running")
+        self.assertEqual(self.queue.task(task_id)["outlog"], str(self.tmpdir / "job.out"))
+        self.queue.finish(task_id, 0)
+        self.assertEqual(self.queue.status(task_id), "success")
+
+    def test_failed_task(self):
+        task_id = self.enqueue()
+        self.queue.claim()
+        self.queue.finish(task_id, 3)
+        self.assertEqual(self.queue.status(task_id), "failed")
+
+    def test_task_without_heartbeat_has_failed(self):
+        task_id = self.enqueue()
+        self.queue.claim()
+        stale = time.time() - HEARTBEAT_TIMEOUT - 1
+        os.utime(str(self.queue.path(PilotQueue.RUNNING, task_id)), (stale, stale))
+        self.assertEqual(self.queue.status(task_id), "failed")
+
+    def test_unknown_task_has_failed(self):
+        self.assertEqual(self.queue.status("missing"), "failed")
+
+    def test_queued_task_without_workers_has_failed(self):
+        task_id = self.enqueue()
+        self.assertEqual(self.queue.status(task_id), "failed")
+        self.assertIsNone(self.queue.claim())
+
+    def test_tasks_that_end_after_the_deadline_are_left(self):
+        long = self.queue.enqueue("long.sh", "long.out", "long.err", runtime=3600)
+        short = self.queue.enqueue("short.sh", "short.out", "short.err", runtime=60)
+        unknown = self.enqueue()
+        deadline = time.time() + 600
+        self.assertEqual(self.queue.queued(deadline), [short, unknown])
+        self.assertEqual(self.queue.claim(deadline), short)
+        self.assertEqual(self.queue.claim(), long)
+
+    def test_queued_tasks_can_be_cancelled(self):
+        task_id = self.enqueue()
+        self.assertTrue(self.queue.cancel(task_id))
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual(self.queue.status(task_id), "failed")
+        self.assertFalse(self.queue.cancel(task_id))
+
+    def test_workers_are_submitted_up_to_the_pool_size(self):
+        self.enqueue()
+        worker_ids = iter(["1", "2", "3"])
+        self.queue.ensure_workers(2, lambda: next(worker_ids))
+        self.queue.ensure_workers(2, lambda: next(worker_ids))
+        self.assertEqual(self.queue.live_workers(), 2)
+
+    def test_worker_is_added_if_no_worker_can_run_the_task(self):
+        self.queue.enqueue("long.sh", "long.out", "long.err", runtime=3600)
+        self.queue.register_worker("1", PilotQueue.RUNNING, time.time() + 600)
+        worker_ids = iter(["2", "3"])
+        self.queue.ensure_workers(1, lambda: next(worker_ids), runtime=3600)
+        self.assertEqual(self.queue.live_workers(), 2)
+        self.assertEqual(self.queue.live_workers(runtime=3600), 1)
+        self.queue.ensure_workers(1, lambda: next(worker_ids), runtime=3600)
+        self.assertEqual(self.queue.live_workers(), 2)
+
+    def test_queued_task_waits_for_a_worker_that_can_run_it(self):
+        task_id = self.queue.enqueue("long.sh", "long.out", "long.err", runtime=3600)
+        self.queue.register_worker("1", PilotQueue.RUNNING, time.time() + 600)
+        self.assertEqual(self.queue.status(task_id), "failed")
+        task_id = self.queue.enqueue("long.sh", "long.out", "long.err", runtime=3600)
+        self.queue.register_worker("2", PilotQueue.QUEUED)
+        self.assertEqual(self.queue.status(task_id), "running")
+
+    def test_dead_workers_are_replaced(self):
+        self.enqueue()
+        self.queue.ensure_workers(1, lambda: "1")
+        self.queue.register_worker("1", PilotQueue.RUNNING)
+        worker = self.queue.path(PilotQueue.WORKERS, "1")
+        stale = time.time() - HEARTBEAT_TIMEOUT - 1
+        os.utime(str(worker), (stale, stale))
+        self.queue.ensure_workers(1, lambda: "2")
+        self.assertFalse(worker.exists())
+        self.assertEqual(self.queue.live_workers(), 1)
+
+
+class TestWorker(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = Path(tempfile.mkdtemp())
+        self.queue = PilotQueue(self.tmpdir / ".pilot")
+
+    def enqueue(self, script: str) -> str:
+        jobscript = Path(tempfile.mkstemp(dir=str(self.tmpdir), suffix=".sh")[1])
+        jobscript.write_text(script)
+        return self.queue.enqueue(
+            jobscript, self.tmpdir / "job.out", self.tmpdir / "job.err"
+        )
+
+    def test_tasks_are_run_until_the_worker_is_idle(self):
+        succeeding = self.enqueue("echo out; echo err >&2\n")
+        failing = self.enqueue("exit 2\n")
+        worker = Worker(self.queue, "1", idle_timeout=0)
+        worker.run()
+        self.assertEqual(self.queue.status(succeeding), "success")
+        self.assertEqual(self.queue.status(failing), "failed")
+        self.assertEqual((self.tmpdir / "job.out").read_text(), "out\n")
+        self.assertEqual((self.tmpdir / "job.err").read_text(), "err\n")
+        self.assertFalse(worker.worker_path.exists())
+
+    def test_tasks_run_in_the_submission_directory(self):
+        workdir = self.tmpdir / "workdir"
+        workdir.mkdir()
+        with patch("tests.src.pilot.os.getcwd", return_value=str(workdir)):
+            self.enqueue("pwd > pwd.txt\n")
+        Worker(self.queue, "1", idle_timeout=0).run()
+        self.assertTrue((workdir / "pwd.txt").exists())
+
+    def test_worker_stays_for_tasks_enqueued_while_retiring(self):
+        worker = Worker(self.queue, "1", idle_timeout=0)
+        self.enqueue("true\n")
+        self.queue.path(PilotQueue.WORKERS).mkdir(parents=True, exist_ok=True)
+        self.assertFalse(worker._retire())
+        self.assertTrue(worker.worker_path.exists())
+
+    def test_worker_retires_if_no_task_ends_before_its_deadline(self):
+        worker = Worker(self.queue, "1", idle_timeout=0, deadline=time.time() + 60)
+        self.queue.enqueue(self.tmpdir / "job.sh", "job.out", "job.err", runtime=3600)
+        worker.run()
+        self.assertEqual(len(self.queue.queued()), 1)
+
+    @patch("tests.src.pilot.subprocess.run", side_effect=OSError("no bash"))
+    def test_task_that_cannot_be_started_fails(self, run_mock):
+        task_id = self.enqueue("true\n")
+        Worker(self.queue, "1", idle_timeout=0).run()
+        self.assertEqual(self.queue.status(task_id), "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,244 @@
+import io
+import json
+import tempfile
+import time
+import unittest
+from contextlib import nullcontext
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer, ProcessStreamError
+from tests.src.CookieCutter import CookieCutter
+from tests.src.qstat_snapshot import QstatSnapshot, SnapshotError
+from tests.src.uge_status import StatusChecker
+
+QSTAT_XML = b"""<?xml version='1.0'?>
+<job_info  xmlns:xsd="http://arc.liv.ac.uk/repos/darcs/sge/source/dist/util/resources/schemas/qstat/qstat.xsd">
+  <queue_info>
+    <job_list state="running">
+      <JB_job_number>8697223</JB_job_number>
+      <JAT_prio>0.50500</JAT_prio>
+      <JB_name>smk.search</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>r</state>
+      <JAT_start_time>2020-08-06T11:02:33</JAT_start_time>
+      <queue_name>all.q@node1</queue_name>
+      <slots>4</slots>
+    </job_list>
+    <job_list state="running">
+      <JB_job_number>8697225</JB_job_number>
+      <JAT_prio>0.50500</JAT_prio>
+      <JB_name>smk.array</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>r</state>
+      <JAT_start_time>2020-08-06T11:02:35</JAT_start_time>
+      <queue_name>all.q@node2</queue_name>
+      <slots>1</slots>
+      <tasks>1</tasks>
+    </job_list>
+  </queue_info>
+  <job_info>
+    <job_list state="pending">
+      <JB_job_number>8697224</JB_job_number>
+      <JAT_prio>0.50500</JAT_prio>
+      <JB_name>smk.search</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>qw</state>
+      <JB_submission_time>2020-08-06T11:02:34</JB_submission_time>
+      <queue_name></queue_name>
+      <slots>1</slots>
+    </job_list>
+    <job_list state="pending">
+      <JB_job_number>8697225</JB_job_number>
+      <JAT_prio>0.50500</JAT_prio>
+      <JB_name>smk.array</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>qw</state>
+      <JB_submission_time>2020-08-06T11:02:35</JB_submission_time>
+      <queue_name></queue_name>
+      <slots>1</slots>
+      <tasks>2-4:1</tasks>
+    </job_list>
+  </job_info>
+</job_info>
+"""
+
+QSTAT_EXT_XML = b"""<?xml version='1.0'?>
+<job_info>
+  <queue_info>
+    <job_list state="running">
+      <JB_job_number>8697223</JB_job_number>
+      <state>r</state>
+      <JAT_start_time>2020-08-06T11:02:33</JAT_start_time>
+      <cpu_usage>30</cpu_usage>
+    </job_list>
+    <job_list state="running">
+      <JB_job_number>8697225</JB_job_number>
+      <state>r</state>
+      <JAT_start_time>2020-08-06T11:02:33</JAT_start_time>
+      <cpu_usage>12</cpu_usage>
+      <tasks>3</tasks>
+    </job_list>
+  </queue_info>
+  <job_info>
+    <job_list state="pending">
+      <JB_job_number>8697224</JB_job_number>
+      <state>qw</state>
+    </job_list>
+  </job_info>
+</job_info>
+"""
+
+EMPTY_QSTAT_XML = b"""<?xml version='1.0'?>
+<job_info>
+  <queue_info>
+  </queue_info>
+  <job_info>
+  </job_info>
+</job_info>
+"""
+
+
+def stream_of(output: bytes):
+    return lambda cmd: nullcontext(io.BytesIO(output))
+
+
+class TestParseQstatXml(unittest.TestCase):
+    def test_parse_returns_state_per_job(self):
+        actual = QstatSnapshot.parse_qstat_xml(io.BytesIO(QSTAT_XML))
+        expected = {
+            "8697223": "r",
+            "8697224": "qw",
+            "8697225": "r",
+            "8697225.1": "r",
+            "8697225.2": "qw",
+            "8697225.3": "qw",
+            "8697225.4": "qw",
+        }
+        self.assertEqual(actual, expected)
+
+    def test_task_ids_are_expanded(self):
+        self.assertEqual(list(QstatSnapshot.task_ids("4")), [4])
+        self.assertEqual(list(QstatSnapshot.task_ids("2-10:4")), [2, 6, 10])
+        self.assertEqual(list(QstatSnapshot.task_ids("1,3-4:1")), [1, 3, 4])
+        self.assertEqual(list(QstatSnapshot.task_ids(None)), [])
+
+    @patch("tests.src.qstat_snapshot.start_timestamp")
+    def test_start_times_are_only_read_for_usage(self, start_timestamp_mock):
+        jobs, usage = QstatSnapshot.parse_qstat_xml_with_usage(
+            io.BytesIO(QSTAT_EXT_XML), with_usage=False
+        )
+        self.assertEqual(usage, {})
+        self.assertIn("8697223", jobs)
+        start_timestamp_mock.assert_not_called()
+
+    def test_parse_empty_output_returns_no_jobs(self):
+        actual = QstatSnapshot.parse_qstat_xml(io.BytesIO(EMPTY_QSTAT_XML))
+        self.assertEqual(actual, {})
+
+
+class TestQstatSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_job_state_refreshes_once_within_ttl(self, stream_process_mock):
+        snapshot = QstatSnapshot(self.directory, ttl=60, user="user")
+        self.assertEqual(snapshot.job_state(8697223), "r")
+        self.assertEqual(snapshot.job_state(8697224), "qw")
+        stream_process_mock.assert_called_once_with(["qstat", "-xml", "-u", "user"])
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_snapshot_is_shared_between_instances(self, stream_process_mock):
+        QstatSnapshot(self.directory, ttl=60, user="user").job_state(8697223)
+        QstatSnapshot(self.directory, ttl=60, user="user").job_state(8697224)
+        stream_process_mock.assert_called_once_with(["qstat", "-xml", "-u", "user"])
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_stale_snapshot_is_refreshed(self, stream_process_mock):
+        stale = {"timestamp": time.time() - 120, "max_jobid": 1, "jobs": {}}
+        (self.directory / QstatSnapshot.SNAPSHOT_NAME).write_text(
+            json.dumps(stale)
+        )
+        snapshot = QstatSnapshot(self.directory, ttl=60, user="user")
+        self.assertEqual(snapshot.job_state(8697223), "r")
+        stream_process_mock.assert_called_once_with(["qstat", "-xml", "-u", "user"])
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_job_missing_from_snapshot_is_finished(self, *mocks):
+        snapshot = QstatSnapshot(self.directory, ttl=60, user="user")
+        self.assertEqual(snapshot.job_state(8697000), QstatSnapshot.FINISHED)
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_finished_task_of_array_job_is_finished(self, *mocks):
+        snapshot = QstatSnapshot(self.directory, ttl=60, user="user")
+        self.assertEqual(snapshot.job_state("8697225.3"), "qw")
+        self.assertEqual(snapshot.job_state("8697225.5"), QstatSnapshot.FINISHED)
+        self.assertIsNone(snapshot.job_state("8697300.1"))
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_job_newer_than_snapshot_is_unknown(self, *mocks):
+        snapshot = QstatSnapshot(self.directory, ttl=60, user="user")
+        self.assertIsNone(snapshot.job_state(8697300))
+
+    @patch.object(
+        OSLayer, "stream_process", side_effect=stream_of(QSTAT_EXT_XML)
+    )
+    def test_usage_snapshot_runs_qstat_ext(self, stream_process_mock):
+        snapshot = QstatSnapshot(
+            self.directory, ttl=60, user="user", with_usage=True
+        )
+        cpu, wallclock = snapshot.job_usage(8697223)
+        self.assertEqual(cpu, 30.0)
+        self.assertGreater(wallclock, 3600)
+        self.assertIsNone(snapshot.job_usage(8697224))
+        self.assertEqual(snapshot.job_usage("8697225.3")[0], 12.0)
+        self.assertIsNone(snapshot.job_usage("8697225.4"))
+        stream_process_mock.assert_called_once_with(["qstat", "-xml", "-ext", "-u", "user"])
+
+    @patch.object(
+        OSLayer, "stream_process", side_effect=ProcessStreamError("denied")
+    )
+    def test_failing_qstat_raises_SnapshotError(self, *mocks):
+        snapshot = QstatSnapshot(self.directory, ttl=60, user="user")
+        self.assertRaises(SnapshotError, snapshot.job_state, 8697223)
+
+
+class TestStatusCheckerWithSnapshot(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(
+            CookieCutter, "get_log_dir", return_value=tempfile.mkdtemp()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch.object(CookieCutter, "get_use_qstat_snapshot", return_value=True)
+    @patch.object(CookieCutter, "get_qstat_snapshot_ttl", return_value=60)
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    @patch.object(OSLayer, "run_process")
+    def test_running_job_is_answered_from_snapshot(
+        self, run_process_mock, stream_process_mock, *othermocks
+    ):
+        actual = StatusChecker(8697224, "test").get_status()
+        self.assertEqual(actual, "running")
+        self.assertEqual(stream_process_mock.call_count, 1)
+        self.assertEqual(stream_process_mock.call_args[0][0][:3], ["qstat", "-xml", "-u"])
+        run_process_mock.assert_not_called()
+
+    @patch.object(CookieCutter, "get_use_qstat_snapshot", return_value=True)
+    @patch.object(CookieCutter, "get_qstat_snapshot_ttl", return_value=60)
+    @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    @patch.object(
+        OSLayer, "run_process", return_value=(0, "exit_status 0\nfailed 0", "")
+    )
+    def test_finished_job_skips_qstat_and_uses_qacct(
+        self, run_process_mock, *othermocks
+    ):
+        actual = StatusChecker(8697000, "test").get_status()
+        self.assertEqual(actual, "success")
+        run_process_mock.assert_called_once_with(["qacct", "-j", "8697000"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import io
+import unittest
+import xml.etree.ElementTree as ElementTree
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer, ProcessStreamError
+from tests.src.qstat_xml import JobRecord, iter_job_records
+
+QSTAT_XML = b"""<?xml version='1.0'?>
+<job_info>
+  <queue_info>
+    <job_list state="running">
+      <JB_job_number>8697223</JB_job_number>
+      <JAT_prio>0.50500</JAT_prio>
+      <JB_name>smk.search</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>r</state>
+      <JAT_start_time>2020-08-06T11:02:33</JAT_start_time>
+      <cpu_usage>12.5</cpu_usage>
+      <queue_name>all.q@node1</queue_name>
+      <slots>4</slots>
+    </job_list>
+  </queue_info>
+  <job_info>
+    <job_list state="pending">
+      <JB_job_number>8697225</JB_job_number>
+      <JAT_prio>0.50500</JAT_prio>
+      <JB_name>smk.array</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>qw</state>
+      <queue_name></queue_name>
+      <slots>1</slots>
+      <tasks>2-4:1</tasks>
+    </job_list>
+  </job_info>
+</job_info>
+"""
+
+
+class TestIterJobRecords(unittest.TestCase):
+    def test_yields_one_record_per_job_list(self):
+        actual = list(iter_job_records(io.BytesIO(QSTAT_XML)))
+        expected = [
+            JobRecord(
+                jobid=8697223,
+                name="smk.search",
+                owner="user",
+                state="r",
+                queue="all.q@node1",
+                slots=4,
+                tasks=None,
+                start_time="2020-08-06T11:02:33",
+                cpu=12.5,
+            ),
+            JobRecord(
+                jobid=8697225,
+                name="smk.array",
+                owner="user",
+                state="qw",
+                queue=None,
+                slots=1,
+                tasks="2-4:1",
+                start_time=None,
+                cpu=None,
+            ),
+        ]
+        self.assertEqual(actual, expected)
+
+    def test_finished_job_lists_are_taken_off_the_tree(self):
+        parents = []
+        original_iterparse = ElementTree.iterparse
+
+        def iterparse(stream, events=None):
+            for event, element in original_iterparse(stream, events):
+                if event == "start" and element.tag in ("queue_info", "job_info"):
+                    parents.append(element)
+                yield event, element
+
+        with patch.object(ElementTree, "iterparse", side_effect=iterparse):
+            list(iter_job_records(io.BytesIO(QSTAT_XML)))
+        self.assertEqual([len(parent.findall("job_list")) for parent in parents], [0, 0, 0])
+
+
+class TestStreamProcess(unittest.TestCase):
+    def test_yields_stdout(self):
+        with OSLayer.stream_process("printf 'a\\nb\\n'") as stream:
+            self.assertEqual(stream.read(), b"a\nb\n")
+
+    def test_failing_command_raises_ProcessStreamError(self):
+        with self.assertRaises(ProcessStreamError) as context:
+            with OSLayer.stream_process("echo denied >&2; exit 2") as stream:
+                stream.read()
+        self.assertIn("denied", str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import multiprocessing
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer
+from tests.src.rate_limit import RateLimiter
+
+
+def take_tokens(path, count):
+    limiter = RateLimiter(path, {"qstat": 1})
+    for _ in range(count):
+        limiter.reserve("qstat")
+    limiter.close()
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()) / "buckets"
+        self.now = 1000.0
+        time_patch = patch(
+            "tests.src.rate_limit.time.time", side_effect=lambda: self.now
+        )
+        time_patch.start()
+        self.addCleanup(time_patch.stop)
+
+    def limiter(self, **rates) -> RateLimiter:
+        limiter = RateLimiter(self.path, rates)
+        self.addCleanup(limiter.close)
+        return limiter
+
+    def test_burst_is_let_through(self):
+        limiter = self.limiter(qsub=3)
+        self.assertEqual([limiter.reserve("qsub") for _ in range(3)], [0, 0, 0])
+
+    def test_callers_wait_in_turn_once_the_bucket_is_empty(self):
+        limiter = self.limiter(qacct=2)
+        delays = [limiter.reserve("qacct") for _ in range(4)]
+        self.assertEqual(delays, [0, 0, 0.5, 1.0])
+
+    def test_bucket_refills(self):
+        limiter = self.limiter(qstat=1)
+        limiter.reserve("qstat")
+        self.now += 1
+        self.assertEqual(limiter.reserve("qstat"), 0)
+
+    def test_commands_have_separate_buckets(self):
+        limiter = self.limiter(qsub=1, qstat=1)
+        limiter.reserve("qsub")
+        self.assertEqual(limiter.reserve("qstat"), 0)
+        self.assertGreater(limiter.reserve("qsub"), 0)
+
+    def test_buckets_are_shared_through_the_file(self):
+        self.limiter(qdel=1).reserve("qdel")
+        self.assertEqual(self.limiter(qdel=1).reserve("qdel"), 1.0)
+
+    def test_unlimited_commands(self):
+        limiter = self.limiter(qsub=0)
+        self.assertEqual(limiter.reserve("qsub"), 0)
+        self.assertEqual(limiter.reserve("qsub"), 0)
+        self.assertEqual(limiter.reserve("other"), 0)
+
+    @patch("tests.src.rate_limit.time.sleep")
+    def test_acquire_sleeps_until_the_token_is_due(self, sleep_mock):
+        limiter = self.limiter(qstat=1)
+        limiter.acquire(["qstat", "-j", "1"])
+        sleep_mock.assert_not_called()
+        limiter.acquire(["qstat", "-j", "2"])
+        sleep_mock.assert_called_once_with(1.0)
+
+    @patch("tests.src.rate_limit.time.sleep")
+    def test_unusable_file_does_not_block(self, sleep_mock):
+        limiter = RateLimiter(self.path / "missing" / "buckets", {"qsub": 1})
+        limiter.acquire(["qsub", "job.sh"])
+        limiter.acquire(["qsub", "job.sh"])
+        sleep_mock.assert_not_called()
+
+    @patch.object(OSLayer, "rate_limiter")
+    def test_run_process_waits_for_a_token(self, rate_limiter_mock):
+        OSLayer.run_process(["true"])
+        rate_limiter_mock.acquire.assert_called_once_with(["true"])
+
+
+class TestRateLimiterAcrossProcesses(unittest.TestCase):
+    def test_no_tokens_are_lost(self):
+        path = Path(tempfile.mkdtemp()) / "buckets"
+        processes = [
+            multiprocessing.Process(target=take_tokens, args=(path, 25))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        limiter = RateLimiter(path, {"qstat": 1})
+        # the 101st call of one per second is due in about 100 seconds
+        self.assertGreater(limiter.reserve("qstat"), 95)
+        limiter.close()
@@ -0,0 +1,127 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from unittest.mock import patch
+
+from tests.src.resource_history import (
+    ResourceHistory,
+    ResourceUsage,
+    input_size_bucket,
+    percentile,
+    retry_key,
+)
+
+
+class TestPercentile(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile(values, 0), 1)
+
+    def test_single_value(self):
+        self.assertEqual(percentile([7.0], 50), 7.0)
+
+
+class TestInputSizeBucket(unittest.TestCase):
+    def test_missing_inputs_count_as_empty(self):
+        self.assertEqual(input_size_bucket(["/does/not/exist"]), 0)
+
+    def test_buckets_span_a_factor_of_two(self):
+        path = Path(tempfile.mkdtemp()) / "input"
+        with path.open("wb") as stream:
+            stream.truncate(3 * 2 ** 20)
+        self.assertEqual(input_size_bucket([str(path)]), 2)
+        self.assertEqual(input_size_bucket([str(path), str(path)]), 3)
+
+
+class TestResourceHistory(unittest.TestCase):
+    def setUp(self):
+        self.history = ResourceHistory(tempfile.mkdtemp())
+
+    def add_jobs(self, rule, input_bucket, usages, first_jobid=1):
+        for jobid, usage in enumerate(usages, start=first_jobid):
+            self.history.record_submission(jobid, rule, input_bucket)
+            self.history.record_usage(jobid, usage)
+
+    def test_usage_of_unregistered_jobs_is_ignored(self):
+        self.history.record_usage(1, ResourceUsage(100, 10, 10))
+        self.assertIsNone(self.history.estimate_memory("a", 0, 95, 0, 1))
+
+    def test_jobs_are_registered_until_their_usage_is_recorded(self):
+        self.history.record_submission("12.3", "a", 0)
+        self.assertTrue(self.history.is_registered("12.3"))
+        self.history.record_usage("12.3", ResourceUsage(100, 10, 10))
+        self.assertFalse(self.history.is_registered("12.3"))
+
+    def test_estimate_is_percentile_plus_headroom(self):
+        self.add_jobs(
+            "a", 0, [ResourceUsage(mem, mem / 50, 1.0) for mem in range(100, 1100, 100)]
+        )
+        self.assertEqual(self.history.estimate_memory("a", 0, 90, 0.5, 5), 1350)
+
+    def test_too_few_samples(self):
+        self.add_jobs("a", 0, [ResourceUsage(100, 1, 1)] * 4)
+        self.assertIsNone(self.history.estimate_memory("a", 0, 95, 0.2, 5))
+
+    def test_same_input_size_is_preferred(self):
+        self.add_jobs("a", 1, [ResourceUsage(100, 1, 1)] * 5)
+        self.add_jobs("a", 5, [ResourceUsage(1000, 1, 1)] * 5, first_jobid=10)
+        self.assertEqual(self.history.estimate_memory("a", 5, 95, 0, 5), 1000)
+        # not enough jobs of this size, all jobs of the rule are used
+        self.assertEqual(self.history.estimate_memory("a", 3, 95, 0, 5), 1000)
+        self.assertEqual(self.history.estimate_memory("a", 3, 50, 0, 5), 100)
+
+    def test_runtime_estimate_in_minutes(self):
+        self.add_jobs(
+            "a", 0, [ResourceUsage(100, 1, wallclock) for wallclock in (60, 600)]
+        )
+        self.assertEqual(self.history.estimate_runtime("a", 0, 100, 0.5, 2), 15)
+        self.assertEqual(self.history.estimate_runtime("a", 0, 50, 0, 2), 1)
+        self.assertIsNone(self.history.estimate_runtime("a", 0, 50, 0, 3))
+
+    @patch.object(ResourceHistory, "MAX_SAMPLES", 3)
+    def test_only_the_most_recent_samples_of_a_rule_are_kept(self):
+        self.add_jobs("a", 0, [ResourceUsage(mem, 1, 1) for mem in (900, 100, 200, 300)])
+        self.add_jobs("b", 0, [ResourceUsage(500, 1, 1)], first_jobid=10)
+        self.assertEqual(self.history.estimate_memory("a", 0, 100, 0, 3), 300)
+        self.assertIsNone(self.history.estimate_memory("a", 0, 100, 0, 4))
+        self.assertEqual(self.history.estimate_memory("b", 0, 100, 0, 1), 500)
+
+    def test_job_killed_for_its_memory_raises_the_estimate(self):
+        self.add_jobs("a", 0, [ResourceUsage(100, 1, 60)] * 5)
+        self.history.record_submission(10, "a", 0, "k", mem_mb=120)
+        self.history.record_failure(10, ResourceUsage(119, 1, 5))
+        self.assertEqual(self.history.estimate_memory("a", 0, 95, 0.5, 5), 180)
+        # its wallclock is not what the job needs
+        self.assertEqual(self.history.estimate_runtime("a", 0, 0, 0, 5), 1)
+
+    def test_other_failures_leave_the_estimate(self):
+        self.add_jobs("a", 0, [ResourceUsage(100, 1, 1)] * 5)
+        self.history.record_submission(10, "a", 0, "k", mem_mb=1000)
+        self.history.record_failure(10, ResourceUsage(200, 1, 1))
+        self.assertEqual(self.history.estimate_memory("a", 0, 95, 0, 5), 100)
+
+    def test_failed_jobs_are_retried_until_they_succeed(self):
+        self.history.record_submission(1, "a", 0, "k", mem_mb=100)
+        self.assertFalse(self.history.is_retry("k"))
+        self.history.record_failure(1, None)
+        self.assertFalse(self.history.is_registered(1))
+        self.assertTrue(self.history.is_retry("k"))
+        self.history.record_submission(2, "a", 0, "k", mem_mb=200)
+        self.history.record_usage(2, ResourceUsage(150, 1, 1))
+        self.assertFalse(self.history.is_retry("k"))
+
+
+class TestRetryKey(unittest.TestCase):
+    def test_attempts_of_a_job_have_the_same_key(self):
+        properties = dict(rule="a", wildcards=dict(sample="s1"), jobid=3, threads=1)
+        self.assertEqual(
+            retry_key(properties),
+            retry_key(dict(properties, resources=dict(mem_mb=2000), threads=2)),
+        )
+        self.assertNotEqual(
+            retry_key(properties),
+            retry_key(dict(properties, wildcards=dict(sample="s2"))),
+        )
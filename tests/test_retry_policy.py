@@ -0,0 +1,176 @@
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from tests.src.OSLayer import OSLayer
+from tests.src.CookieCutter import CookieCutter
+from tests.src.retry_policy import RetryPolicy, CircuitBreaker
+from tests.src.uge_status import StatusChecker, QstatError
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_delay_grows_exponentially(self):
+        policy = RetryPolicy(5, base_delay=1, max_delay=100, multiplier=2)
+        actual = [policy.delay(attempt) for attempt in range(4)]
+        self.assertEqual(actual, [1, 2, 4, 8])
+
+    def test_delay_is_capped(self):
+        policy = RetryPolicy(5, base_delay=1, max_delay=5, multiplier=10)
+        self.assertEqual(policy.delay(3), 5)
+
+    def test_jitter_shortens_delay(self):
+        policy = RetryPolicy(5, base_delay=10, max_delay=10, jitter=0.5)
+        for _ in range(100):
+            self.assertTrue(5 <= policy.delay(0) <= 10)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def breaker(self, reset_timeout=60):
+        return CircuitBreaker(self.directory, failure_threshold=2,
+                              reset_timeout=reset_timeout)
+
+    def test_new_breaker_is_closed(self):
+        self.assertTrue(self.breaker().allow_request())
+
+    def test_breaker_opens_after_threshold(self):
+        self.breaker().record_failure()
+        self.assertTrue(self.breaker().allow_request())
+        self.breaker().record_failure()
+        self.assertFalse(self.breaker().allow_request())
+
+    def test_success_resets_failures(self):
+        self.breaker().record_failure()
+        self.breaker().record_success()
+        self.breaker().record_failure()
+        self.assertTrue(self.breaker().allow_request())
+
+    def test_breaker_half_opens_for_a_single_probe(self):
+        breaker = self.breaker(reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.record_failure()
+        time.sleep(0.1)
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker().allow_request())
+
+    def test_failed_probe_reopens_breaker(self):
+        breaker = self.breaker(reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.record_failure()
+        time.sleep(0.1)
+        breaker.allow_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_remembers_last_known_state(self):
+        self.breaker().remember(123, "running")
+        self.assertEqual(self.breaker().last_known(123), "running")
+        self.assertIsNone(self.breaker().last_known(124))
+
+    @patch.object(CircuitBreaker, "MAX_REMEMBERED_JOBS", 2)
+    def test_only_the_most_recent_jobs_are_remembered(self):
+        breaker = self.breaker()
+        for jobid in (1, 2, 3):
+            breaker.remember(jobid, "failed")
+        breaker.remember(2, "success")
+        breaker.remember(4, "failed")
+        self.assertIsNone(breaker.last_known(1))
+        self.assertIsNone(breaker.last_known(3))
+        self.assertEqual(breaker.last_known(2), "success")
+
+    def test_unchanged_state_is_not_written(self):
+        breaker = self.breaker()
+        breaker.remember(123, "failed")
+        with patch.object(CircuitBreaker, "_write") as write_mock:
+            breaker.remember(123, "failed")
+            breaker.record_success()
+        write_mock.assert_not_called()
+
+
+class TestStatusCheckerRetries(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for patcher in [
+            patch.object(CookieCutter, "get_log_dir", return_value=self.directory),
+            patch.object(CookieCutter, "get_max_qstat_checks", return_value=3),
+            patch.object(CookieCutter, "get_time_between_qstat_checks",
+                         return_value=60),
+            patch.object(CookieCutter, "get_use_adaptive_backoff",
+                         return_value=True),
+            patch.object(CookieCutter, "get_qstat_backoff_base_delay",
+                         return_value=1),
+            patch("time.sleep"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch.object(OSLayer, "run_process")
+    def test_backoff_grows_between_qstat_errors(self, run_process_mock):
+        run_process_mock.side_effect = [
+            QstatError, QstatError, (0, "job_state    1: r", ""),
+        ]
+        with patch("time.sleep") as sleep_mock:
+            actual = StatusChecker(123, "test").get_status()
+        self.assertEqual(actual, "running")
+        first, second = [call[0][0] for call in sleep_mock.call_args_list]
+        self.assertTrue(1 <= first <= 2)
+        self.assertTrue(3 <= second <= 6)
+
+    @patch.object(OSLayer, "run_process")
+    def test_unknown_state_is_retried_once(self, run_process_mock):
+        run_process_mock.side_effect = [
+            (0, "job_state    1: Rr", ""),
+            (0, "job_state    1: Rr", ""),
+            (0, "exit_status 0\nfailed 0", ""),
+        ]
+        actual = StatusChecker(123, "test").get_status()
+        self.assertEqual(actual, "success")
+        self.assertEqual(run_process_mock.call_count, 3)
+        self.assertEqual(run_process_mock.call_args[0][0], ["qacct", "-j", "123"])
+
+    @patch.object(CookieCutter, "get_use_circuit_breaker", return_value=True)
+    @patch.object(CookieCutter, "get_circuit_breaker_threshold", return_value=2)
+    @patch.object(CookieCutter, "get_circuit_breaker_reset_timeout",
+                  return_value=600)
+    @patch.object(OSLayer, "run_process")
+    def test_open_breaker_serves_last_known_state(
+        self, run_process_mock, *othermocks
+    ):
+        run_process_mock.return_value = (0, "job_state    1: r", "")
+        self.assertEqual(StatusChecker(123, "test").get_status(), "running")
+
+        run_process_mock.reset_mock()
+        run_process_mock.return_value = (1, "", "cannot reach qmaster")
+        run_process_mock.side_effect = None
+        StatusChecker(124, "test").get_status()
+        self.assertEqual(
+            [call[0][0] for call in run_process_mock.call_args_list[:2]],
+            [["qstat", "-j", "124"], ["qstat", "-j", "124"]],
+        )
+
+        run_process_mock.reset_mock()
+        self.assertEqual(StatusChecker(123, "test").get_status(), "running")
+        run_process_mock.assert_not_called()
+
+    @patch.object(CookieCutter, "get_use_circuit_breaker", return_value=True)
+    @patch.object(CookieCutter, "get_circuit_breaker_threshold", return_value=2)
+    @patch.object(CookieCutter, "get_circuit_breaker_reset_timeout",
+                  return_value=600)
+    @patch.object(CookieCutter, "get_use_qstat_snapshot", return_value=True)
+    @patch.object(StatusChecker, "_query_status_using_qstat_snapshot",
+                  return_value="running")
+    def test_snapshot_read_closes_breaker(self, *mocks):
+        breaker = StatusChecker(123, "test").circuit_breaker
+        breaker.record_failure()
+        self.assertEqual(StatusChecker(123, "test").get_status(), "running")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertIsNone(breaker.last_known(123))
+
+
+if __name__ == "__main__":
+    unittest.main()
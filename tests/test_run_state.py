@@ -0,0 +1,96 @@
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from unittest.mock import patch
+
+from tests.src.CookieCutter import CookieCutter
+from tests.src.run_state import RunState, job_fingerprint
+from tests.src.uge_cancel import record_cancelled_jobs
+from tests.src.uge_status import StatusChecker
+
+
+class TestJobFingerprint(unittest.TestCase):
+    def test_jobs_of_other_runs_have_the_same_fingerprint(self):
+        properties = dict(rule="a", wildcards=dict(sample="s1"), jobid=3)
+        self.assertEqual(
+            job_fingerprint(properties), job_fingerprint(dict(properties, jobid=7))
+        )
+        self.assertNotEqual(
+            job_fingerprint(properties),
+            job_fingerprint(dict(properties, wildcards=dict(sample="s2"))),
+        )
+
+
+class TestRunState(unittest.TestCase):
+    def setUp(self):
+        self.run_state = RunState(tempfile.mkdtemp())
+
+    def submit(self, jobid: str, fingerprint: str = "f", outlog: str = "logs/a.out"):
+        self.run_state.record_submission(jobid, "3", fingerprint, outlog, "-l h_rt=1:00")
+
+    def test_submission_is_recorded(self):
+        self.submit("123")
+        job = self.run_state.job(123)
+        self.assertEqual(job["snakemake_jobid"], "3")
+        self.assertEqual(job["outlog"], "logs/a.out")
+        self.assertEqual(job["resources"], "-l h_rt=1:00")
+        self.assertEqual(job["state"], "running")
+
+    def test_database_is_in_wal_mode(self):
+        self.submit("123")
+        with closing(sqlite3.connect(str(self.run_state.path))) as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_only_terminal_states_are_returned(self):
+        self.submit("123")
+        self.assertIsNone(self.run_state.terminal_state("123", "logs/a.out"))
+        self.run_state.record_state("123", "success")
+        self.assertEqual(self.run_state.terminal_state("123", "logs/a.out"), "success")
+
+    def test_reused_job_numbers_are_told_apart_by_their_log(self):
+        self.submit("123")
+        self.run_state.record_state("123", "failed")
+        self.assertIsNone(self.run_state.terminal_state("123", "logs/b.out"))
+
+    def test_most_recent_job_in_flight(self):
+        self.submit("123")
+        self.submit("124")
+        self.submit("125", fingerprint="g")
+        self.assertEqual(self.run_state.in_flight("f")["jobid"], "124")
+        self.run_state.record_states(["124", "123"], "failed")
+        self.assertIsNone(self.run_state.in_flight("f"))
+
+    def test_reattached_job_belongs_to_the_new_run(self):
+        self.submit("123")
+        self.run_state.record_reattachment("123", "12")
+        self.assertEqual(self.run_state.job("123")["snakemake_jobid"], "12")
+
+
+class TestRecordedStatus(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        for name, value in (
+            ("get_log_dir", self.log_dir),
+            ("get_use_run_state", True),
+            ("get_log_status_checks", False),
+        ):
+            patcher = patch.object(CookieCutter, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        RunState(self.log_dir).record_submission("123", "3", "f", "logs/a.out", "")
+
+    def test_status_checks_leave_the_status(self):
+        checker = StatusChecker(123, "logs/a.out")
+        checker.record_status("running")
+        self.assertIsNone(checker.get_recorded_status())
+        checker.record_status("success")
+        self.assertEqual(checker.get_recorded_status(), "success")
+
+    def test_cancelled_jobs_have_failed(self):
+        record_cancelled_jobs(["123", "local:1-a"])
+        self.assertEqual(StatusChecker(123, "logs/a.out").get_recorded_status(), "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
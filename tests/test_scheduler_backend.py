@@ -0,0 +1,146 @@
+import unittest
+from unittest.mock import PropertyMock, patch
+
+from tests import fake_drmaa
+from tests.src import scheduler_backend
+from tests.src.OSLayer import OSLayer
+from tests.src.scheduler_backend import (
+    CliBackend,
+    DrmaaBackend,
+    SchedulerBackend,
+    SchedulerError,
+    get_backend,
+)
+from tests.src.uge_status import StatusChecker
+
+
+class TestCliBackend(unittest.TestCase):
+    @patch.object(
+        OSLayer,
+        "run_process",
+        return_value=(0, 'Your job 123 ("smk.a") has been submitted', ""),
+    )
+    def test_submit_runs_qsub(self, run_process_mock):
+        self.assertEqual(
+            CliBackend().submit(["-cwd", "-V", "-q", "q1"], "job.sh"), "123"
+        )
+        run_process_mock.assert_called_once_with(
+            ["qsub", "-cwd", "-V", "-q", "q1", "job.sh"]
+        )
+
+    @patch.object(OSLayer, "run_process", return_value=(1, "", "denied"))
+    def test_failed_submit_raises(self, *mocks):
+        with self.assertRaises(SchedulerError):
+            CliBackend().submit(["-cwd"], "job.sh")
+
+    def test_job_state_is_left_to_the_status_checks(self):
+        self.assertIsNone(CliBackend().job_state(123))
+
+    @patch.object(OSLayer, "run_process", return_value=(0, "deleted", ""))
+    def test_cancel_runs_qdel(self, run_process_mock):
+        CliBackend().cancel(["123", "124.2"])
+        run_process_mock.assert_called_once_with(["qdel", "123", "124.2"])
+
+
+class TestDrmaaBackend(unittest.TestCase):
+    def setUp(self):
+        fake_drmaa.reset()
+        self.backend = DrmaaBackend(fake_drmaa)
+        self.addCleanup(self.backend.close)
+
+    def test_submit_passes_qsub_options_as_native_specification(self):
+        jobid = self.backend.submit(["-cwd", "-V", "-q", "q1"], "job.sh")
+        job = fake_drmaa.Session.jobs[jobid]
+        self.assertEqual(job["remoteCommand"], "job.sh")
+        self.assertEqual(job["nativeSpecification"], "-b n -cwd -V -q q1")
+
+    @patch.object(
+        OSLayer,
+        "run_process",
+        return_value=(0, 'Your job 123 ("smk.a") has been submitted', ""),
+    )
+    def test_options_with_whitespace_are_submitted_with_qsub(self, run_process_mock):
+        self.assertEqual(self.backend.submit(["-N", "a b"], "job.sh"), "123")
+        run_process_mock.assert_called_once_with(["qsub", "-N", "a b", "job.sh"])
+        self.assertEqual(fake_drmaa.Session.jobs, {})
+
+    def test_denied_submit_raises(self):
+        fake_drmaa.Session.deny_submission = "no such queue"
+        with self.assertRaises(SchedulerError):
+            self.backend.submit(["-q", "nope"], "job.sh")
+
+    def test_job_states(self):
+        jobid = self.backend.submit([], "job.sh")
+        self.assertEqual(self.backend.job_state(jobid), "qw")
+        fake_drmaa.set_state(jobid, fake_drmaa.JobState.RUNNING)
+        self.assertEqual(self.backend.job_state(jobid), "r")
+        fake_drmaa.set_state(jobid, fake_drmaa.JobState.DONE)
+        self.assertEqual(self.backend.job_state(jobid), SchedulerBackend.FINISHED)
+
+    def test_unknown_job_has_finished(self):
+        self.assertEqual(self.backend.job_state("1"), SchedulerBackend.FINISHED)
+
+    def test_cancel_terminates_jobs(self):
+        jobid = self.backend.submit([], "job.sh")
+        self.backend.cancel([jobid, "1"])
+        self.assertEqual(
+            fake_drmaa.Session.jobs[jobid]["state"], fake_drmaa.JobState.FAILED
+        )
+
+
+class TestGetBackend(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(scheduler_backend._backends.clear)
+
+    @patch.object(scheduler_backend, "_keep_sessions", True)
+    @patch.object(DrmaaBackend, "__init__", side_effect=SchedulerError("no libdrmaa"))
+    def test_falls_back_to_cli_without_drmaa(self, *mocks):
+        self.assertIsInstance(get_backend("drmaa"), CliBackend)
+
+    @patch.object(scheduler_backend, "_keep_sessions", True)
+    @patch.object(DrmaaBackend, "__init__", return_value=None)
+    def test_long_lived_processes_get_a_session(self, *mocks):
+        self.assertIsInstance(get_backend("drmaa"), DrmaaBackend)
+
+    @patch.object(DrmaaBackend, "__init__")
+    def test_short_lived_processes_use_the_command_line_tools(self, init_mock):
+        self.assertIsInstance(get_backend("drmaa"), CliBackend)
+        init_mock.assert_not_called()
+
+    def test_backends_implement_every_operation(self):
+        with self.assertRaises(TypeError):
+            SchedulerBackend()
+
+    def test_backend_is_created_once(self):
+        self.assertIs(get_backend("cli"), get_backend("cli"))
+
+
+class TestStatusCheckerWithDrmaa(unittest.TestCase):
+    def setUp(self):
+        fake_drmaa.reset()
+        self.backend = DrmaaBackend(fake_drmaa)
+        self.addCleanup(self.backend.close)
+
+    @patch.object(OSLayer, "run_process")
+    def test_running_job_needs_no_qstat(self, run_process_mock):
+        jobid = self.backend.submit([], "job.sh")
+        fake_drmaa.set_state(jobid, fake_drmaa.JobState.RUNNING)
+        with patch.object(
+            StatusChecker, "scheduler", new_callable=PropertyMock,
+            return_value=self.backend,
+        ):
+            self.assertEqual(StatusChecker(int(jobid), "test").get_status(), "running")
+        run_process_mock.assert_not_called()
+
+    @patch.object(StatusChecker, "get_status_of_finished_job", return_value="success")
+    def test_finished_job_is_resolved_without_qstat(self, finished_mock):
+        with patch.object(
+            StatusChecker, "scheduler", new_callable=PropertyMock,
+            return_value=self.backend,
+        ):
+            self.assertEqual(StatusChecker(123, "test").get_status(), "success")
+        finished_mock.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 from subprocess import CalledProcessError
 from unittest.mock import patch
@@ -6,7 +7,14 @@ import pytest
 from pathlib import Path
 from tests.src.OSLayer import OSLayer
 from tests.src.CookieCutter import CookieCutter
-from tests.src.uge_status import StatusChecker, QstatError, QacctError, UnknownStatusLine
+from tests.src.uge_status import (
+    StatusChecker,
+    QstatError,
+    QacctError,
+    UnknownStatusLine,
+    parse_jobid,
+)
+from tests.src.resource_history import ResourceHistory, ResourceUsage
 
 
 def assert_called_n_times_with_same_args(mock, n, args):
@@ -29,7 +37,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = uge_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
     @patch.object(OSLayer,
@@ -42,7 +50,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = uge_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
     @patch.object(OSLayer,
@@ -55,7 +63,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = uge_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
     @patch.object(OSLayer,
@@ -68,7 +76,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = uge_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
     @patch.object(OSLayer,
@@ -82,7 +90,7 @@ class TestStatusChecker(unittest.TestCase):
         print(actual)
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
     @patch.object(OSLayer,
@@ -95,7 +103,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = uge_status_checker.get_status()
         expected = "failed"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
     @patch.object(OSLayer,
@@ -108,7 +116,7 @@ class TestStatusChecker(unittest.TestCase):
         actual = uge_status_checker.get_status()
         expected = "failed"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=3)
     @patch.object(CookieCutter, "get_time_between_qstat_checks", return_value=1)
@@ -126,7 +134,7 @@ class TestStatusChecker(unittest.TestCase):
         expected = "running"
         self.assertEqual(actual, expected)
         assert_called_n_times_with_same_args(
-            run_process_mock, 3, ["qstat -j 123"] * 3
+            run_process_mock, 3, [["qstat", "-j", "123"]] * 3
         )
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=1)
@@ -146,7 +154,23 @@ class TestStatusChecker(unittest.TestCase):
         expected = "failed"
         self.assertEqual(actual, expected)
         assert_called_n_times_with_same_args(
-            run_process_mock, 2, ["qstat -j 123", "qacct -j 123"])
+            run_process_mock, 2, [["qstat", "-j", "123"], ["qacct", "-j", "123"]])
+
+    @patch.object(CookieCutter, "get_max_qstat_checks", return_value=1)
+    @patch.object(CookieCutter, "get_time_between_qstat_checks", return_value=1)
+    @patch.object(CookieCutter, "get_latency_wait", return_value=45)
+    @patch.object(OSLayer, "run_process")
+    def test_get_status_qstat_fails_using_qacct_multi_digit_exit_status_is_failure(
+        self, run_process_mock, *othermocks
+    ):
+        run_process_mock.side_effect = [
+            QstatError,
+            (0, "failed       0\nexit_status  130", "")
+        ]
+        uge_status_checker = StatusChecker(123, "dummy")
+        actual = uge_status_checker.get_status()
+        expected = "failed"
+        self.assertEqual(actual, expected)
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=1)
     @patch.object(CookieCutter, "get_time_between_qstat_checks", return_value=1)
@@ -164,7 +188,7 @@ class TestStatusChecker(unittest.TestCase):
         expected = "success"
         self.assertEqual(actual, expected)
         assert_called_n_times_with_same_args(
-            run_process_mock, 2, ["qstat -j 123", "qacct -j 123"])
+            run_process_mock, 2, [["qstat", "-j", "123"], ["qacct", "-j", "123"]])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=1)
     @patch.object(CookieCutter, "get_time_between_qstat_checks", return_value=1)
@@ -181,7 +205,7 @@ class TestStatusChecker(unittest.TestCase):
         expected = "success"
         self.assertEqual(actual, expected)
         assert_called_n_times_with_same_args(
-            run_process_mock, 2, ["qstat -j 123", "qacct -j 123"])
+            run_process_mock, 2, [["qstat", "-j", "123"], ["qacct", "-j", "123"]])
 
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=4)
     @patch.object(OSLayer,
@@ -193,7 +217,7 @@ class TestStatusChecker(unittest.TestCase):
         uge_status_checker = StatusChecker(123, "test")
         self.assertRaises(QstatError,
                 uge_status_checker._query_status_using_qstat)
-        run_process_mock.assert_called_once_with("qstat -j 123")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
 
     @patch.object(CookieCutter, "get_log_dir", return_value="logdir")
     @patch.object(CookieCutter, "get_max_qstat_checks", return_value=1)
@@ -206,15 +230,171 @@ class TestStatusChecker(unittest.TestCase):
     def test_get_status_dashed_status(
         self, run_process_mock, *othermocks
     ):
-        expected_rule_name = "search_fasta_on_index"
-        expected_jobname = "smk.search_fasta_on_index.0"
-        expected_logdir = Path("logdir") / expected_rule_name
-        outlog = expected_logdir / "{jobname}.out".format(jobname=expected_jobname)
         uge_status_checker = StatusChecker(123, "test")
         actual = uge_status_checker.get_status()
         expected = "running"
         self.assertEqual(actual, expected)
-        run_process_mock.assert_called_with("qacct -j 123")
+        run_process_mock.assert_called_with(["qacct", "-j", "123"])
+
+
+QSTAT_J_RUNNING = (
+    "job_number:                 123\n"
+    "job_state             1:    r\n"
+    "job_state             2:    r\n"
+    "usage                 1:    wallclock=02:00:00, cpu=01:30:00, mem=1.0 GBs\n"
+    "usage                 2:    wallclock=1:02:00:00, cpu=00:00:10, mem=0.1 GBs\n"
+)
+
+
+class TestHungJobs(unittest.TestCase):
+    def setUp(self):
+        for name, value in (
+            ("get_max_qstat_checks", 1),
+            ("get_hung_job_min_time", 60),
+            ("get_hung_job_max_cpu_ratio", 0.05),
+        ):
+            patcher = patch.object(CookieCutter, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_extract_time_handles_days(self):
+        line = "usage    1:    wallclock=1:02:03:04, cpu=00:01:40.5, mem=1 GBs"
+        self.assertEqual(StatusChecker._extract_time(line, "wallclock"), 93784)
+        self.assertEqual(StatusChecker._extract_time(line, "cpu"), 100.5)
+
+    @patch.object(CookieCutter, "get_hung_job_policy", return_value="qdel")
+    @patch.object(OSLayer, "run_process")
+    def test_hung_task_is_deleted_and_job_failed(self, run_process_mock, *mocks):
+        run_process_mock.side_effect = [(0, QSTAT_J_RUNNING, ""), (0, "", "")]
+        actual = StatusChecker(123, "test").get_status()
+        self.assertEqual(actual, "failed")
+        self.assertEqual(run_process_mock.call_args[0][0], ["qdel", "123"])
+
+    @patch.object(CookieCutter, "get_hung_job_policy", return_value="report")
+    @patch.object(OSLayer, "run_process", return_value=(0, QSTAT_J_RUNNING, ""))
+    def test_report_policy_keeps_job_running(self, run_process_mock, *mocks):
+        actual = StatusChecker(123, "test").get_status()
+        self.assertEqual(actual, "running")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
+
+    @patch.object(CookieCutter, "get_hung_job_policy", return_value="qdel")
+    @patch.object(OSLayer, "run_process")
+    def test_busy_job_is_running(self, run_process_mock, *mocks):
+        run_process_mock.return_value = (
+            0, QSTAT_J_RUNNING.split("usage                 2")[0], ""
+        )
+        actual = StatusChecker(123, "test").get_status()
+        self.assertEqual(actual, "running")
+        run_process_mock.assert_called_once_with(["qstat", "-j", "123"])
+
+    @patch.object(CookieCutter, "get_hung_job_policy", return_value="qdel")
+    @patch.object(OSLayer, "run_process")
+    def test_failing_qdel_keeps_job_running(self, run_process_mock, *mocks):
+        run_process_mock.side_effect = [
+            (0, QSTAT_J_RUNNING, ""), (1, "", "denied")
+        ]
+        actual = StatusChecker(123, "test").get_status()
+        self.assertEqual(actual, "running")
+
+
+QSTAT_J_ARRAY = (
+    "job_number:                 123\n"
+    "job_state             1:    r\n"
+    "job_state             4:    E\n"
+)
+
+
+class TestArrayTasks(unittest.TestCase):
+    def test_task_is_split_from_jobid(self):
+        checker = StatusChecker("123.4", "test")
+        self.assertEqual(checker.job_number, 123)
+        self.assertEqual(checker.task_id, 4)
+        self.assertEqual(checker.qstat_query_cmd, ["qstat", "-j", "123"])
+        self.assertEqual(checker.qacct_query_cmd, ["qacct", "-j", "123", "-t", "4"])
+        self.assertEqual(checker.qdel_cmd, ["qdel", "123", "-t", "4"])
+
+    def test_plain_jobid_has_no_task(self):
+        self.assertIsNone(StatusChecker(123, "test").task_id)
+        self.assertEqual(parse_jobid("123"), 123)
+        self.assertEqual(parse_jobid("123.4"), "123.4")
+        self.assertRaises(ValueError, parse_jobid, "123 ")
+
+    @patch.object(CookieCutter, "get_max_qstat_checks", return_value=1)
+    @patch.object(OSLayer, "run_process", return_value=(0, QSTAT_J_ARRAY, ""))
+    def test_state_of_task_is_used(self, *mocks):
+        self.assertEqual(StatusChecker("123.1", "test").get_status(), "running")
+        self.assertEqual(StatusChecker("123.4", "test").get_status(), "failed")
+
+    @patch.object(CookieCutter, "get_max_qstat_checks", return_value=1)
+    @patch.object(OSLayer, "run_process", return_value=(0, QSTAT_J_ARRAY, ""))
+    def test_unscheduled_task_is_pending(self, *mocks):
+        self.assertEqual(StatusChecker("123.7", "test").get_status(), "running")
+
+class TestResourceUsage(unittest.TestCase):
+    def test_usage_is_read_from_qacct(self):
+        output = (
+            "ru_wallclock 120s\ncpu          60.500s\nmaxvmem      1.500G\n"
+            "failed       0\nexit_status  0\n"
+        )
+        usage = StatusChecker._qacct_usage(output)
+        self.assertEqual(usage, ResourceUsage(1536.0, 60.5, 120.0))
+
+    def test_incomplete_qacct_output(self):
+        self.assertIsNone(StatusChecker._qacct_usage("exit_status  0\n"))
+
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(CookieCutter, "get_use_accounting_index", return_value=False)
+    @patch.object(
+        OSLayer,
+        "run_process",
+        return_value=(
+            0,
+            "failed 0\nexit_status 0\nru_wallclock 10\ncpu 5\nmaxvmem 100M",
+            "",
+        ),
+    )
+    def test_usage_of_successful_jobs_is_recorded(self, run_process_mock, *mocks):
+        log_dir = tempfile.mkdtemp()
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            history = ResourceHistory(log_dir)
+            history.record_submission(123, "a", 0)
+
+            StatusChecker(123, "dummy").record_resource_usage("success")
+
+            run_process_mock.assert_called_once_with(["qacct", "-j", "123"])
+            self.assertFalse(history.is_registered(123))
+            self.assertEqual(history.estimate_memory("a", 0, 100, 0, 1), 100)
+
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(CookieCutter, "get_use_accounting_index", return_value=False)
+    @patch.object(
+        OSLayer,
+        "run_process",
+        return_value=(
+            0,
+            "failed 100\nexit_status 137\nru_wallclock 10\ncpu 5\nmaxvmem 2G",
+            "",
+        ),
+    )
+    def test_jobs_killed_for_their_memory_are_recorded(self, *mocks):
+        log_dir = tempfile.mkdtemp()
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            history = ResourceHistory(log_dir)
+            history.record_submission(123, "a", 0, "k", mem_mb=2048)
+
+            StatusChecker(123, "dummy").record_resource_usage("failed")
+
+            self.assertTrue(history.is_retry("k"))
+            self.assertEqual(history.estimate_memory("a", 0, 50, 0, 1), 2048)
+
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(OSLayer, "run_process")
+    def test_usage_of_unregistered_jobs_is_not_queried(self, run_process_mock, *mocks):
+        log_dir = tempfile.mkdtemp()
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            StatusChecker(123, "dummy").record_resource_usage("success")
+        run_process_mock.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from tests.src.CookieCutter import CookieCutter
+from tests.src.pilot import PilotQueue, pilot_directory
+from tests.src.uge_cancel import (
+    cancel_local_jobs,
+    cancel_pilot_tasks,
+    job_ids,
+    local_job_ids,
+    pilot_task_ids,
+)
+
+
+class TestJobIds(unittest.TestCase):
+    def test_cluster_logs_are_dropped(self):
+        arguments = ["123", "logs/rule/smk.rule.0.out", "124", "logs/b.out"]
+        self.assertEqual(job_ids(arguments), ["123", "124"])
+
+    def test_array_tasks_are_kept(self):
+        self.assertEqual(job_ids(["123.4", "logs/a.out"]), ["123.4"])
+
+    def test_nothing_to_cancel(self):
+        self.assertEqual(job_ids(["logs/a.out"]), [])
+
+    def test_pilot_tasks_are_cancelled_in_their_queue(self):
+        arguments = ["pilot:17a-1-ff", "logs/a.out", "123", "logs/b.out"]
+        self.assertEqual(job_ids(arguments), ["123"])
+        self.assertEqual(pilot_task_ids(arguments), ["17a-1-ff"])
+
+    def test_local_jobs_are_cancelled_on_the_submit_host(self):
+        arguments = ["local:17a-ff", "logs/a.out", "123", "logs/b.out"]
+        self.assertEqual(job_ids(arguments), ["123"])
+        self.assertEqual(local_job_ids(arguments), ["17a-ff"])
+
+
+class TestCancel(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        patcher = patch.object(CookieCutter, "get_log_dir", return_value=self.log_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_removed_pilot_tasks_are_cancelled(self):
+        queue = PilotQueue(pilot_directory(self.log_dir))
+        task_id = queue.enqueue("/jobs/a.sh", "/logs/a.out", "/logs/a.err")
+        self.assertEqual(
+            cancel_pilot_tasks([task_id, "17a-1-ff"]), ["pilot:" + task_id]
+        )
+        self.assertEqual(cancel_pilot_tasks([task_id]), [])
+
+    def test_finished_local_jobs_are_not_cancelled(self):
+        self.assertEqual(cancel_local_jobs(["17a-ff"]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
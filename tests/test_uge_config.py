@@ -1,4 +1,8 @@
+import os
+import time
 from io import StringIO
+from unittest.mock import patch
+
 from tests.src.uge_config import Config
 
 
@@ -182,3 +186,125 @@ class TestParamsForRule:
         expected = "-P project -q bar"
 
         assert actual == expected
+
+
+class TestArgsForRule:
+    def test_params_are_split_like_the_shell(self):
+        stream = StringIO("__default__: '-q foo'\nrule: \"-N 'a b' -l h_rt=1:00:00\"")
+        config = Config.from_stream(stream)
+
+        actual = config.args_for_rule("rule")
+        expected = ["-q", "foo", "-N", "a b", "-l", "h_rt=1:00:00"]
+
+        assert actual == expected
+
+    def test_returned_args_can_be_extended(self):
+        config = Config.from_stream(StringIO("rule: '-q foo'"))
+
+        config.args_for_rule("rule").append("job.sh")
+
+        assert config.args_for_rule("rule") == ["-q", "foo"]
+
+
+class TestQueueLimits:
+    def test_limits_in_minutes_or_as_h_rt(self):
+        stream = StringIO("__queues__:\n  short.q: 30\n  long.q: '1:30:00'")
+        config = Config.from_stream(stream)
+
+        assert config.queue_limits() == [("short.q", 30.0), ("long.q", 90.0)]
+
+    def test_no_queues(self):
+        assert Config().queue_limits() == []
+
+    def test_queues_are_not_rules(self):
+        config = Config.from_stream(StringIO("__queues__:\n  short.q: 30"))
+
+        assert config.compile() == {}
+
+
+class TestCompile:
+    def test_rules_get_default_params_merged(self):
+        stream = StringIO(
+            "__default__: '-q foo'\na: '-P project'\nb:\n  - '-l gpu=1'\n  - '-q bar'"
+        )
+        config = Config.from_stream(stream)
+
+        actual = config.compile()
+        expected = {"a": "-q foo -P project", "b": "-q foo -l gpu=1 -q bar"}
+
+        assert actual == expected
+
+    def test_settings_are_not_rules(self):
+        stream = StringIO("__default__: '-q foo'\n__other__: 1\na: '-P project'")
+        config = Config.from_stream(stream)
+
+        assert list(config.compile()) == ["a"]
+
+
+class TestFromFile:
+    @staticmethod
+    def config_file(directory, text: str, age: float = 60):
+        path = directory / "uge.yaml"
+        path.write_text(text)
+        mtime = time.time() - age
+        os.utime(str(path), (mtime, mtime))
+        return path
+
+    def test_without_cache(self, tmp_path):
+        path = self.config_file(tmp_path, "a: '-q foo'")
+
+        config = Config.from_file(path)
+
+        assert config.params_for_rule("a") == "-q foo"
+
+    def test_cached_config_is_not_parsed_again(self, tmp_path):
+        path = self.config_file(tmp_path, "__default__: '-q foo'\na: '-P project'")
+        cache_path = tmp_path / "cache" / "uge.yaml.cache"
+        Config.from_file(path, cache_path)
+
+        with patch.object(Config, "from_stream") as from_stream_mock:
+            config = Config.from_file(path, cache_path)
+
+        from_stream_mock.assert_not_called()
+        assert config.params_for_rule("a") == "-q foo -P project"
+        assert config.params_for_rule("b") == "-q foo"
+        assert "a" in config
+
+    def test_cached_args_are_not_split_again(self, tmp_path):
+        path = self.config_file(tmp_path, "__default__: '-q foo'\na: '-P project'")
+        cache_path = tmp_path / "uge.yaml.cache"
+        Config.from_file(path, cache_path)
+
+        with patch("tests.src.uge_config.shlex.split") as split_mock:
+            config = Config.from_file(path, cache_path)
+            assert config.args_for_rule("a") == ["-q", "foo", "-P", "project"]
+            assert config.args_for_rule("b") == ["-q", "foo"]
+
+        split_mock.assert_not_called()
+
+    def test_changed_config_is_parsed_again(self, tmp_path):
+        path = self.config_file(tmp_path, "a: '-q foo'")
+        cache_path = tmp_path / "uge.yaml.cache"
+        Config.from_file(path, cache_path)
+        path = self.config_file(tmp_path, "a: '-q bar'", age=30)
+
+        config = Config.from_file(path, cache_path)
+
+        assert config.params_for_rule("a") == "-q bar"
+
+    def test_recently_modified_config_is_not_cached(self, tmp_path):
+        path = self.config_file(tmp_path, "a: '-q foo'", age=0)
+        cache_path = tmp_path / "uge.yaml.cache"
+
+        Config.from_file(path, cache_path)
+
+        assert not cache_path.exists()
+
+    def test_corrupt_cache_is_ignored(self, tmp_path):
+        path = self.config_file(tmp_path, "a: '-q foo'")
+        cache_path = tmp_path / "uge.yaml.cache"
+        cache_path.write_bytes(b"garbage")
+
+        config = Config.from_file(path, cache_path)
+
+        assert config.params_for_rule("a") == "-q foo"
@@ -0,0 +1,220 @@
+import asyncio
+import io
+import tempfile
+import unittest
+from contextlib import nullcontext
+from pathlib import Path
+from unittest.mock import patch
+
+from tests import fake_drmaa
+from tests.src.OSLayer import OSLayer, ProcessStreamError
+from tests.src.CookieCutter import CookieCutter
+from tests.src.scheduler_backend import CliBackend, DrmaaBackend
+from tests.src.uge_status import StatusChecker, query_status_server
+from tests.src.uge_status_server import StatusServer
+
+QSTAT_XML = b"""<?xml version='1.0'?>
+<job_info>
+  <queue_info>
+    <job_list state="running">
+      <JB_job_number>101</JB_job_number>
+      <JB_name>smk.a</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>r</state>
+      <queue_name>all.q@node1</queue_name>
+      <slots>1</slots>
+    </job_list>
+  </queue_info>
+  <job_info>
+    <job_list state="pending">
+      <JB_job_number>102</JB_job_number>
+      <JB_name>smk.b</JB_name>
+      <JB_owner>user</JB_owner>
+      <state>qw</state>
+      <queue_name></queue_name>
+      <slots>1</slots>
+    </job_list>
+  </job_info>
+</job_info>
+"""
+
+HUNG_XML = b"""<?xml version='1.0'?>
+<job_info>
+  <queue_info>
+    <job_list state="running">
+      <JB_job_number>101</JB_job_number>
+      <state>r</state>
+      <JAT_start_time>2020-08-06T11:02:33</JAT_start_time>
+      <cpu_usage>30</cpu_usage>
+    </job_list>
+  </queue_info>
+</job_info>
+"""
+
+
+def stream_of(output: bytes):
+    return lambda cmd: nullcontext(io.BytesIO(output))
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestStatusServer(unittest.TestCase):
+    def setUp(self):
+        self.server = StatusServer(
+            Path(tempfile.mkdtemp()) / "server.sock",
+            poll_interval=0.01,
+            idle_timeout=0.1,
+            user="user",
+        )
+
+    def test_unknown_job_is_running_until_polled(self):
+        self.assertEqual(run(self.server.status(103, "out")), "running")
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_poll_runs_one_qstat_for_all_jobs(self, stream_process_mock):
+        async def scenario():
+            await self.server.status(101, "a.out")
+            await self.server.status(102, "b.out")
+            await self.server.poll()
+            return [
+                await self.server.status(101, "a.out"),
+                await self.server.status(102, "b.out"),
+            ]
+
+        self.assertEqual(run(scenario()), ["running", "running"])
+        stream_process_mock.assert_called_once_with(["qstat", "-xml", "-u", "user"])
+
+    @patch.object(
+        StatusChecker, "get_status_of_finished_job", return_value="success"
+    )
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_job_missing_from_poll_is_resolved_once(
+        self, stream_process_mock, finished_mock
+    ):
+        async def scenario():
+            await self.server.status(100, "c.out")
+            await self.server.poll()
+            await self.server.poll()
+            return await self.server.status(100, "c.out")
+
+        self.assertEqual(run(scenario()), "success")
+        finished_mock.assert_called_once_with()
+
+    @patch.object(
+        StatusChecker, "get_status_of_finished_job", return_value="success"
+    )
+    @patch.object(OSLayer, "stream_process")
+    def test_poll_asks_drmaa_instead_of_qstat(self, stream_process_mock, *mocks):
+        fake_drmaa.reset()
+        backend = DrmaaBackend(fake_drmaa)
+        self.addCleanup(backend.close)
+        running, finished = backend.submit([], "a.sh"), backend.submit([], "b.sh")
+        fake_drmaa.set_state(running, fake_drmaa.JobState.RUNNING)
+        fake_drmaa.set_state(finished, fake_drmaa.JobState.DONE)
+        server = StatusServer(
+            Path(tempfile.mkdtemp()) / "server.sock",
+            poll_interval=0.01,
+            idle_timeout=0.1,
+            scheduler=backend,
+        )
+
+        async def scenario():
+            await server.status(int(running), "a.out")
+            await server.status(int(finished), "b.out")
+            await server.poll()
+            return [
+                await server.status(int(running), "a.out"),
+                await server.status(int(finished), "b.out"),
+            ]
+
+        self.assertEqual(run(scenario()), ["running", "success"])
+        stream_process_mock.assert_not_called()
+
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_poll_runs_qstat_with_the_command_line_backend(
+        self, stream_process_mock
+    ):
+        server = StatusServer(
+            Path(tempfile.mkdtemp()) / "server.sock",
+            poll_interval=0.01,
+            idle_timeout=0.1,
+            user="user",
+            scheduler=CliBackend(),
+        )
+
+        async def scenario():
+            await server.status(101, "a.out")
+            await server.poll()
+            return await server.status(101, "a.out")
+
+        self.assertEqual(run(scenario()), "running")
+        stream_process_mock.assert_called_once_with(["qstat", "-xml", "-u", "user"])
+
+    @patch.object(
+        OSLayer, "stream_process", side_effect=ProcessStreamError("qmaster down")
+    )
+    def test_failing_poll_keeps_previous_states(self, *mocks):
+        async def scenario():
+            await self.server.status(101, "a.out")
+            await self.server.poll()
+            return await self.server.status(101, "a.out")
+
+        self.assertEqual(run(scenario()), "running")
+
+    @patch.object(CookieCutter, "get_hung_job_policy", return_value="qdel")
+    @patch.object(CookieCutter, "get_hung_job_min_time", return_value=60)
+    @patch.object(CookieCutter, "get_hung_job_max_cpu_ratio", return_value=0.05)
+    @patch.object(OSLayer, "run_process", return_value=(0, "", ""))
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(HUNG_XML))
+    def test_hung_job_is_deleted_and_failed(
+        self, stream_process_mock, run_process_mock, *mocks
+    ):
+        server = StatusServer(
+            Path(tempfile.mkdtemp()) / "server.sock",
+            poll_interval=0.01,
+            idle_timeout=0.1,
+            user="user",
+            with_usage=True,
+        )
+
+        async def scenario():
+            await server.status(101, "a.out")
+            await server.poll()
+            return await server.status(101, "a.out")
+
+        self.assertEqual(run(scenario()), "failed")
+        stream_process_mock.assert_called_once_with(["qstat", "-xml", "-ext", "-u", "user"])
+        run_process_mock.assert_called_once_with(["qdel", "101"])
+
+
+class TestStatusServerSocket(unittest.TestCase):
+    @patch.object(OSLayer, "stream_process", side_effect=stream_of(QSTAT_XML))
+    def test_client_gets_status_over_socket(self, *mocks):
+        socket_path = Path(tempfile.mkdtemp()) / "server.sock"
+        server = StatusServer(
+            socket_path, poll_interval=0.01, idle_timeout=0.5, user="user"
+        )
+
+        async def scenario():
+            serving = asyncio.ensure_future(server.serve())
+            while not socket_path.exists():
+                await asyncio.sleep(0.01)
+            loop = asyncio.get_running_loop()
+            status = await loop.run_in_executor(
+                None, query_status_server, socket_path, 102, "b.out"
+            )
+            await serving
+            return status
+
+        self.assertEqual(run(scenario()), "running")
+        self.assertFalse(socket_path.exists())
+
+    def test_client_returns_none_without_server(self):
+        socket_path = Path(tempfile.mkdtemp()) / "server.sock"
+        self.assertIsNone(query_status_server(socket_path, 102, "b.out"))
+
+
+if __name__ == "__main__":
+    unittest.main()
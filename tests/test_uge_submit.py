@@ -2,6 +2,9 @@ import json
 import tempfile
 import unittest
 import math
+import os
+import shlex
+import shutil
 from io import StringIO
 from pathlib import Path
 from subprocess import CalledProcessError
@@ -10,7 +13,12 @@ from unittest.mock import patch
 from tests.src.CookieCutter import CookieCutter
 from tests.src.OSLayer import OSLayer
 from tests.src.uge_config import Config
+from tests.src.job_dependencies import JobidMap
+from tests.src.job_properties import read_job_properties
+from tests.src.job_sentinel import JobSentinel
+from tests.src.run_state import RunState, job_fingerprint
 from tests.src.memory_units import Unit, Memory
+from tests.src.resource_history import ResourceHistory, ResourceUsage
 from tests.src.uge_submit import (
     Submitter,
     QsubInvocationError,
@@ -19,6 +27,20 @@ from tests.src.uge_submit import (
 
 
 class TestSubmitter(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def temp_dir(self) -> str:
+        return tempfile.mkdtemp(dir=self.tmpdir)
+
+    def temp_jobscript(self) -> Path:
+        handle, path = tempfile.mkstemp(suffix=".sh", dir=self.tmpdir)
+        os.close(handle)
+        return Path(path)
+
     @patch.object(CookieCutter, "get_log_dir", return_value="logdir")
     @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
     @patch.object(CookieCutter, "get_default_threads", return_value=8)
@@ -76,10 +98,12 @@ class TestSubmitter(unittest.TestCase):
         self.assertEqual(uge_submit.queue_cmd, "-q q1")
         self.assertEqual(
             uge_submit.submit_cmd,
-            "qsub -cwd -pe threads 4 -l h_vmem={mem}G -l m_mem_free={mem}G "
-            "{jobinfo} -q q1 cluster_opt_1 cluster_opt_2 cluster_opt_3 "
-            "real_jobscript.sh".format(
-                mem=expected_per_thread_final, jobinfo=expected_jobinfo_cmd
+            shlex.split(
+                "qsub -cwd -V -sync y -pe threads 4 -l h_vmem={mem}G -l m_mem_free={mem}G "
+                "{jobinfo} -q q1 cluster_opt_1 cluster_opt_2 cluster_opt_3 "
+                "real_jobscript.sh".format(
+                    mem=expected_per_thread_final, jobinfo=expected_jobinfo_cmd
+                )
             ),
         )
 
@@ -130,6 +154,7 @@ class TestSubmitter(unittest.TestCase):
         uge_submit = Submitter(jobscript=argv[-1], cluster_cmds=argv[1:-1])
         self.assertRaises(JobidNotFoundError, uge_submit.submit)
 
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
     @patch.object(CookieCutter, "get_log_dir", return_value="logdir")
     @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
     @patch.object(CookieCutter, "get_default_threads", return_value=8)
@@ -138,7 +163,7 @@ class TestSubmitter(unittest.TestCase):
     @patch.object(
             OSLayer,
             "run_process",
-            return_value=("0", "Your job 123456 was submitted.", "",),
+            return_value=(0, "Your job 123456 was submitted.", "",),
     )
     @patch.object(OSLayer, "print")
     def test_submit_successfull_submit(
@@ -190,10 +215,12 @@ class TestSubmitter(unittest.TestCase):
         remove_file_mock.assert_any_call(expected_outlog)
         remove_file_mock.assert_any_call(expected_errlog)
         run_process_mock.assert_called_once_with(
-            "qsub -cwd -pe threads 4 -l h_vmem={mem}G -l m_mem_free={mem}G "
-            "{jobinfo} -q q1 cluster_opt_1 cluster_opt_2 cluster_opt_3 "
-            "real_jobscript.sh".format(
-                mem=expected_per_thread_final, jobinfo=expected_jobinfo_cmd
+            shlex.split(
+                "qsub -cwd -V -pe threads 4 -l h_vmem={mem}G -l m_mem_free={mem}G "
+                "{jobinfo} -q q1 cluster_opt_1 cluster_opt_2 cluster_opt_3 "
+                "real_jobscript.sh".format(
+                    mem=expected_per_thread_final, jobinfo=expected_jobinfo_cmd
+                )
             )
         )
         print_mock.assert_called_once_with(
@@ -312,7 +339,7 @@ class TestSubmitter(unittest.TestCase):
         expected_per_thread_decimal = round(expected_mem / expected_threads, 2)
         expected_per_thread_final = math.ceil(expected_per_thread_decimal)
         expected = (
-            "qsub -cwd -pe threads 4 -l h_vmem={mem}G -l m_mem_free={mem}G "
+            "qsub -cwd -V -sync y -pe threads 4 -l h_vmem={mem}G -l m_mem_free={mem}G "
 
             "{jobinfo} -q q1 cluster_opt_1 cluster_opt_2 cluster_opt_3 "
             "-q queue -gpu - -P project "
@@ -321,12 +348,10 @@ class TestSubmitter(unittest.TestCase):
             )
         )
         actual = uge_submit.submit_cmd
-        assert actual == expected
+        assert actual == shlex.split(expected)
 
     def test_rule_name_for_group_returns_groupid_instead(self):
-        jobscript = Path(
-            tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name
-        )
+        jobscript = self.temp_jobscript()
         properties = json.dumps(
             {
                 "type": "group",
@@ -346,9 +371,7 @@ class TestSubmitter(unittest.TestCase):
         assert actual == expected
 
     def test_is_group_jobtype_when_group_is_present(self):
-        jobscript = Path(
-            tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name
-        )
+        jobscript = self.temp_jobscript()
         properties = json.dumps(
             {
                 "type": "group",
@@ -365,9 +388,7 @@ class TestSubmitter(unittest.TestCase):
         assert uge_submit.is_group_jobtype
 
     def test_is_group_jobtype_when_group_is_not_present(self):
-        jobscript = Path(
-            tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name
-        )
+        jobscript = self.temp_jobscript()
         properties = json.dumps(
             {"jobid": "a9722c33-51ba-5ac4-9f17-bab04c68bc3d"}
         )
@@ -380,9 +401,7 @@ class TestSubmitter(unittest.TestCase):
         assert not uge_submit.is_group_jobtype
 
     def test_jobid_for_group_returns_first_segment_of_uuid(self):
-        jobscript = Path(
-            tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name
-        )
+        jobscript = self.temp_jobscript()
         properties = json.dumps(
             {
                 "type": "group",
@@ -402,9 +421,7 @@ class TestSubmitter(unittest.TestCase):
         assert actual == expected
 
     def test_jobid_for_non_group_returns_job_number(self):
-        jobscript = Path(
-            tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name
-        )
+        jobscript = self.temp_jobscript()
         properties = json.dumps(
             {
                 "type": "single",
@@ -425,9 +442,7 @@ class TestSubmitter(unittest.TestCase):
         assert actual == expected
 
     def test_jobname_for_non_group(self):
-        jobscript = Path(
-            tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name
-        )
+        jobscript = self.temp_jobscript()
         properties = json.dumps(
             {
                 "type": "single",
@@ -448,9 +463,7 @@ class TestSubmitter(unittest.TestCase):
         assert actual == expected
 
     def test_jobname_for_group(self):
-        jobscript = Path(
-            tempfile.NamedTemporaryFile(delete=False, suffix=".sh").name
-        )
+        jobscript = self.temp_jobscript()
         properties = json.dumps(
             {
                 "type": "group",
@@ -469,6 +482,427 @@ class TestSubmitter(unittest.TestCase):
 
         assert actual == expected
 
+    @patch.object(CookieCutter, "get_log_dir", return_value="logdir")
+    @patch.object(CookieCutter, "get_use_sharded_logs", return_value=True)
+    @patch.object(CookieCutter, "get_log_shard_width", return_value=2)
+    def test_sharded_logs_are_named_per_run(self, *mocks):
+        directory = Path(self.temp_dir()) / "tmp.abc"
+        directory.mkdir()
+        jobscript = directory / "snakejob.search.2.sh"
+        properties = json.dumps({"rule": "search", "wildcards": {"i": "0"}})
+        jobscript.write_text("#!/bin/sh\n# properties = {}\n".format(properties))
+        uge_submit = Submitter(jobscript=str(jobscript))
+        layout = uge_submit.log_layout
+        run_id = layout.run_id(jobscript)
+
+        self.assertEqual(uge_submit.log_name, "smk.search.0." + run_id)
+        self.assertEqual(
+            uge_submit.outlog,
+            Path("logdir")
+            / "search"
+            / layout.shard(uge_submit.log_name)
+            / "smk.search.0.{}.out".format(run_id),
+        )
+        self.assertEqual(uge_submit.errlog.parent, uge_submit.outlog.parent)
+
+    @patch.object(CookieCutter, "get_use_sharded_logs", return_value=True)
+    @patch.object(CookieCutter, "get_log_shard_width", return_value=1)
+    @patch.object(OSLayer, "remove_file")
+    @patch("tests.src.log_layout.subprocess.Popen")
+    def test_sharded_logs_are_not_removed_on_submission(
+        self, popen_mock, remove_file_mock, *mocks
+    ):
+        log_dir = Path(self.temp_dir())
+        jobscript = log_dir / "snakejob.sh"
+        jobscript.write_text(Path("real_jobscript.sh").read_text())
+        with patch.object(CookieCutter, "get_log_dir", return_value=str(log_dir)):
+            uge_submit = Submitter(jobscript=str(jobscript))
+            uge_submit._create_logdir()
+            uge_submit._remove_previous_logs()
+
+            self.assertTrue(uge_submit.logdir.is_dir())
+            self.assertEqual(len(list(uge_submit.logdir.parent.iterdir())), 16)
+        remove_file_mock.assert_not_called()
+        popen_mock.assert_called_once()
+
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(CookieCutter, "get_auto_sizing_percentile", return_value=95)
+    @patch.object(CookieCutter, "get_auto_sizing_headroom", return_value=0.0)
+    @patch.object(CookieCutter, "get_auto_sizing_min_samples", return_value=2)
+    def test_auto_sizing_lowers_memory(self, *mocks):
+        log_dir = self.temp_dir()
+        history = ResourceHistory(log_dir)
+        for jobid in (1, 2):
+            history.record_submission(jobid, "search_fasta_on_index", 0)
+            history.record_usage(jobid, ResourceUsage(1500, 100, 100))
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            uge_submit = Submitter(jobscript="real_jobscript.sh")
+
+            self.assertEqual(uge_submit.requested_mem_mb, Memory(1500, Unit.MEGA))
+            # the slots stay those of the threads the job runs with
+            self.assertEqual(
+                uge_submit.resources_cmd, "-pe threads 4 -l h_vmem=1G -l m_mem_free=1G"
+            )
+
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(CookieCutter, "get_auto_sizing_percentile", return_value=95)
+    @patch.object(CookieCutter, "get_auto_sizing_headroom", return_value=0.0)
+    @patch.object(CookieCutter, "get_auto_sizing_min_samples", return_value=2)
+    def test_retries_get_the_memory_of_the_rule(self, *mocks):
+        log_dir = self.temp_dir()
+        history = ResourceHistory(log_dir)
+        for jobid in (1, 2):
+            history.record_submission(jobid, "search_fasta_on_index", 0)
+            history.record_usage(jobid, ResourceUsage(1500, 100, 100))
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            uge_submit = Submitter(jobscript="real_jobscript.sh")
+            history.record_submission(3, "search_fasta_on_index", 0, uge_submit.retry_key)
+            history.record_failure(3, None)
+
+            retry = Submitter(jobscript="real_jobscript.sh")
+            self.assertTrue(retry.is_retry)
+            self.assertEqual(retry.requested_mem_mb, retry.mem_mb)
+
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(CookieCutter, "get_auto_sizing_percentile", return_value=95)
+    @patch.object(CookieCutter, "get_auto_sizing_headroom", return_value=0.0)
+    @patch.object(CookieCutter, "get_auto_sizing_min_samples", return_value=1)
+    def test_auto_sizing_never_exceeds_the_request_of_the_rule(self, *mocks):
+        log_dir = self.temp_dir()
+        history = ResourceHistory(log_dir)
+        history.record_submission(1, "search_fasta_on_index", 0)
+        history.record_usage(1, ResourceUsage(100000, 100, 1))
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            uge_submit = Submitter(jobscript="real_jobscript.sh")
+
+            self.assertEqual(uge_submit.requested_mem_mb, uge_submit.mem_mb)
+
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(CookieCutter, "get_auto_sizing_percentile", return_value=95)
+    @patch.object(CookieCutter, "get_auto_sizing_headroom", return_value=0.2)
+    @patch.object(CookieCutter, "get_auto_sizing_min_samples", return_value=5)
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(OSLayer, "mkdir")
+    @patch.object(OSLayer, "remove_file")
+    @patch.object(
+        OSLayer,
+        "run_process",
+        return_value=(0, 'Your job 123456 ("smk.a") has been submitted', ""),
+    )
+    def test_submitted_jobs_are_registered_for_auto_sizing(self, *mocks):
+        log_dir = self.temp_dir()
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            Submitter(jobscript="real_jobscript.sh").submit_job()
+
+        self.assertTrue(ResourceHistory(log_dir).is_registered("123456"))
+
+    def jobscript_with(self, properties: dict) -> str:
+        jobscript = self.temp_jobscript()
+        jobscript.write_text(
+            "#!/bin/sh\n# properties = {}\n".format(
+                json.dumps(dict(dict(rule="a", threads=1), **properties))
+            )
+        )
+        return str(jobscript)
+
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    def test_runtime_is_requested_as_h_rt(self, *mocks):
+        uge_submit = Submitter(
+            jobscript=self.jobscript_with({"cluster": {"runtime": 90}})
+        )
+        self.assertEqual(
+            uge_submit.resources_cmd, "-l h_vmem=1G -l m_mem_free=1G -l h_rt=1:30:00"
+        )
+
+    def test_runtime_of_resources_takes_precedence(self):
+        uge_submit = Submitter(
+            jobscript=self.jobscript_with(
+                {"resources": {"runtime": 5}, "cluster": {"runtime": 90}}
+            )
+        )
+        self.assertEqual(uge_submit.runtime, 5)
+
+    @patch.object(CookieCutter, "get_default_queue", return_value="default.q")
+    def test_jobs_are_routed_to_the_first_queue_that_fits(self, *mocks):
+        config = Config({"__queues__": {"short.q": 60, "long.q": "48:00:00"}})
+
+        def queue_for(properties):
+            return Submitter(
+                jobscript=self.jobscript_with(properties), uge_config=config
+            ).queue
+
+        self.assertEqual(queue_for({"resources": {"runtime": 60}}), "short.q")
+        self.assertEqual(queue_for({"resources": {"runtime": 61}}), "long.q")
+        self.assertEqual(queue_for({"resources": {"runtime": 2881}}), "default.q")
+        self.assertEqual(queue_for({}), "default.q")
+        self.assertEqual(
+            queue_for({"resources": {"runtime": 1}, "cluster": {"queue": "q1"}}),
+            "q1",
+        )
+
+    @patch.object(CookieCutter, "get_default_queue", return_value="")
+    def test_queue_of_the_rule_is_not_overridden(self, *mocks):
+        config = Config({"__queues__": {"short.q": 60}, "a": "-q special.q"})
+        uge_submit = Submitter(
+            jobscript=self.jobscript_with({"resources": {"runtime": 5}}),
+            uge_config=config,
+        )
+        self.assertIsNone(uge_submit.routed_queue)
+
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="off")
+    @patch.object(CookieCutter, "get_estimate_runtime", return_value=True)
+    @patch.object(CookieCutter, "get_runtime_percentile", return_value=100)
+    @patch.object(CookieCutter, "get_runtime_headroom", return_value=0.5)
+    @patch.object(CookieCutter, "get_auto_sizing_min_samples", return_value=1)
+    def test_runtime_is_estimated_from_earlier_jobs(self, *mocks):
+        log_dir = self.temp_dir()
+        history = ResourceHistory(log_dir)
+        history.record_submission(1, "a", 0)
+        history.record_usage(1, ResourceUsage(100, 600, 1200))
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            uge_submit = Submitter(jobscript=self.jobscript_with({}))
+            self.assertEqual(uge_submit.requested_runtime, 30)
+
+            uge_submit = Submitter(
+                jobscript=self.jobscript_with({}),
+                uge_config=Config({"a": "-l h_rt=2:00:00"}),
+            )
+            self.assertIsNone(uge_submit.requested_runtime)
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    def test_jobs_of_pilot_rules_that_fit_a_worker_are_enqueued(self, *mocks):
+        config = Config({"__pilot__": {"rules": ["a"], "threads": 2, "mem_mb": 2000}})
+
+        def pilot_for(properties):
+            return Submitter(
+                jobscript=self.jobscript_with(properties), uge_config=config
+            ).pilot
+
+        self.assertIsNotNone(pilot_for({}))
+        self.assertIsNotNone(pilot_for({"threads": 2, "resources": {"mem_mb": 2000}}))
+        self.assertIsNone(pilot_for({"threads": 4}))
+        self.assertIsNone(pilot_for({"resources": {"mem_mb": 4000}}))
+        self.assertIsNone(pilot_for({"rule": "b"}))
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    def test_jobs_longer_than_a_worker_are_not_enqueued(self, *mocks):
+        config = Config({"__pilot__": {"rules": ["a"], "runtime": "1:00:00"}})
+
+        def pilot_for(properties):
+            return Submitter(
+                jobscript=self.jobscript_with(properties), uge_config=config
+            ).pilot
+
+        self.assertIsNotNone(pilot_for({"resources": {"runtime": 60}}))
+        self.assertIsNone(pilot_for({"resources": {"runtime": 61}}))
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    @patch.object(CookieCutter, "get_default_queue", return_value="default.q")
+    @patch.object(CookieCutter, "get_use_sharded_logs", return_value=False)
+    def test_pilot_jobs_start_workers_instead_of_being_submitted(self, *mocks):
+        log_dir = self.temp_dir()
+        config = Config(
+            {"__pilot__": {"rules": ["a"], "workers": 2, "runtime": 120, "args": "-P p"}}
+        )
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir), patch(
+            "tests.src.scheduler_backend.CliBackend.submit", side_effect=["11", "12"]
+        ) as submit_mock:
+            uge_submit = Submitter(jobscript=self.jobscript_with({}), uge_config=config)
+            jobid, outlog = uge_submit.submit_job().split()
+            self.assertTrue(jobid.startswith("pilot:"))
+            self.assertEqual(outlog, str(uge_submit.outlog))
+            task_id = jobid[len("pilot:"):]
+            self.assertEqual(uge_submit.pilot_queue.status(task_id), "running")
+        self.assertEqual(submit_mock.call_count, 2)
+        args, worker_script = submit_mock.call_args[0]
+        self.assertTrue(worker_script.endswith("pilot.py"))
+        self.assertEqual(args[:8], ["-cwd", "-V", "-b", "y", "-j", "y", "-N", "smk.pilot"])
+        self.assertIn("UGE_PILOT_RUNTIME=7200", args[args.index("-v") + 1])
+        self.assertEqual(
+            args[-10:],
+            shlex.split("-l h_vmem=4G -l m_mem_free=4G -l h_rt=2:00:00 -q default.q -P p"),
+        )
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    def test_jobs_of_local_rules_that_fit_the_lane_run_locally(self, *mocks):
+        config = Config({"__local__": {"rules": ["a"], "max_mem_mb": 2000}})
+
+        def local_lane_for(properties):
+            return Submitter(
+                jobscript=self.jobscript_with(properties), uge_config=config
+            ).local_lane
+
+        self.assertIsNotNone(local_lane_for({}))
+        self.assertIsNone(local_lane_for({"threads": 2}))
+        self.assertIsNone(local_lane_for({"resources": {"mem_mb": 4000}}))
+        self.assertIsNone(local_lane_for({"rule": "b"}))
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="off")
+    @patch.object(CookieCutter, "get_estimate_runtime", return_value=True)
+    @patch.object(CookieCutter, "get_runtime_percentile", return_value=100)
+    @patch.object(CookieCutter, "get_runtime_headroom", return_value=0)
+    @patch.object(CookieCutter, "get_auto_sizing_min_samples", return_value=1)
+    def test_jobs_run_locally_once_earlier_jobs_were_short(self, *mocks):
+        log_dir = self.temp_dir()
+        history = ResourceHistory(log_dir)
+        history.record_submission(1, "a", 0)
+        history.record_usage(1, ResourceUsage(100, 30, 30))
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir):
+            for max_runtime, runs_locally in ((1, True), ("0:00:30", False)):
+                config = Config({"__local__": {"max_runtime": max_runtime}})
+                uge_submit = Submitter(jobscript=self.jobscript_with({}), uge_config=config)
+                self.assertEqual(uge_submit.local_lane is not None, runs_locally)
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    @patch.object(CookieCutter, "get_use_sharded_logs", return_value=False)
+    def test_jobs_are_submitted_when_the_local_lane_is_full(self, *mocks):
+        config = Config({"__local__": {"rules": ["a"]}})
+        with patch.object(
+            CookieCutter, "get_log_dir", return_value=self.temp_dir()
+        ), patch(
+            "tests.src.local_lane.LocalLane.start", side_effect=["local:1-a", None]
+        ), patch.object(
+            Submitter, "_submit_cmd_and_get_external_job_id", return_value=123
+        ):
+            uge_submit = Submitter(jobscript=self.jobscript_with({}), uge_config=config)
+            self.assertEqual(
+                uge_submit.submit_job(), "local:1-a {}".format(uge_submit.outlog)
+            )
+            self.assertEqual(uge_submit.submit_job(), "123 {}".format(uge_submit.outlog))
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    @patch.object(CookieCutter, "get_default_queue", return_value="")
+    @patch.object(CookieCutter, "get_use_sharded_logs", return_value=False)
+    def test_jobs_submitted_ahead_are_held_on_their_parents(self, *mocks):
+        log_dir = self.temp_dir()
+        config = Config({"__local__": {"rules": ["a"]}, "__pilot__": {"rules": ["a"]}})
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir), patch.object(
+            Submitter, "_submit_cmd_and_get_external_job_id", side_effect=[123, 124]
+        ):
+            parent = Submitter(
+                jobscript=self.jobscript_with({}), uge_config=config, dependencies=[]
+            )
+            self.assertIsNone(parent.local_lane)
+            self.assertIsNone(parent.pilot)
+            self.assertEqual(parent.dependency_args, [])
+            parent.submit_job()
+
+            child = Submitter(
+                jobscript=self.jobscript_with({"rule": "b"}),
+                dependencies=["123", str(parent.outlog), "17.2", "logs/b.out"],
+            )
+            self.assertEqual(
+                child.dependency_args,
+                [
+                    "-hold_jid",
+                    "123,17",
+                    "-v",
+                    "UGE_PARENT_JOBS=123={}:17.2=logs/b.out".format(parent.outlog),
+                ],
+            )
+            self.assertFalse(child.use_array_coalescing)
+            child.submit_job()
+            self.assertEqual(
+                JobidMap(log_dir).lookup(124)["parents"][0],
+                dict(jobid="123", outlog=str(parent.outlog)),
+            )
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    def test_jobs_cannot_be_held_on_jobs_off_the_cluster(self, *mocks):
+        with patch.object(CookieCutter, "get_log_dir", return_value=self.temp_dir()):
+            uge_submit = Submitter(
+                jobscript=self.jobscript_with({}),
+                dependencies=["local:1-a", "logs/a.out"],
+            )
+            with self.assertRaises(QsubInvocationError):
+                uge_submit.submit_job()
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_default_threads", return_value=1)
+    @patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+    @patch.object(CookieCutter, "get_default_queue", return_value="")
+    @patch.object(CookieCutter, "get_use_sharded_logs", return_value=False)
+    @patch.object(CookieCutter, "get_use_run_state", return_value=True)
+    def test_restarted_workflow_reattaches_to_jobs_in_flight(self, *mocks):
+        log_dir = self.temp_dir()
+        jobscript = self.jobscript_with({"jobid": 3})
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir), patch.object(
+            Submitter, "_submit_cmd_and_get_external_job_id", side_effect=[123, 124]
+        ) as submit_mock, patch.object(
+            OSLayer, "run_process", return_value=(0, "job_number: 123", "")
+        ) as qstat_mock:
+            uge_submit = Submitter(jobscript=jobscript)
+            self.assertEqual(uge_submit.submit_job(), "123 {}".format(uge_submit.outlog))
+            job = RunState(log_dir).job(123)
+            self.assertEqual(job["snakemake_jobid"], "3")
+            self.assertEqual(job["resources"], "-l h_vmem=1G -l m_mem_free=1G")
+
+            restarted = Submitter(jobscript=self.jobscript_with({"jobid": 7}))
+            self.assertEqual(restarted.submit_job(), "123 {}".format(uge_submit.outlog))
+            qstat_mock.assert_called_once_with(["qstat", "-j", "123"])
+            self.assertEqual(RunState(log_dir).job(123)["snakemake_jobid"], "7")
+
+            qstat_mock.return_value = (1, "", "Following jobs do not exist: 123")
+            self.assertEqual(restarted.submit_job(), "124 {}".format(uge_submit.outlog))
+            self.assertEqual(submit_mock.call_count, 2)
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_use_run_state", return_value=True)
+    def test_finished_jobs_are_not_reattached_to(self, *mocks):
+        log_dir = self.temp_dir()
+        outlog = Path(log_dir) / "a.out"
+        jobscript = self.jobscript_with({})
+        fingerprint = job_fingerprint(read_job_properties(jobscript))
+        RunState(log_dir).record_submission("123", "3", fingerprint, outlog, "")
+        with patch.object(CookieCutter, "get_log_dir", return_value=log_dir), patch.object(
+            OSLayer, "run_process", return_value=(0, "job_number: 123", "")
+        ):
+            uge_submit = Submitter(jobscript=jobscript)
+            self.assertIsNotNone(uge_submit._reattach())
+            JobSentinel(outlog).write(state="finished", job_id=123, exit_status=0)
+            self.assertIsNone(uge_submit._reattach())
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_use_run_state", return_value=True)
+    @patch.object(CookieCutter, "get_use_sharded_logs", return_value=True)
+    @patch.object(CookieCutter, "get_log_shard_width", return_value=2)
+    @patch.object(CookieCutter, "get_auto_sizing", return_value="memory")
+    @patch.object(CookieCutter, "get_scheduler_backend", return_value="cli")
+    def test_objects_of_the_features_are_built_once(self, *mocks):
+        with patch.object(CookieCutter, "get_log_dir", return_value=self.temp_dir()):
+            uge_submit = Submitter(jobscript=self.jobscript_with({}))
+            for name in (
+                "resource_history",
+                "log_layout",
+                "jobid_map",
+                "scheduler",
+                "run_state",
+                "pilot_queue",
+            ):
+                self.assertIs(getattr(uge_submit, name), getattr(uge_submit, name))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src.CookieCutter import CookieCutter
+from tests.src.OSLayer import OSLayer
+from tests.src.uge_config import Config
+from tests.src.uge_submit_broker import SubmitBroker
+from tests.src.uge_submit_client import submit_via_broker
+
+JOBSCRIPT = str(Path(__file__).parent / "real_jobscript.sh")
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+@patch.object(CookieCutter, "get_log_dir", return_value="logdir")
+@patch.object(CookieCutter, "get_default_mem_mb", return_value=1000)
+@patch.object(CookieCutter, "get_default_threads", return_value=1)
+@patch.object(CookieCutter, "get_submission_mode", return_value="async")
+@patch.object(OSLayer, "mkdir")
+@patch.object(OSLayer, "remove_file")
+class TestSubmitBroker(unittest.TestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.socket_path = self.directory / "broker.sock"
+        self.config_file = self.directory / "uge.yaml"
+        self.broker = SubmitBroker(
+            self.socket_path,
+            workers=2,
+            idle_timeout=0.5,
+            config_file=self.config_file,
+        )
+
+    @patch.object(
+        OSLayer, "run_process", return_value=(0, 'Your job 123 ("a") has been submitted', "")
+    )
+    def test_submit_returns_parameters_to_status_script(self, run_process_mock, *mocks):
+        response = self.broker.submit([JOBSCRIPT])
+        self.assertEqual(response["returncode"], 0)
+        self.assertTrue(response["stdout"].startswith("123 logdir/"))
+
+    @patch.object(OSLayer, "run_process", return_value=(1, "", "denied"))
+    def test_failed_submit_returns_error(self, *mocks):
+        response = self.broker.submit([JOBSCRIPT])
+        self.assertEqual(response["returncode"], 1)
+        self.assertIn("QsubInvocationError", response["stderr"])
+
+    def test_config_is_read_again_when_changed(self, *mocks):
+        self.assertFalse(self.broker.uge_config)
+        self.config_file.write_text("__default__: -l foo=1\n")
+        self.assertEqual(self.broker.uge_config.default_params(), "-l foo=1")
+        os.utime(str(self.config_file), (0, 0))
+        self.config_file.write_text("__default__: -l foo=2\n")
+        os.utime(str(self.config_file), (1, 1))
+        self.assertEqual(self.broker.uge_config.default_params(), "-l foo=2")
+
+    def test_config_is_read_through_the_cache(self, *mocks):
+        cache_path = self.directory / ".uge.yaml.cache"
+        broker = SubmitBroker(
+            self.socket_path,
+            workers=1,
+            idle_timeout=0.5,
+            config_file=self.config_file,
+            config_cache=cache_path,
+        )
+        self.config_file.write_text("__default__: -l foo=1\n")
+        os.utime(str(self.config_file), (0, 0))
+        with patch.object(Config, "from_file", wraps=Config.from_file) as from_file:
+            self.assertEqual(broker.uge_config.default_params(), "-l foo=1")
+        from_file.assert_called_once_with(self.config_file, cache_path=cache_path)
+        self.assertTrue(cache_path.exists())
+
+    @patch.object(
+        OSLayer, "run_process", return_value=(0, 'Your job 124 ("a") has been submitted', "")
+    )
+    def test_client_submits_over_socket(self, *mocks):
+        async def scenario():
+            serving = asyncio.ensure_future(self.broker.serve())
+            while not self.socket_path.exists():
+                await asyncio.sleep(0.01)
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                None, submit_via_broker, self.socket_path, [JOBSCRIPT]
+            )
+            await serving
+            return response
+
+        self.assertEqual(run(scenario())["returncode"], 0)
+        self.assertFalse(self.socket_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import io
+import json
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.src import uge_submit_client
+from tests.src.CookieCutter import CookieCutter
+from tests.src.uge_submit_client import (
+    BrokerUnavailable,
+    broker_socket_path,
+    submit_via_broker,
+)
+
+
+def serve_once(socket_path: Path, response: bytes) -> threading.Thread:
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen(1)
+    requests = []
+
+    def answer():
+        connection, _ = server.accept()
+        with connection, server:
+            requests.append(json.loads(connection.makefile().readline()))
+            connection.sendall(response)
+
+    thread = threading.Thread(target=answer)
+    thread.requests = requests
+    thread.start()
+    return thread
+
+
+class TestBrokerSocketPath(unittest.TestCase):
+    environment = dict(PATH="/bin", HOME="/home/a")
+
+    def test_one_socket_per_workdir(self):
+        self.assertEqual(
+            broker_socket_path("/work/a", "logs", self.environment),
+            broker_socket_path("/work/a", "logs", dict(self.environment)),
+        )
+        self.assertNotEqual(
+            broker_socket_path("/work/a", "/logs", self.environment),
+            broker_socket_path("/work/b", "/logs", self.environment),
+        )
+
+    def test_one_socket_per_environment(self):
+        self.assertNotEqual(
+            broker_socket_path("/work/a", "logs", self.environment),
+            broker_socket_path(
+                "/work/a", "logs", dict(self.environment, PATH="/opt/tool/bin")
+            ),
+        )
+
+
+class TestSubmitViaBroker(unittest.TestCase):
+    def setUp(self):
+        self.socket_path = Path(tempfile.mkdtemp()) / "broker.sock"
+
+    def test_missing_broker_is_unavailable(self):
+        with self.assertRaises(BrokerUnavailable):
+            submit_via_broker(self.socket_path, ["job.sh"])
+
+    def test_broker_response_is_returned(self):
+        response = dict(returncode=0, stdout="123 logs/a.out\n", stderr="")
+        thread = serve_once(self.socket_path, (json.dumps(response) + "\n").encode())
+        self.assertEqual(
+            submit_via_broker(self.socket_path, ["-l h_rt=1:00:00", "job.sh"]),
+            response,
+        )
+        thread.join()
+        self.assertEqual(thread.requests[0]["argv"], ["-l h_rt=1:00:00", "job.sh"])
+
+    def test_broken_response_is_a_failed_submission(self):
+        thread = serve_once(self.socket_path, b"")
+        response = submit_via_broker(self.socket_path, ["job.sh"])
+        thread.join()
+        self.assertEqual(response["returncode"], 1)
+
+
+class TestMain(unittest.TestCase):
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_log_dir", return_value="logs")
+    @patch.object(uge_submit_client, "SUBMIT_BROKER_START_TIMEOUT", 0)
+    @patch.object(uge_submit_client, "start_submit_broker")
+    @patch.object(uge_submit_client, "submit_without_broker", return_value=0)
+    def test_submits_without_broker_if_it_does_not_start(
+        self, submit_without_broker_mock, start_mock, *mocks
+    ):
+        with patch.object(
+            uge_submit_client, "broker_socket_path",
+            return_value=Path(tempfile.mkdtemp()) / "broker.sock",
+        ):
+            self.assertEqual(uge_submit_client.main(["job.sh"]), 0)
+        start_mock.assert_called_once_with()
+        submit_without_broker_mock.assert_called_once_with(["job.sh"])
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="async")
+    @patch.object(CookieCutter, "get_log_dir", return_value="logs")
+    @patch("sys.stdout", new_callable=io.StringIO)
+    def test_prints_broker_output(self, stdout_mock, *mocks):
+        socket_path = Path(tempfile.mkdtemp()) / "broker.sock"
+        response = dict(returncode=0, stdout="123 logs/a.out\n", stderr="")
+        thread = serve_once(socket_path, (json.dumps(response) + "\n").encode())
+        with patch.object(
+            uge_submit_client, "broker_socket_path", return_value=socket_path
+        ):
+            self.assertEqual(uge_submit_client.main(["job.sh"]), 0)
+        thread.join()
+        self.assertEqual(stdout_mock.getvalue(), "123 logs/a.out\n")
+
+    @patch.object(CookieCutter, "get_submission_mode", return_value="sync")
+    @patch.object(uge_submit_client, "submit_without_broker", return_value=0)
+    def test_sync_mode_does_not_use_broker(self, submit_without_broker_mock, *mocks):
+        uge_submit_client.main(["job.sh"])
+        submit_without_broker_mock.assert_called_once_with(["job.sh"])
+
+
+if __name__ == "__main__":
+    unittest.main()
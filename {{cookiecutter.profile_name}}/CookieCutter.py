@@ -1,3 +1,6 @@
+from typing import Dict
+
+
 class CookieCutter:
     """
     Cookie Cutter wrapper
@@ -11,14 +14,86 @@ class CookieCutter:
     def get_default_mem_mb() -> int:
         return int("{{cookiecutter.default_mem_mb}}")
 
+    @staticmethod
+    def get_auto_sizing() -> str:
+        return "{{cookiecutter.auto_sizing}}"
+
+    @staticmethod
+    def get_auto_sizing_percentile() -> float:
+        return float("{{cookiecutter.auto_sizing_percentile}}")
+
+    @staticmethod
+    def get_auto_sizing_headroom() -> float:
+        return float("{{cookiecutter.auto_sizing_headroom}}")
+
+    @staticmethod
+    def get_auto_sizing_min_samples() -> int:
+        return int("{{cookiecutter.auto_sizing_min_samples}}")
+
+    @staticmethod
+    def get_estimate_runtime() -> bool:
+        return "{{cookiecutter.estimate_runtime}}" == "True"
+
+    @staticmethod
+    def get_runtime_percentile() -> float:
+        return float("{{cookiecutter.runtime_percentile}}")
+
+    @staticmethod
+    def get_runtime_headroom() -> float:
+        return float("{{cookiecutter.runtime_headroom}}")
+
     @staticmethod
     def get_log_dir() -> str:
         return "{{cookiecutter.default_cluster_logdir}}"
 
+    @staticmethod
+    def get_use_sharded_logs() -> bool:
+        return "{{cookiecutter.use_sharded_logs}}" == "True"
+
+    @staticmethod
+    def get_log_shard_width() -> int:
+        return int("{{cookiecutter.log_shard_width}}")
+
     @staticmethod
     def get_default_queue() -> str:
         return "{{cookiecutter.default_queue}}"
 
+    @staticmethod
+    def get_submission_mode() -> str:
+        return "{{cookiecutter.submission_mode}}"
+
+    @staticmethod
+    def get_scheduler_backend() -> str:
+        return "{{cookiecutter.scheduler_backend}}"
+
+    @staticmethod
+    def get_use_array_coalescing() -> bool:
+        return "{{cookiecutter.use_array_coalescing}}" == "True"
+
+    @staticmethod
+    def get_array_coalescing_window() -> float:
+        return float("{{cookiecutter.array_coalescing_window}}")
+
+    @staticmethod
+    def get_array_coalescing_max_tasks() -> int:
+        return int("{{cookiecutter.array_coalescing_max_tasks}}")
+
+    @staticmethod
+    def get_immediate_submit() -> bool:
+        return "{{cookiecutter.immediate_submit}}" == "True"
+
+    @staticmethod
+    def get_use_submit_broker() -> bool:
+        return "{{cookiecutter.use_submit_broker}}" == "True"
+
+    @staticmethod
+    def get_submit_broker_workers() -> int:
+        return int("{{cookiecutter.submit_broker_workers}}")
+
+    @staticmethod
+    def get_submit_broker_idle_timeout() -> float:
+        return float("{{cookiecutter.submit_broker_idle_timeout}}")
+
     @staticmethod
     def get_log_status_checks() -> bool:
         return "{{cookiecutter.log_status_checks}}" == "True"
@@ -35,4 +110,87 @@ class CookieCutter:
     def get_time_between_qstat_checks() -> float:
         return float("{{cookiecutter.time_between_qstat_checks}}")
 
+    @staticmethod
+    def get_use_qstat_snapshot() -> bool:
+        return "{{cookiecutter.use_qstat_snapshot}}" == "True"
+
+    @staticmethod
+    def get_qstat_snapshot_ttl() -> float:
+        return float("{{cookiecutter.qstat_snapshot_ttl}}")
+
+    @staticmethod
+    def get_use_accounting_index() -> bool:
+        return "{{cookiecutter.use_accounting_index}}" == "True"
+
+    @staticmethod
+    def get_use_status_server() -> bool:
+        return "{{cookiecutter.use_status_server}}" == "True"
+
+    @staticmethod
+    def get_status_server_poll_interval() -> float:
+        return float("{{cookiecutter.status_server_poll_interval}}")
+
+    @staticmethod
+    def get_status_server_idle_timeout() -> float:
+        return float("{{cookiecutter.status_server_idle_timeout}}")
+
+    @staticmethod
+    def get_use_adaptive_backoff() -> bool:
+        return "{{cookiecutter.use_adaptive_backoff}}" == "True"
+
+    @staticmethod
+    def get_qstat_backoff_base_delay() -> float:
+        return float("{{cookiecutter.qstat_backoff_base_delay}}")
+
+    @staticmethod
+    def get_use_circuit_breaker() -> bool:
+        return "{{cookiecutter.use_circuit_breaker}}" == "True"
+
+    @staticmethod
+    def get_circuit_breaker_threshold() -> int:
+        return int("{{cookiecutter.circuit_breaker_threshold}}")
 
+    @staticmethod
+    def get_circuit_breaker_reset_timeout() -> float:
+        return float("{{cookiecutter.circuit_breaker_reset_timeout}}")
+
+    @staticmethod
+    def get_use_log_watcher() -> bool:
+        return "{{cookiecutter.use_log_watcher}}" == "True"
+
+    @staticmethod
+    def get_log_watcher_poll_interval() -> float:
+        return float("{{cookiecutter.log_watcher_poll_interval}}")
+
+    @staticmethod
+    def get_hung_job_policy() -> str:
+        return "{{cookiecutter.hung_job_policy}}"
+
+    @staticmethod
+    def get_hung_job_min_time() -> float:
+        return float("{{cookiecutter.hung_job_min_time}}")
+
+    @staticmethod
+    def get_hung_job_max_cpu_ratio() -> float:
+        return float("{{cookiecutter.hung_job_max_cpu_ratio}}")
+
+    @staticmethod
+    def get_use_scheduler_metrics() -> bool:
+        return "{{cookiecutter.use_scheduler_metrics}}" == "True"
+
+    @staticmethod
+    def get_use_rate_limiter() -> bool:
+        return "{{cookiecutter.use_rate_limiter}}" == "True"
+
+    @staticmethod
+    def get_use_run_state() -> bool:
+        return "{{cookiecutter.use_run_state}}" == "True"
+
+    @staticmethod
+    def get_rate_limits() -> Dict[str, float]:
+        return {
+            "qsub": float("{{cookiecutter.rate_limit_qsub}}"),
+            "qstat": float("{{cookiecutter.rate_limit_qstat}}"),
+            "qacct": float("{{cookiecutter.rate_limit_qacct}}"),
+            "qdel": float("{{cookiecutter.rate_limit_qdel}}"),
+        }
@@ -1,23 +1,40 @@
+import shlex
 import subprocess
-import uuid
+import tempfile
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Tuple, List
+from typing import IO, Iterator, Tuple, List, Union
 
 stdout = str
 stderr = str
+# an argv list is executed directly, a str is run by /bin/sh
+Command = Union[List[str], str]
 
 
 class TailError(Exception):
     pass
 
 
+class ProcessStreamError(Exception):
+    pass
+
+
 class OSLayer:
     """
     This class provides an abstract layer to communicating with the OS.
     Its main purpose is to enable OS operations mocking, so we don't actually need to
     make file operations or create processes.
+
+    If ``metrics`` is set (see metrics.install_metrics), every process run
+    through this layer is counted and timed. If ``rate_limiter`` is set (see
+    rate_limit.install_rate_limiter), scheduler commands wait for a token of
+    the shared rate limit before they are run.
     """
 
+    metrics = None
+    rate_limiter = None
+
     @staticmethod
     def mkdir(directory: Path):
         directory.mkdir(parents=True, exist_ok=True)
@@ -28,22 +45,91 @@ class OSLayer:
             file.unlink()
 
     @staticmethod
-    def run_process(cmd: str) -> Tuple[stdout, stderr]:
-        completed_process = subprocess.run(
-            cmd, check=False, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
+    def run_process(cmd: Command) -> Tuple[stdout, stderr]:
+        if OSLayer.rate_limiter is not None:
+            OSLayer.rate_limiter.acquire(cmd)
+        started = time.monotonic()
+        try:
+            completed_process = subprocess.run(
+                cmd,
+                check=False,
+                shell=isinstance(cmd, str),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError as error:
+            # without a shell, a missing command fails here instead of
+            # with the shell's exit code 127
+            completed_process = subprocess.CompletedProcess(
+                cmd, 127, b"", str(error).encode()
+            )
+        if OSLayer.metrics is not None:
+            OSLayer.metrics.record_call(
+                cmd, completed_process.returncode, time.monotonic() - started
+            )
         return (
             completed_process.returncode,
             completed_process.stdout.decode().strip(),
             completed_process.stderr.decode().strip(),
         )
 
+    @staticmethod
+    @contextmanager
+    def stream_process(cmd: Command) -> Iterator[IO[bytes]]:
+        """
+        Runs cmd and yields its stdout as a pipe, so the output can be parsed
+        while it is produced instead of being buffered in memory first.
+        """
+        if OSLayer.rate_limiter is not None:
+            OSLayer.rate_limiter.acquire(cmd)
+        started = time.monotonic()
+        with tempfile.TemporaryFile() as error_file:
+            try:
+                process = subprocess.Popen(
+                    cmd,
+                    shell=isinstance(cmd, str),
+                    stdout=subprocess.PIPE,
+                    stderr=error_file,
+                )
+            except OSError as error:
+                raise ProcessStreamError(
+                    "{cmd} failed: {error}".format(
+                        cmd=OSLayer.format_command(cmd), error=error
+                    )
+                )
+            try:
+                yield process.stdout
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+                if OSLayer.metrics is not None:
+                    OSLayer.metrics.record_call(
+                        cmd, returncode, time.monotonic() - started
+                    )
+            if returncode != 0:
+                error_file.seek(0)
+                raise ProcessStreamError(
+                    "{cmd} failed with exit code {returncode}: {error}".format(
+                        cmd=OSLayer.format_command(cmd),
+                        returncode=returncode,
+                        error=error_file.read().decode().strip(),
+                    )
+                )
+
+    @staticmethod
+    def format_command(cmd: Command) -> str:
+        if isinstance(cmd, str):
+            return cmd
+        return " ".join(shlex.quote(arg) for arg in cmd)
+
     @staticmethod
     def print(string: str):
         print(string)
 
     @staticmethod
     def get_uuid4_string() -> str:
+        import uuid
+
         return str(uuid.uuid4())
 
     @staticmethod
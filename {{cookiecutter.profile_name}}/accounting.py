@@ -0,0 +1,240 @@
+import os
+from collections import namedtuple
+from contextlib import closing
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import sqlite3
+
+PathLike = Union[str, Path]
+
+
+class AccountingError(Exception):
+    pass
+
+
+AccountingRecord = namedtuple(
+    "AccountingRecord",
+    [
+        "job_number",
+        "task_number",
+        "job_name",
+        "qname",
+        "hostname",
+        "end_time",
+        "failed",
+        "exit_status",
+        "wallclock",
+        "cpu",
+        "maxvmem",
+    ],
+)
+
+
+class AccountingIndex:
+    """
+    Incremental, indexed reader of the UGE accounting file.
+
+    ``qacct -j`` scans the whole accounting file on every call. This reader
+    instead remembers the byte offset up to which it has parsed the file and
+    keeps the parsed records in an SQLite index, so each call only parses the
+    lines appended since the previous one and job lookups hit the index.
+
+    A fresh index starts ``INITIAL_BACKLOG`` bytes before the end of the
+    accounting file rather than at its beginning; jobs that finished before
+    that are left to ``qacct``.
+
+    Field positions follow accounting(5):
+        qname:hostname:group:owner:job_name:job_number:account:priority:
+        submission_time:start_time:end_time:failed:exit_status:ru_wallclock:
+        ... :slots:task_number:cpu:mem:io:category:iow:pe_taskid:maxvmem:...
+    """
+
+    INITIAL_BACKLOG = 64 * 1024 * 1024
+    INDEX_NAME = ".accounting_index.sqlite"
+    FIELDS = {
+        "qname": 0,
+        "hostname": 1,
+        "job_name": 4,
+        "job_number": 5,
+        "end_time": 10,
+        "failed": 11,
+        "exit_status": 12,
+        "wallclock": 13,
+        "task_number": 35,
+        "cpu": 36,
+        "maxvmem": 42,
+    }
+    MIN_FIELDS = max(FIELDS.values()) + 1
+
+    def __init__(self, accounting_file: PathLike, index_dir: PathLike):
+        self._accounting_file = Path(accounting_file)
+        self._index_path = Path(index_dir) / self.INDEX_NAME
+
+    @property
+    def accounting_file(self) -> Path:
+        return self._accounting_file
+
+    @property
+    def index_path(self) -> Path:
+        return self._index_path
+
+    @staticmethod
+    def default_accounting_file() -> Optional[Path]:
+        sge_root = os.environ.get("SGE_ROOT")
+        if not sge_root:
+            return None
+        cell = os.environ.get("SGE_CELL", "default")
+        return Path(sge_root) / cell / "common" / "accounting"
+
+    def lookup(self, jobid: int, task_id: Optional[int] = None) -> AccountingRecord:
+        import sqlite3
+
+        self.update()
+        key = self._key(jobid, task_id)
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    "SELECT {columns} FROM records WHERE key = ?".format(
+                        columns=", ".join(AccountingRecord._fields)
+                    ),
+                    (key,),
+                ).fetchone()
+        except sqlite3.Error as error:
+            raise AccountingError(
+                "cannot read accounting index: {error}".format(error=error)
+            )
+        if row is None:
+            raise AccountingError(
+                "job {key} not found in {path}".format(
+                    key=key, path=self.accounting_file
+                )
+            )
+        return AccountingRecord(*row)
+
+    def update(self):
+        import sqlite3
+
+        try:
+            stat = self.accounting_file.stat()
+        except OSError as error:
+            raise AccountingError(
+                "cannot read accounting file: {error}".format(error=error)
+            )
+        try:
+            self._update(stat)
+        except sqlite3.Error as error:
+            # e.g. the index stayed locked past the timeout, or NFS I/O errors
+            raise AccountingError(
+                "cannot update accounting index: {error}".format(error=error)
+            )
+        except OSError as error:
+            raise AccountingError(
+                "cannot read accounting file: {error}".format(error=error)
+            )
+
+    def _update(self, stat: os.stat_result):
+        with closing(self._connect()) as conn:
+            if self._position(conn) == (stat.st_ino, stat.st_size):
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                inode, offset = self._position(conn)
+                if inode is None:
+                    offset = self._initial_offset(stat.st_size)
+                elif inode != stat.st_ino or offset > stat.st_size:
+                    # accounting file was rotated
+                    offset = 0
+                offset = self._index_from(conn, offset)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                    [("inode", stat.st_ino), ("offset", offset)],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _connect(self) -> "sqlite3.Connection":
+        import sqlite3  # status checks of running jobs never open the index
+
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.index_path), timeout=60, isolation_level=None)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS records (key TEXT PRIMARY KEY, {columns})".format(
+                columns=", ".join(AccountingRecord._fields)
+            )
+        )
+        return conn
+
+    @staticmethod
+    def _position(conn: "sqlite3.Connection") -> Tuple[Optional[int], Optional[int]]:
+        meta = dict(conn.execute("SELECT name, value FROM meta").fetchall())
+        return meta.get("inode"), meta.get("offset")
+
+    def _initial_offset(self, size: int) -> int:
+        if size <= self.INITIAL_BACKLOG:
+            return 0
+        with self.accounting_file.open("rb") as stream:
+            stream.seek(size - self.INITIAL_BACKLOG)
+            partial_line = stream.readline()
+            return size - self.INITIAL_BACKLOG + len(partial_line)
+
+    def _index_from(self, conn: "sqlite3.Connection", offset: int) -> int:
+        insert = "INSERT OR REPLACE INTO records (key, {columns}) VALUES (?, {marks})".format(
+            columns=", ".join(AccountingRecord._fields),
+            marks=", ".join("?" * len(AccountingRecord._fields)),
+        )
+        with self.accounting_file.open("rb") as stream:
+            stream.seek(offset)
+            for line in stream:
+                if not line.endswith(b"\n"):
+                    break  # line is still being written
+                offset += len(line)
+                record = self.parse_line(line.decode(errors="replace"))
+                if record is None:
+                    continue
+                conn.executemany(
+                    insert, [(key,) + tuple(record) for key in self._keys(record)]
+                )
+        return offset
+
+    @staticmethod
+    def _key(jobid: int, task_id: Optional[int] = None) -> str:
+        if task_id:
+            return "{jobid}.{task_id}".format(jobid=jobid, task_id=task_id)
+        return str(jobid)
+
+    @classmethod
+    def _keys(cls, record: AccountingRecord) -> Iterator[str]:
+        yield cls._key(record.job_number)
+        if record.task_number:
+            yield cls._key(record.job_number, record.task_number)
+
+    @classmethod
+    def parse_line(cls, line: str) -> Optional[AccountingRecord]:
+        if line.startswith("#"):
+            return None
+        fields = line.rstrip("\n").split(":")
+        if len(fields) < cls.MIN_FIELDS:
+            return None
+        try:
+            return AccountingRecord(
+                job_number=int(fields[cls.FIELDS["job_number"]]),
+                task_number=int(fields[cls.FIELDS["task_number"]]),
+                job_name=fields[cls.FIELDS["job_name"]],
+                qname=fields[cls.FIELDS["qname"]],
+                hostname=fields[cls.FIELDS["hostname"]],
+                end_time=float(fields[cls.FIELDS["end_time"]]),
+                failed=int(fields[cls.FIELDS["failed"]]),
+                exit_status=int(fields[cls.FIELDS["exit_status"]]),
+                wallclock=float(fields[cls.FIELDS["wallclock"]]),
+                cpu=float(fields[cls.FIELDS["cpu"]]),
+                maxvmem=float(fields[cls.FIELDS["maxvmem"]]),
+            )
+        except ValueError:
+            return None
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+import fcntl
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, List, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+# runs the jobscript of one task of a coalesced array job with the cluster
+# logs of that job, so sentinels and status checks work as for single jobs
+ARRAY_JOBSCRIPT = """#!/usr/bin/env bash
+# tasks of a coalesced array job, one line per task: jobscript outlog errlog
+IFS=$'\\t' read -r jobscript outlog errlog < <(sed -n "${SGE_TASK_ID}p" "%(tasks)s")
+export SGE_STDOUT_PATH="$outlog" SGE_STDERR_PATH="$errlog"
+exec bash "$jobscript" > "$outlog" 2> "$errlog"
+"""
+
+
+class SpoolError(Exception):
+    pass
+
+
+class SpooledJob:
+    def __init__(self, jobscript: str, outlog: str, errlog: str):
+        self.jobscript = jobscript
+        self.outlog = outlog
+        self.errlog = errlog
+
+
+class SubmitSpool:
+    """
+    Coalesces jobs that share the same qsub parameters into array jobs,
+    without making their submission wait for the other jobs.
+
+    The first job of a parameter group submits an array job of ``max_tasks``
+    tasks on hold and starts a flusher in the background. That job and every
+    job of the group submitted in the following ``window`` seconds take the
+    next task of the array: the jobscript and cluster logs of the job are
+    added to the task list of the array and its ``<array job id>.<task id>``
+    is returned at once. Once the window has passed or all tasks are taken,
+    the tasks in use are released and the others deleted. The flusher keeps
+    trying until that worked; if it dies, the next submission of any group
+    does it.
+    """
+
+    LOCK_NAME = ".lock"
+    STATE_NAME = "array.json"
+
+    def __init__(
+        self, directory: Path, group: str, window: float, max_tasks: int
+    ):
+        digest = hashlib.sha1(group.encode()).hexdigest()[:16]
+        self._directory = Path(directory) / digest
+        self._window = window
+        self._max_tasks = max_tasks
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def submit(
+        self,
+        job: SpooledJob,
+        array_submit_cmd: Callable[[int, Path], List[str]],
+    ) -> str:
+        """
+        Adds the job to the open array job of the group and returns its
+        ``<array job id>.<task id>``. ``array_submit_cmd`` builds the qsub
+        command, which has to hold the tasks, from the number of tasks and the
+        array jobscript.
+        """
+        OSLayer.mkdir(self._directory)
+        close_overdue_arrays(self._directory.parent, skip=self._directory)
+        opened = False
+        with spool_lock(self._directory):
+            state = read_state(self._directory)
+            if state is not None and time.time() >= state["closes"]:
+                close_array(self._directory, state)
+                state = None
+            if state is None:
+                state = self._open_array(array_submit_cmd)
+                opened = True
+            task_id = state["tasks"] + 1
+            with open(state["task_list"], "a") as task_list:
+                line_start = task_list.tell()
+                task_list.write(
+                    "\t".join((job.jobscript, job.outlog, job.errlog)) + "\n"
+                )
+            state["tasks"] = task_id
+            if task_id >= state["max_tasks"]:
+                try:
+                    close_array(self._directory, state)
+                except SpoolError:
+                    # the submission fails, so the task must not run the job;
+                    # the array stays open with the tasks taken before
+                    with open(state["task_list"], "r+") as task_list:
+                        task_list.truncate(line_start)
+                    state["tasks"] = task_id - 1
+                    write_state(self._directory, state)
+                    raise
+            else:
+                write_state(self._directory, state)
+        if opened and task_id < state["max_tasks"]:
+            self._start_flusher(state["jobid"])
+        return "{jobid}.{task_id}".format(jobid=state["jobid"], task_id=task_id)
+
+    def _open_array(
+        self, array_submit_cmd: Callable[[int, Path], List[str]]
+    ) -> dict:
+        name = "{time:020d}".format(time=time.time_ns())
+        task_list = self._directory / (name + ".tasks")
+        task_list.touch()
+        jobscript_path = self._directory / (name + ".sh")
+        jobscript_path.write_text(ARRAY_JOBSCRIPT % dict(tasks=task_list.resolve()))
+        jobscript_path.chmod(0o755)
+
+        returncode, output_stream, error_stream = OSLayer.run_process(
+            array_submit_cmd(self._max_tasks, jobscript_path)
+        )
+        match = re.search(r"Your job-array (\d+)\.", output_stream)
+        if returncode != 0 or not match:
+            raise SpoolError(error_stream or output_stream)
+        return dict(
+            jobid=match.group(1),
+            task_list=str(task_list),
+            tasks=0,
+            max_tasks=self._max_tasks,
+            closes=time.time() + self._window,
+        )
+
+    def _start_flusher(self, jobid: str):
+        subprocess.Popen(
+            [
+                sys.executable,
+                str(Path(__file__).absolute()),
+                str(self._directory),
+                jobid,
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def read_state(directory: Path) -> Optional[dict]:
+    try:
+        with (directory / SubmitSpool.STATE_NAME).open() as stream:
+            return json.load(stream)
+    except FileNotFoundError:
+        return None
+    except ValueError as error:
+        raise SpoolError(error)
+
+
+def write_state(directory: Path, state: dict):
+    path = directory / SubmitSpool.STATE_NAME
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(str(tmp_path), str(path))
+
+
+def close_array(directory: Path, state: dict):
+    """
+    Releases the tasks of the array job that were taken and deletes the rest.
+    Must be called with the spool lock held.
+    """
+    jobid, tasks, max_tasks = state["jobid"], state["tasks"], state["max_tasks"]
+    if tasks:
+        returncode, output_stream, error_stream = OSLayer.run_process(
+            ["qrls", "-h", "u", "{jobid}.1-{tasks}".format(jobid=jobid, tasks=tasks)]
+        )
+        if returncode != 0:
+            # the array stays open, so the next attempt releases it
+            raise SpoolError(error_stream or output_stream)
+    if tasks < max_tasks:
+        # tasks without a line in the task list, nothing to keep them for
+        unused = "{jobid}.{first}-{last}".format(
+            jobid=jobid, first=tasks + 1, last=max_tasks
+        )
+        OSLayer.run_process(["qdel", unused])
+    OSLayer.remove_file(directory / SubmitSpool.STATE_NAME)
+
+
+@contextmanager
+def spool_lock(directory: Path, blocking: bool = True):
+    """Raises BlockingIOError if not ``blocking`` and the lock is held."""
+    with (directory / SubmitSpool.LOCK_NAME).open("a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def close_overdue_arrays(spool_root: Path, skip: Optional[Path] = None):
+    """
+    Closes the arrays of all groups whose window has passed, which their
+    flusher failed to close. Groups locked by another process are left alone.
+    """
+    for directory in spool_root.iterdir():
+        if directory == skip or not directory.is_dir():
+            continue
+        state = read_state(directory)
+        if state is None or time.time() < state["closes"]:
+            continue
+        try:
+            with spool_lock(directory, blocking=False):
+                state = read_state(directory)
+                if state is not None and time.time() >= state["closes"]:
+                    close_array(directory, state)
+        except (BlockingIOError, SpoolError):
+            pass
+
+
+def flush_when_due(directory: Path, jobid: str, max_delay: float = 60):
+    """
+    Closes the array job once its window has passed, unless it is closed,
+    retrying with growing delays until the tasks have been released.
+    """
+    delay = 1.0
+    while True:
+        state = read_state(directory)
+        if state is None or state["jobid"] != jobid:
+            return
+        time.sleep(max(state["closes"] - time.time(), 0))
+        with spool_lock(directory):
+            state = read_state(directory)
+            if state is None or state["jobid"] != jobid:
+                return
+            try:
+                close_array(directory, state)
+                return
+            except SpoolError:
+                pass
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def main():
+    if not __name__.startswith("tests.src."):
+        from CookieCutter import CookieCutter
+        from metrics import install_metrics
+        from rate_limit import install_rate_limiter
+    else:
+        from .CookieCutter import CookieCutter
+        from .metrics import install_metrics
+        from .rate_limit import install_rate_limiter
+
+    if CookieCutter.get_use_scheduler_metrics():
+        install_metrics(CookieCutter.get_log_dir())
+    if CookieCutter.get_use_rate_limiter():
+        install_rate_limiter(CookieCutter.get_rate_limits())
+    flush_when_due(Path(sys.argv[1]), sys.argv[2])
+
+
+if __name__ == "__main__":
+    main()
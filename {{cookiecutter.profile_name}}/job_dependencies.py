@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from local_lane import JOBID_PREFIX as LOCAL_JOBID_PREFIX
+else:
+    from .local_lane import JOBID_PREFIX as LOCAL_JOBID_PREFIX
+
+PathLike = Union[str, Path]
+
+# job ids printed by uge_submit.py for jobs and tasks of coalesced array jobs
+JOBID = re.compile(r"(?P<job_number>\d+)(?:\.\d+)?")
+# the parents of a job, as <job id>=<cluster log> separated by ':', for the
+# check at the start of the jobscript
+PARENT_JOBS_VARIABLE = "UGE_PARENT_JOBS"
+
+
+class DependencyError(Exception):
+    pass
+
+
+class JobidMap:
+    """
+    The jobs submitted ahead of time, one JSON file per job in the log
+    directory: the UGE job number behind the job id snakemake was given, the
+    cluster log of the job and the job ids of its parents.
+
+    With ``--immediate-submit`` snakemake passes the job ids it was given for
+    the parents of a job, followed by their cluster logs, since that is what
+    uge_submit.py prints. The map translates them to the UGE job numbers to
+    hold on.
+    """
+
+    NAME = ".jobid_map"
+
+    def __init__(self, log_dir: PathLike):
+        self._directory = Path(log_dir) / self.NAME
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def path(self, jobid: Union[int, str]) -> Path:
+        return self._directory / "{jobid}.json".format(jobid=jobid)
+
+    def record(
+        self,
+        jobid: Union[int, str],
+        outlog: PathLike,
+        parents: List[Tuple[str, str]],
+    ):
+        match = JOBID.fullmatch(str(jobid))
+        if match is None:
+            raise DependencyError(
+                "job {jobid} is not a UGE job and cannot be depended on".format(
+                    jobid=jobid
+                )
+            )
+        entry = dict(
+            job_number=match.group("job_number"),
+            outlog=str(outlog),
+            parents=[dict(jobid=parent, outlog=log) for parent, log in parents],
+        )
+        self._directory.mkdir(parents=True, exist_ok=True)
+        path = self.path(jobid)
+        tmp_path = path.with_name(
+            "{name}.{pid}.tmp".format(name=path.name, pid=os.getpid())
+        )
+        tmp_path.write_text(json.dumps(entry))
+        os.replace(str(tmp_path), str(path))
+
+    def lookup(self, jobid: Union[int, str]) -> Optional[dict]:
+        try:
+            with self.path(jobid).open() as stream:
+                return json.load(stream)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def parents(self, arguments: List[str]) -> List[Tuple[str, str]]:
+        """
+        The job ids and cluster logs of the parents from the arguments
+        snakemake passed for them. Jobs of the local lane and pilot tasks
+        are not UGE jobs and cannot be held on.
+        """
+        # only needed by the submissions, not by the status checks
+        if not __name__.startswith("tests.src."):
+            from pilot import JOBID_PREFIX as PILOT_JOBID_PREFIX
+        else:
+            from .pilot import JOBID_PREFIX as PILOT_JOBID_PREFIX
+
+        parents = []
+        for index, argument in enumerate(arguments):
+            if JOBID.fullmatch(argument):
+                entry = self.lookup(argument)
+                if entry is not None:
+                    outlog = entry["outlog"]
+                elif index + 1 < len(arguments):
+                    outlog = arguments[index + 1]
+                else:
+                    outlog = ""
+                parents.append((argument, outlog))
+            elif argument.startswith((LOCAL_JOBID_PREFIX, PILOT_JOBID_PREFIX)):
+                raise DependencyError(
+                    "cannot hold on job {jobid}, which does not run on the "
+                    "cluster".format(jobid=argument)
+                )
+        return parents
+
+    def hold_jids(self, parents: List[Tuple[str, str]]) -> List[str]:
+        """The UGE job numbers to hold on, coalesced array jobs only once."""
+        hold_jids = []
+        for jobid, _ in parents:
+            entry = self.lookup(jobid)
+            if entry is not None:
+                job_number = entry["job_number"]
+            else:
+                job_number = JOBID.fullmatch(jobid).group("job_number")
+            if job_number not in hold_jids:
+                hold_jids.append(job_number)
+        return hold_jids
+
+
+def parent_jobs_variable(parents: List[Tuple[str, str]]) -> str:
+    return "{name}={parents}".format(
+        name=PARENT_JOBS_VARIABLE,
+        parents=":".join(
+            "{jobid}={outlog}".format(jobid=jobid, outlog=outlog)
+            for jobid, outlog in parents
+            if outlog
+        ),
+    )
@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+from typing import Union
+
+PROPERTIES_PREFIX = "# properties = "
+# the properties line follows the shebang in snakemake's jobscript template;
+# give up if it does not turn up within the header of the jobscript
+MAX_HEADER_LINES = 64
+
+
+class JobPropertiesError(Exception):
+    pass
+
+
+def read_job_properties(jobscript: Union[str, Path]) -> dict:
+    """
+    Reads the job properties snakemake writes into the jobscript as a
+    ``# properties = {...}`` line. Does the same as
+    ``snakemake.utils.read_job_properties`` without importing snakemake, and
+    only reads the head of the jobscript.
+    """
+    with open(str(jobscript)) as stream:
+        for _, line in zip(range(MAX_HEADER_LINES), stream):
+            if line.startswith(PROPERTIES_PREFIX):
+                try:
+                    return json.loads(line[len(PROPERTIES_PREFIX):])
+                except ValueError as error:
+                    raise JobPropertiesError(
+                        "invalid job properties in {jobscript}: {error}".format(
+                            jobscript=jobscript, error=error
+                        )
+                    )
+    raise JobPropertiesError(
+        "no job properties found in {jobscript}".format(jobscript=jobscript)
+    )
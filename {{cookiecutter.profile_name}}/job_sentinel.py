@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+PathLike = Union[str, Path]
+
+
+class JobSentinel:
+    """
+    Status sentinel written by uge_jobscript.sh next to the cluster log of a
+    job. The jobscript writes it twice, via write-then-rename so readers
+    never see a partial file: once when the job starts and once when it
+    finishes. The content is one key=value pair per line:
+
+        state=finished
+        job_id=8697223
+        task_id=undefined
+        host=node1
+        started=1596700010
+        finished=1596700070
+        exit_status=0
+    """
+
+    STARTED = "started"
+    FINISHED = "finished"
+    SUFFIX = ".status"
+
+    def __init__(self, outlog: PathLike):
+        self._outlog = Path(outlog)
+
+    @property
+    def path(self) -> Path:
+        # mirrors `$(basename "$SGE_STDOUT_PATH" .out).status` in the jobscript
+        name = self._outlog.name
+        if name.endswith(".out"):
+            name = name[: -len(".out")]
+        return self._outlog.with_name(name + self.SUFFIX)
+
+    def read(self) -> Optional[dict]:
+        try:
+            content = self.path.read_text()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return self.parse(content)
+
+    def exit_status(self, jobid: Union[int, str]) -> Optional[int]:
+        """
+        Returns the exit status of the job if the sentinel says it has
+        finished, or None if there is no finished sentinel for this job id
+        (sentinels left behind by an earlier run have another job id). Tasks
+        of array jobs are given as ``<job id>.<task id>``.
+        """
+        job_number, _, task_id = str(jobid).partition(".")
+        sentinel = self.read()
+        if sentinel is None or sentinel.get("job_id") != job_number:
+            return None
+        if task_id and sentinel.get("task_id") != task_id:
+            return None
+        if sentinel.get("state") != self.FINISHED:
+            return None
+        try:
+            return int(sentinel.get("exit_status", ""))
+        except ValueError:
+            return None
+
+    def write(self, **fields):
+        """Writes the sentinel like the jobscript does, for jobs it did not finish."""
+        content = "".join(
+            "{key}={value}\n".format(key=key, value=value) for key, value in fields.items()
+        )
+        tmp_path = self.path.with_name(
+            "{name}.tmp.{pid}".format(name=self.path.name, pid=os.getpid())
+        )
+        tmp_path.write_text(content)
+        os.replace(str(tmp_path), str(self.path))
+
+    @staticmethod
+    def parse(content: str) -> dict:
+        sentinel = {}
+        for line in content.splitlines():
+            key, sep, value = line.partition("=")
+            if sep:
+                sentinel[key.strip()] = value.strip()
+        return sentinel
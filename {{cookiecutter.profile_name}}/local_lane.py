@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+import fcntl
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from job_sentinel import JobSentinel
+else:
+    from .job_sentinel import JobSentinel
+
+PathLike = Union[str, Path]
+
+# job ids of jobs run on the submit host, as passed to the status and cancel
+# scripts; they also stand in for $JOB_ID in the jobscript and its sentinel
+JOBID_PREFIX = "local:"
+
+
+class LocalLane:
+    """
+    Jobs run next to snakemake instead of on the cluster, at most
+    ``max_jobs`` at a time.
+
+    Every job is run by a runner process of its own (this script), which
+    holds the lock of one of the ``slots/`` files and the lock of its file in
+    ``jobs/`` until the job has finished. The submission takes both locks
+    before it starts the runner and hands them over, so a job is running
+    exactly as long as its lock is held. The runner makes sure the job ends
+    with a finished sentinel before it lets go of the lock.
+    """
+
+    SLOTS = "slots"
+    JOBS = "jobs"
+
+    def __init__(self, directory: PathLike):
+        self._directory = Path(directory)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def job_path(self, job_id: str) -> Path:
+        return self._directory / self.JOBS / "{job_id}.lock".format(job_id=job_id)
+
+    def start(
+        self, jobscript: PathLike, outlog: PathLike, errlog: PathLike, max_jobs: int
+    ) -> Optional[str]:
+        """
+        Starts the job if fewer than ``max_jobs`` local jobs are running and
+        returns its job id, otherwise returns None.
+        """
+        slot_fd = self._claim_slot(max_jobs)
+        if slot_fd is None:
+            return None
+        job_id = "{time:x}-{random}".format(time=time.time_ns(), random=os.urandom(4).hex())
+        job_fd = None
+        try:
+            job_fd = os.open(str(self.job_path(job_id)), os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(job_fd, fcntl.LOCK_EX)
+            process = subprocess.Popen(
+                [
+                    sys.executable,
+                    str(Path(__file__).absolute()),
+                    str(self._directory),
+                    job_id,
+                    str(jobscript),
+                    str(outlog),
+                    str(errlog),
+                ],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                pass_fds=(slot_fd, job_fd),
+            )
+            os.write(job_fd, str(process.pid).encode())
+        finally:
+            # the runner holds on to both locks
+            os.close(slot_fd)
+            if job_fd is not None:
+                os.close(job_fd)
+        return JOBID_PREFIX + job_id
+
+    def _claim_slot(self, max_jobs: int) -> Optional[int]:
+        for directory in (self.SLOTS, self.JOBS):
+            (self._directory / directory).mkdir(parents=True, exist_ok=True)
+        for slot in range(max_jobs):
+            path = self._directory / self.SLOTS / "{slot}.lock".format(slot=slot)
+            fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def is_running(self, job_id: str) -> bool:
+        try:
+            fd = os.open(str(self.job_path(job_id)), os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+        return False
+
+    def cancel(self, job_id: str) -> bool:
+        """Terminates the runner of the job, together with the job itself."""
+        if not self.is_running(job_id):
+            return False
+        try:
+            pid = int(self.job_path(job_id).read_text())
+            os.killpg(pid, signal.SIGTERM)
+        except (OSError, ValueError):
+            return False
+        return True
+
+
+def local_lane_directory(log_dir: PathLike) -> Path:
+    return Path(log_dir) / ".local"
+
+
+def run_job(
+    lane: LocalLane, job_id: str, jobscript: PathLike, outlog: PathLike, errlog: PathLike
+) -> int:
+    """Runs the jobscript the way the cluster would and returns its exit status."""
+    import socket  # only needed by the runner
+
+    jobid = JOBID_PREFIX + job_id
+    env = dict(os.environ, JOB_ID=jobid, SGE_STDOUT_PATH=str(outlog))
+    env.pop("SGE_TASK_ID", None)
+    started = int(time.time())
+    with open(str(outlog), "wb") as out, open(str(errlog), "wb") as err:
+        try:
+            returncode = subprocess.run(
+                ["/bin/bash", str(jobscript)],
+                stdin=subprocess.DEVNULL,
+                stdout=out,
+                stderr=err,
+                env=env,
+            ).returncode
+        except OSError as error:
+            err.write("{error}\n".format(error=error).encode())
+            returncode = 127
+    # like the shell, report jobs killed by a signal as 128 + the signal
+    exit_status = 128 - returncode if returncode < 0 else returncode
+    sentinel = JobSentinel(outlog)
+    if sentinel.exit_status(jobid) is None:
+        # the jobscript did not get to the end, so leave its markers for it
+        with open(str(outlog), "a") as out:
+            out.write("EXIT_STATUS: {exit_status}\n".format(exit_status=exit_status))
+        sentinel.write(
+            state=JobSentinel.FINISHED,
+            job_id=jobid,
+            task_id="undefined",
+            host=socket.gethostname(),
+            started=started,
+            finished=int(time.time()),
+            exit_status=exit_status,
+        )
+    try:
+        lane.job_path(job_id).unlink()
+    except FileNotFoundError:
+        pass
+    return exit_status
+
+
+def main(argv):
+    directory, job_id, jobscript, outlog, errlog = argv
+    # cancelling terminates the whole session: the runner outlives the
+    # jobscript to report it (a handler, unlike SIG_IGN, is not inherited)
+    signal.signal(signal.SIGTERM, lambda signum, frame: None)
+    run_job(LocalLane(directory), job_id, jobscript, outlog, errlog)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
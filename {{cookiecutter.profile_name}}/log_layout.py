@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+import fcntl
+import os
+import re
+import subprocess
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Union
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from CookieCutter import CookieCutter
+else:
+    from .CookieCutter import CookieCutter
+
+PathLike = Union[str, Path]
+
+# cluster logs and sentinels of the sharded layout: <name>.<run id>.<suffix>
+LOG_NAME = re.compile(r"(?P<name>.+)\.(?P<run>r[0-9a-f]{8})\.(?:out|err|status)$")
+SWEEP_INTERVAL = 60
+# the sweep stops once no logs have been added for this long
+SWEEP_IDLE_TIMEOUT = 600
+SWEEP_LOCK_NAME = ".log_sweep.lock"
+# created in snakemake's per-run jobscript directory by the submission that
+# starts the sweep of the run
+SWEEP_MARKER_NAME = ".uge_log_sweep"
+
+# shard directories known to exist, for processes submitting many jobs
+_prepared = set()
+
+
+class ShardedLogLayout:
+    """
+    Cluster logs spread over ``<log dir>/<rule>/<shard>/`` directories, the
+    shard being a hex prefix of the CRC32 of the log name, so no directory
+    grows to hold every log of a rule.
+
+    The logs of every snakemake run get their own names,
+    ``<name>.<run id>.out``, so nothing has to be removed before a job is
+    submitted. The logs of earlier runs of a job are removed by a sweep in
+    the background instead, which keeps the newest run of each log.
+    """
+
+    def __init__(self, log_dir: PathLike, shard_width: int):
+        self._log_dir = Path(log_dir)
+        self._shard_width = shard_width
+
+    @staticmethod
+    def run_id(jobscript: PathLike) -> str:
+        # snakemake writes the jobscripts of a run to a directory of its own
+        run_directory = str(Path(jobscript).absolute().parent)
+        return "r{:08x}".format(zlib.crc32(run_directory.encode()))
+
+    def shard(self, name: str) -> str:
+        return "{:08x}".format(zlib.crc32(name.encode()))[: self._shard_width]
+
+    def shards(self) -> List[str]:
+        return [
+            "{:0{width}x}".format(index, width=self._shard_width)
+            for index in range(16 ** self._shard_width)
+        ]
+
+    def directory(self, rule_name: str, name: str) -> Path:
+        return self._log_dir / rule_name / self.shard(name)
+
+    def prepare(self, directory: Path):
+        """
+        Makes sure the shard directory exists. The first job of a rule
+        creates all shards of the rule at once, later jobs cost a single
+        mkdir, and none once the directory is known to this process.
+        """
+        if directory in _prepared:
+            return
+        try:
+            os.mkdir(str(directory))
+        except FileExistsError:
+            pass
+        except FileNotFoundError:
+            rule_directory = directory.parent
+            rule_directory.mkdir(parents=True, exist_ok=True)
+            for shard in self.shards():
+                (rule_directory / shard).mkdir(exist_ok=True)
+        _prepared.add(directory)
+
+    def start_sweep(self, jobscript: PathLike):
+        """Starts the sweep once per snakemake run."""
+        marker = Path(jobscript).absolute().parent / SWEEP_MARKER_NAME
+        try:
+            os.close(os.open(str(marker), os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            return
+        except OSError:
+            pass  # no marker, the lock of the sweep still keeps it unique
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).absolute())],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def sweep(log_dir: PathLike) -> int:
+    """
+    Removes the logs and sentinels of all but the newest run of every job in
+    the log tree, and returns the number of log files left. The newest run
+    is the one with the most recently modified file.
+    """
+    count = 0
+    directories = [str(log_dir)]
+    while directories:
+        try:
+            entries = list(os.scandir(directories.pop()))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        runs = {}  # type: Dict[str, Dict[str, List[os.DirEntry]]]
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+                continue
+            match = LOG_NAME.match(entry.name)
+            if match is not None:
+                count += 1
+                runs.setdefault(match.group("name"), {}).setdefault(
+                    match.group("run"), []
+                ).append(entry)
+        for files_of_runs in runs.values():
+            if len(files_of_runs) > 1:
+                count -= _remove_earlier_runs(files_of_runs)
+    return count
+
+
+def _remove_earlier_runs(files_of_runs: Dict[str, List[os.DirEntry]]) -> int:
+    def modified(files: List[os.DirEntry]) -> float:
+        try:
+            return max(entry.stat().st_mtime for entry in files)
+        except FileNotFoundError:
+            return 0.0
+
+    newest = max(files_of_runs, key=lambda run: modified(files_of_runs[run]))
+    removed = 0
+    for run, files in files_of_runs.items():
+        if run == newest:
+            continue
+        for entry in files:
+            try:
+                os.unlink(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def sweep_until_idle(log_dir: PathLike):
+    last_count = None
+    last_change = time.monotonic()
+    while time.monotonic() - last_change < SWEEP_IDLE_TIMEOUT:
+        count = sweep(log_dir)
+        if count != last_count:
+            last_count = count
+            last_change = time.monotonic()
+        time.sleep(SWEEP_INTERVAL)
+
+
+def main():
+    log_dir = Path(CookieCutter.get_log_dir())
+    log_dir.mkdir(parents=True, exist_ok=True)
+    with (log_dir / SWEEP_LOCK_NAME).open("a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # the sweep of an earlier run is still going
+        sweep_until_idle(log_dir)
+
+
+if __name__ == "__main__":
+    main()
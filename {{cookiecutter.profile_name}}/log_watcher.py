@@ -0,0 +1,189 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+PathLike = Union[str, Path]
+
+# file systems on which inotify does not see changes made by other hosts
+NETWORK_FILESYSTEMS = {
+    "nfs",
+    "nfs4",
+    "lustre",
+    "gpfs",
+    "cifs",
+    "smb3",
+    "beegfs",
+    "panfs",
+    "ceph",
+    "fuse.sshfs",
+}
+
+
+class WatcherError(Exception):
+    pass
+
+
+def filesystem_type(path: PathLike, mounts_file: str = "/proc/mounts") -> str:
+    path = str(Path(path).resolve())
+    best_mount, best_type = "", ""
+    try:
+        with open(mounts_file) as stream:
+            for line in stream:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point, fs_type = fields[1], fields[2]
+                inside = path == mount_point or path.startswith(
+                    mount_point.rstrip("/") + "/"
+                )
+                if inside and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fs_type
+    except OSError:
+        pass
+    return best_type
+
+
+class PollingWatcher:
+    """
+    Detects new or changed status sentinels by scanning the log tree with
+    os.scandir, which reads each directory in one batch, and only stat'ing
+    the sentinels themselves.
+    """
+
+    def __init__(self, root: PathLike, poll_interval: float):
+        self._root = Path(root).resolve()
+        self._poll_interval = poll_interval
+        self._seen = self._scan()  # type: Dict[str, Tuple[int, int]]
+
+    def wait_for_changes(self, timeout: float) -> List[str]:
+        time.sleep(min(timeout, self._poll_interval))
+        current = self._scan()
+        changed = [
+            path for path, signature in current.items()
+            if self._seen.get(path) != signature
+        ]
+        self._seen = current
+        return changed
+
+    def close(self):
+        pass
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        found = {}
+        directories = [str(self._root)]
+        while directories:
+            try:
+                entries = list(os.scandir(directories.pop()))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.name.endswith(".status"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    found[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+
+class InotifyWatcher:
+    """
+    Detects status sentinels through inotify(7), called via ctypes. Every
+    directory of the log tree is watched; sentinels show up as IN_MOVED_TO
+    events since the jobscript renames them into place.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, root: PathLike):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise WatcherError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise WatcherError("inotify is not available")
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise WatcherError(os.strerror(ctypes.get_errno()))
+        self._directories = {}  # type: Dict[int, str]
+        self._watch_tree(str(Path(root).resolve()))
+
+    def wait_for_changes(self, timeout: float) -> List[str]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(buffer, offset)
+            offset += self.EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b"\0").decode()
+            offset += length
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                # sentinels may already exist by the time the watch is added
+                changed.extend(self._watch_tree(path))
+            elif name.endswith(".status"):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+    def _watch_tree(self, root: str) -> List[str]:
+        existing = []
+        for directory, _, files in os.walk(root):
+            wd = self._libc.inotify_add_watch(
+                self._fd, directory.encode(), self.MASK
+            )
+            if wd < 0:
+                raise WatcherError(
+                    "cannot watch {directory}: {error}".format(
+                        directory=directory,
+                        error=os.strerror(ctypes.get_errno()),
+                    )
+                )
+            self._directories[wd] = directory
+            existing.extend(
+                os.path.join(directory, name)
+                for name in files
+                if name.endswith(".status")
+            )
+        return existing
+
+
+def create_watcher(root: PathLike, poll_interval: float):
+    """
+    Returns an inotify based watcher if the log tree is on a local file
+    system, or a polling watcher otherwise: inotify does not report changes
+    made on other hosts of a network file system.
+    """
+    Path(root).mkdir(parents=True, exist_ok=True)
+    if filesystem_type(root) not in NETWORK_FILESYSTEMS:
+        try:
+            return InotifyWatcher(root)
+        except (WatcherError, OSError):
+            pass
+    return PollingWatcher(root, poll_interval)
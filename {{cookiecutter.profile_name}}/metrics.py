@@ -0,0 +1,185 @@
+import atexit
+import fcntl
+import json
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SCHEDULER_COMMANDS = ("qsub", "qstat", "qacct", "qdel")
+PREFIX = "snakemake_uge_scheduler"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def command_kind(cmd: Union[str, List[str]]) -> str:
+    words = cmd.split() if isinstance(cmd, str) else cmd
+    name = os.path.basename(words[0]) if words else ""
+    return name if name in SCHEDULER_COMMANDS else "other"
+
+
+class SchedulerMetrics:
+    """
+    Counts and times the scheduler commands run by one process of the profile.
+
+    The counts are merged into totals shared by every submit and status
+    check of the workflow when flushed. The totals are kept next to a
+    Prometheus node-exporter textfile in the log directory, both rewritten
+    under a lock, so concurrent processes do not lose each other's counts.
+    """
+
+    TEXTFILE_NAME = "scheduler_metrics.prom"
+    STATE_NAME = ".scheduler_metrics.json"
+    LOCK_NAME = ".scheduler_metrics.lock"
+
+    def __init__(self, directory: Path):
+        self._directory = Path(directory)
+        self._reset()
+
+    def _reset(self):
+        self._calls = defaultdict(int)  # type: Dict[Tuple[str, int], int]
+        self._buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self._latency_sum = defaultdict(float)  # type: Dict[str, float]
+        self._latency_count = defaultdict(int)  # type: Dict[str, int]
+        self._retries = defaultdict(int)  # type: Dict[str, int]
+
+    @property
+    def textfile_path(self) -> Path:
+        return self._directory / self.TEXTFILE_NAME
+
+    @property
+    def state_path(self) -> Path:
+        return self._directory / self.STATE_NAME
+
+    @property
+    def lock_path(self) -> Path:
+        return self._directory / self.LOCK_NAME
+
+    def record_call(self, cmd: Union[str, List[str]], returncode: int, seconds: float):
+        kind = command_kind(cmd)
+        self._calls[(kind, returncode)] += 1
+        self._latency_sum[kind] += seconds
+        self._latency_count[kind] += 1
+        buckets = self._buckets[kind]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[index] += 1
+
+    def record_retry(self, cmd: Union[str, List[str]]):
+        self._retries[command_kind(cmd)] += 1
+
+    def flush(self):
+        if not self._latency_count and not self._retries:
+            return
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                state = self._merge(self._read_state())
+                self._replace(self.state_path, json.dumps(state))
+                self._replace(self.textfile_path, self.render(state))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._reset()
+
+    def _read_state(self) -> Optional[dict]:
+        try:
+            with self.state_path.open() as stream:
+                return json.load(stream)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _merge(self, state: Optional[dict]) -> dict:
+        state = state or {"calls": {}, "latency": {}, "retries": {}}
+        for (kind, returncode), count in self._calls.items():
+            calls = state["calls"].setdefault(kind, {})
+            calls[str(returncode)] = calls.get(str(returncode), 0) + count
+        for kind, count in self._latency_count.items():
+            latency = state["latency"].setdefault(
+                kind,
+                dict(buckets=[0] * len(LATENCY_BUCKETS), sum=0.0, count=0),
+            )
+            latency["buckets"] = [
+                total + new
+                for total, new in zip(latency["buckets"], self._buckets[kind])
+            ]
+            latency["sum"] += self._latency_sum[kind]
+            latency["count"] += count
+        for kind, count in self._retries.items():
+            state["retries"][kind] = state["retries"].get(kind, 0) + count
+        return state
+
+    def render(self, state: dict) -> str:
+        workflow = str(self._directory.resolve())
+        lines = []
+
+        def metric(name, value, **labels):
+            labels = ",".join(
+                '{key}="{value}"'.format(key=key, value=_escape(value))
+                for key, value in dict(workflow=workflow, **labels).items()
+            )
+            lines.append(
+                "{}_{}".format(PREFIX, name) + "{" + labels + "} " + str(value)
+            )
+
+        def header(name, kind, help_text):
+            lines.append("# HELP {}_{} {}".format(PREFIX, name, help_text))
+            lines.append("# TYPE {}_{} {}".format(PREFIX, name, kind))
+
+        header("calls_total", "counter", "Scheduler commands run by the profile.")
+        for kind, calls in sorted(state["calls"].items()):
+            for returncode, count in sorted(calls.items()):
+                metric("calls_total", count, command=kind, returncode=returncode)
+
+        header(
+            "call_duration_seconds", "histogram", "Latency of scheduler commands."
+        )
+        for kind, latency in sorted(state["latency"].items()):
+            for bound, count in zip(LATENCY_BUCKETS, latency["buckets"]):
+                metric(
+                    "call_duration_seconds_bucket", count, command=kind, le=bound
+                )
+            metric(
+                "call_duration_seconds_bucket",
+                latency["count"],
+                command=kind,
+                le="+Inf",
+            )
+            metric("call_duration_seconds_sum", latency["sum"], command=kind)
+            metric("call_duration_seconds_count", latency["count"], command=kind)
+
+        header(
+            "retries_total", "counter", "Scheduler commands retried after an error."
+        )
+        for kind, count in sorted(state["retries"].items()):
+            metric("retries_total", count, command=kind)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _replace(path: Path, content: str):
+        tmp_path = path.with_name(
+            "{name}.{pid}".format(name=path.name, pid=os.getpid())
+        )
+        tmp_path.write_text(content)
+        os.replace(str(tmp_path), str(path))
+
+
+def install_metrics(directory: Path) -> SchedulerMetrics:
+    """
+    Makes OSLayer record every process it runs and flushes the counts when
+    the interpreter exits.
+    """
+    OSLayer.metrics = SchedulerMetrics(directory)
+    atexit.register(OSLayer.metrics.flush)
+    return OSLayer.metrics
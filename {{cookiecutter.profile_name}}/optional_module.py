@@ -0,0 +1,13 @@
+import importlib
+from types import ModuleType
+
+
+def optional_module(name: str) -> ModuleType:
+    """
+    Imports a module of the profile where the optional feature it belongs
+    to is used, so the scripts only pay for the features that are switched
+    on. The tests import the profile as the package ``tests.src``.
+    """
+    if __name__.startswith("tests.src."):
+        return importlib.import_module("tests.src." + name)
+    return importlib.import_module(name)
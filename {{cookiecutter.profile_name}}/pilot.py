@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Union
+
+PathLike = Union[str, Path]
+
+# job ids of pilot tasks, as passed to the status and cancel scripts
+JOBID_PREFIX = "pilot:"
+# the workers are submitted as this script, configured through the environment
+DIRECTORY_VARIABLE = "UGE_PILOT_DIR"
+IDLE_TIMEOUT_VARIABLE = "UGE_PILOT_IDLE_TIMEOUT"
+RUNTIME_VARIABLE = "UGE_PILOT_RUNTIME"
+# workers touch their own file and the file of their task this often
+HEARTBEAT_INTERVAL = 30
+# a running worker or task without a heartbeat for this long is dead
+HEARTBEAT_TIMEOUT = 300
+# a worker that has not started after this long is assumed to be gone
+QUEUED_WORKER_TIMEOUT = 3600
+POLL_INTERVAL = 2
+
+
+class PilotQueue:
+    """
+    Task queue of the pilot workers on the shared filesystem.
+
+    A task is a JSON file that moves from ``queued/`` to ``running/`` to
+    ``done/``. Workers claim a task by renaming it into ``running/``, which
+    only one of them can do, and touch it while it runs. When it finishes,
+    the result is written to ``done/`` before the task is removed from
+    ``running/``, so a task is always found in one of the directories when
+    they are looked at in that order.
+
+    A task can carry the runtime of its job. Workers with a runtime limit
+    only claim tasks that end before it.
+
+    Every worker has a file in ``workers/``, created when it is submitted
+    and touched while it runs, with its state and, once it runs, its
+    deadline. Submissions can tell from them how many workers are alive and
+    whether one of them can still run the task; if none can, another worker
+    is submitted. A queued task is failed once no worker is left that could
+    run it. The cluster logs of the workers go to ``logs/``.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    WORKERS = "workers"
+    LOGS = "logs"
+
+    def __init__(self, directory: PathLike):
+        self._directory = Path(directory)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def path(self, state: str, task_id: str = "") -> Path:
+        if not task_id:
+            return self._directory / state
+        return self._directory / state / "{task_id}.json".format(task_id=task_id)
+
+    def enqueue(
+        self,
+        jobscript: PathLike,
+        outlog: PathLike,
+        errlog: PathLike,
+        runtime: Optional[float] = None,
+    ) -> str:
+        """Adds a task, with the runtime of its job in seconds if known."""
+        for state in (self.QUEUED, self.RUNNING, self.DONE, self.WORKERS, self.LOGS):
+            self.path(state).mkdir(parents=True, exist_ok=True)
+        # names sort by submission time, so tasks are run first come first served
+        task_id = "{time:x}-{pid}-{random}".format(
+            time=time.time_ns(), pid=os.getpid(), random=os.urandom(4).hex()
+        )
+        task = dict(
+            jobscript=str(Path(jobscript).absolute()),
+            outlog=str(Path(outlog).absolute()),
+            errlog=str(Path(errlog).absolute()),
+            cwd=os.getcwd(),
+            runtime=runtime,
+        )
+        self._write(self.path(self.QUEUED, task_id), task)
+        return task_id
+
+    def queued(self, deadline: Optional[float] = None) -> List[str]:
+        """
+        The queued tasks in the order they were enqueued, only those that
+        end before ``deadline`` (a time) if one is given.
+        """
+        try:
+            names = sorted(entry.name for entry in os.scandir(str(self.path(self.QUEUED))))
+        except FileNotFoundError:
+            return []
+        task_ids = [name[: -len(".json")] for name in names if name.endswith(".json")]
+        if deadline is None:
+            return task_ids
+        return [task_id for task_id in task_ids if self._ends_before(task_id, deadline)]
+
+    def claim(self, deadline: Optional[float] = None) -> Optional[str]:
+        for task_id in self.queued(deadline):
+            try:
+                os.rename(
+                    str(self.path(self.QUEUED, task_id)),
+                    str(self.path(self.RUNNING, task_id)),
+                )
+            except FileNotFoundError:
+                continue  # claimed by another worker
+            return task_id
+        return None
+
+    def task(self, task_id: str) -> dict:
+        with self.path(self.RUNNING, task_id).open() as stream:
+            return json.load(stream)
+
+    def finish(self, task_id: str, exit_status: int):
+        self._write(self.path(self.DONE, task_id), dict(exit_status=exit_status))
+        self.path(self.RUNNING, task_id).unlink()
+
+    def cancel(self, task_id: str) -> bool:
+        """Removes a task that has not started yet."""
+        try:
+            self.path(self.QUEUED, task_id).unlink()
+        except FileNotFoundError:
+            return False
+        self._write(self.path(self.DONE, task_id), dict(exit_status=None))
+        return True
+
+    def status(self, task_id: str) -> str:
+        """
+        Returns "running" for queued and running tasks, "success" or
+        "failed" for finished tasks, for tasks whose worker died and for
+        queued tasks no worker is left for, which are cancelled.
+        """
+        if self.path(self.QUEUED, task_id).exists():
+            try:
+                runtime = self._runtime(task_id)
+            except (FileNotFoundError, ValueError):
+                runtime = None  # claimed meanwhile
+            if self.live_workers(runtime) or not self.cancel(task_id):
+                return "running"  # or claimed since
+            return "failed"
+        try:
+            heartbeat = self.path(self.RUNNING, task_id).stat().st_mtime
+        except FileNotFoundError:
+            pass
+        else:
+            if time.time() - heartbeat > HEARTBEAT_TIMEOUT:
+                return "failed"
+            return "running"
+        try:
+            with self.path(self.DONE, task_id).open() as stream:
+                exit_status = json.load(stream).get("exit_status")
+        except (FileNotFoundError, ValueError):
+            return "failed"
+        return "success" if exit_status == 0 else "failed"
+
+    def live_workers(self, runtime: Optional[float] = None) -> int:
+        """
+        Counts the workers that are queued or running, removing dead ones.
+        With a ``runtime`` in seconds, only those that can still run a task
+        that long: queued workers start with their whole runtime ahead.
+        """
+        count = 0
+        now = time.time()
+        try:
+            entries = list(os.scandir(str(self.path(self.WORKERS))))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                with open(entry.path) as stream:
+                    worker = json.load(stream)
+                age = now - entry.stat().st_mtime
+            except (FileNotFoundError, ValueError):
+                continue
+            if worker["state"] == self.QUEUED:
+                timeout = QUEUED_WORKER_TIMEOUT
+            else:
+                timeout = HEARTBEAT_TIMEOUT
+            if age > timeout:
+                self._remove(Path(entry.path))
+            elif (
+                runtime is None
+                or worker.get("deadline") is None
+                or now + runtime <= worker["deadline"]
+            ):
+                count += 1
+        return count
+
+    def ensure_workers(
+        self,
+        workers: int,
+        submit_worker: Callable[[], str],
+        runtime: Optional[float] = None,
+    ):
+        """
+        Submits workers until ``workers`` are queued or running, and one
+        more if none of them can still run a task of ``runtime`` seconds.
+        Has to be called after a task has been enqueued; see ``Worker.run``
+        for why.
+        """
+        with self._locked():
+            missing = workers - self.live_workers()
+            if missing <= 0 and not self.live_workers(runtime):
+                missing = 1  # the others retire before they could run it
+            for _ in range(missing):
+                self.register_worker(submit_worker(), self.QUEUED)
+
+    def register_worker(
+        self, worker_id: str, state: str, deadline: Optional[float] = None
+    ):
+        self._write(
+            self.path(self.WORKERS, worker_id), dict(state=state, deadline=deadline)
+        )
+
+    def _runtime(self, task_id: str) -> Optional[float]:
+        with self.path(self.QUEUED, task_id).open() as stream:
+            return json.load(stream).get("runtime")
+
+    def _ends_before(self, task_id: str, deadline: float) -> bool:
+        try:
+            runtime = self._runtime(task_id)
+        except (FileNotFoundError, ValueError):
+            return False  # claimed meanwhile, or still being written
+        # tasks of unknown runtime are given a chance
+        return runtime is None or time.time() + runtime <= deadline
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with (self._directory / ".lock").open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write(path: Path, content: dict):
+        tmp_path = path.with_name(
+            "{name}.{pid}.tmp".format(name=path.name, pid=os.getpid())
+        )
+        tmp_path.write_text(json.dumps(content))
+        os.replace(str(tmp_path), str(path))
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class Worker:
+    """
+    Runs the tasks of the queue back to back until it has been idle, only
+    those that end before ``deadline`` if it has one.
+    """
+
+    def __init__(
+        self,
+        queue: PilotQueue,
+        worker_id: str,
+        idle_timeout: float,
+        deadline: Optional[float] = None,
+    ):
+        self._queue = queue
+        self._worker_id = worker_id
+        self._idle_timeout = idle_timeout
+        self._deadline = deadline
+        self._task_id = None  # type: Optional[str]
+        self._stopped = threading.Event()
+
+    @property
+    def worker_path(self) -> Path:
+        return self._queue.path(PilotQueue.WORKERS, self._worker_id)
+
+    def run(self):
+        self._register()
+        heartbeat = threading.Thread(target=self._beat, daemon=True)
+        heartbeat.start()
+        try:
+            idle_since = time.monotonic()
+            while True:
+                task_id = self._queue.claim(self._deadline)
+                if task_id is not None:
+                    self._run_task(task_id)
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since < self._idle_timeout:
+                    time.sleep(POLL_INTERVAL)
+                elif not self._retire():
+                    idle_since = time.monotonic()
+                else:
+                    return
+        finally:
+            self._stopped.set()
+            PilotQueue._remove(self.worker_path)
+
+    def _retire(self) -> bool:
+        # submissions enqueue before counting the workers: a task enqueued
+        # while this worker still counted is seen here, after deregistering
+        PilotQueue._remove(self.worker_path)
+        if not self._queue.queued(self._deadline):
+            return True
+        self._register()
+        return False
+
+    def _register(self):
+        self._queue.register_worker(
+            self._worker_id, PilotQueue.RUNNING, self._deadline
+        )
+
+    def _run_task(self, task_id: str):
+        self._task_id = task_id
+        try:
+            task = self._queue.task(task_id)
+            env = dict(os.environ)
+            # the sentinel of the jobscript would carry the id of this worker
+            env.pop("SGE_STDOUT_PATH", None)
+            with open(task["outlog"], "ab") as outlog, open(task["errlog"], "ab") as errlog:
+                exit_status = subprocess.run(
+                    ["/bin/bash", task["jobscript"]],
+                    cwd=task["cwd"],
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=outlog,
+                    stderr=errlog,
+                ).returncode
+        except (OSError, ValueError, KeyError) as error:
+            print(
+                "pilot task {task_id} failed: {error}".format(
+                    task_id=task_id, error=error
+                ),
+                file=sys.stderr,
+            )
+            exit_status = 1
+        finally:
+            self._task_id = None
+        self._queue.finish(task_id, exit_status)
+
+    def _beat(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            paths = [self.worker_path]
+            task_id = self._task_id
+            if task_id is not None:
+                paths.append(self._queue.path(PilotQueue.RUNNING, task_id))
+            for path in paths:
+                try:
+                    os.utime(str(path))
+                except FileNotFoundError:
+                    pass
+
+
+def pilot_directory(log_dir: PathLike) -> Path:
+    return Path(log_dir) / ".pilot"
+
+
+def main():
+    import socket
+
+    queue = PilotQueue(os.environ[DIRECTORY_VARIABLE])
+    worker_id = os.environ.get("JOB_ID") or "{host}-{pid}".format(
+        host=socket.gethostname(), pid=os.getpid()
+    )
+    idle_timeout = float(os.environ.get(IDLE_TIMEOUT_VARIABLE, 300))
+    runtime = os.environ.get(RUNTIME_VARIABLE)
+    deadline = time.time() + float(runtime) if runtime else None
+    Worker(queue, worker_id, idle_timeout, deadline).run()
+
+
+if __name__ == "__main__":
+    main()
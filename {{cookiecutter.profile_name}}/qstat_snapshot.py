@@ -0,0 +1,229 @@
+import fcntl
+import getpass
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple, Union
+from xml.etree.ElementTree import ParseError
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer, ProcessStreamError
+    from qstat_xml import iter_job_records, start_timestamp
+else:
+    from .OSLayer import OSLayer, ProcessStreamError
+    from .qstat_xml import iter_job_records, start_timestamp
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class QstatSnapshot:
+    """
+    On-disk snapshot of ``qstat -xml -u $USER`` shared by all status checks of a
+    workflow.
+
+    The snapshot is refreshed at most once per ``ttl`` seconds. A process that
+    finds it stale tries to become the leader by taking an exclusive lock on a
+    lock file next to it; only the leader runs qstat. Other processes answer
+    from the stale snapshot while it is being refreshed, or wait for the
+    leader if there is no usable snapshot at all.
+
+    With ``with_usage``, qstat is run with ``-ext`` and the cpu time and
+    wallclock of running jobs are kept as well.
+    """
+
+    SNAPSHOT_NAME = ".qstat_snapshot.json"
+    LOCK_NAME = ".qstat_snapshot.lock"
+    FINISHED = "finished"
+
+    def __init__(
+        self,
+        directory: Path,
+        ttl: float,
+        user: Optional[str] = None,
+        with_usage: bool = False,
+    ):
+        self._directory = Path(directory)
+        self._ttl = ttl
+        self._user = user or getpass.getuser()
+        self._with_usage = with_usage
+
+    @property
+    def path(self) -> Path:
+        return self._directory / self.SNAPSHOT_NAME
+
+    @property
+    def lock_path(self) -> Path:
+        return self._directory / self.LOCK_NAME
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @property
+    def qstat_cmd(self) -> List[str]:
+        ext = ["-ext"] if self._with_usage else []
+        return ["qstat", "-xml"] + ext + ["-u", self._user]
+
+    def job_state(self, jobid: Union[int, str]) -> Optional[str]:
+        """
+        Returns the raw qstat state of the job, ``FINISHED`` if the job is no
+        longer known to qstat, or None if the job was submitted after the
+        snapshot was taken and the snapshot cannot tell. Tasks of array jobs
+        are given as ``<job id>.<task id>``.
+        """
+        snapshot = self.get()
+        state = snapshot["jobs"].get(str(jobid))
+        if state is not None:
+            return state
+        if int(str(jobid).partition(".")[0]) > snapshot["max_jobid"]:
+            return None
+        return self.FINISHED
+
+    def job_usage(self, jobid: Union[int, str]) -> Optional[Tuple[float, float]]:
+        """
+        Returns cpu time and wallclock in seconds of a running job as of the
+        last refresh, or None if they are not known. Tasks of array jobs are
+        given as ``<job id>.<task id>``.
+        """
+        usage = self.get().get("usage", {}).get(str(jobid))
+        return tuple(usage) if usage else None
+
+    def get(self) -> dict:
+        snapshot = self._read()
+        if self._is_fresh(snapshot):
+            return snapshot
+
+        OSLayer.mkdir(self._directory)
+        with self._lock(blocking=snapshot is None) as is_leader:
+            if not is_leader:
+                # another process is refreshing, the stale copy will do
+                return snapshot
+            snapshot = self._read()
+            if not self._is_fresh(snapshot):
+                snapshot = self._refresh()
+        return snapshot
+
+    def _is_fresh(self, snapshot: Optional[dict]) -> bool:
+        if snapshot is None:
+            return False
+        if self._with_usage and "usage" not in snapshot:
+            return False
+        return time.time() - snapshot["timestamp"] < self.ttl
+
+    def _read(self) -> Optional[dict]:
+        try:
+            with self.path.open() as stream:
+                return json.load(stream)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write(self, snapshot: dict):
+        tmp_path = self.path.with_name(
+            "{name}.{pid}".format(name=self.path.name, pid=os.getpid())
+        )
+        with tmp_path.open("w") as stream:
+            json.dump(snapshot, stream)
+        os.replace(str(tmp_path), str(self.path))
+
+    def _refresh(self) -> dict:
+        try:
+            with OSLayer.stream_process(self.qstat_cmd) as output_stream:
+                jobs, usage = self.parse_qstat_xml_with_usage(
+                    output_stream, with_usage=self._with_usage
+                )
+        except (ProcessStreamError, ParseError) as error:
+            raise SnapshotError(
+                "qstat failed for user {user} with: {error}".format(
+                    user=self._user, error=error
+                )
+            )
+        snapshot = {
+            "timestamp": time.time(),
+            "max_jobid": max(
+                (int(jobid) for jobid in jobs if "." not in jobid), default=0
+            ),
+            "jobs": jobs,
+        }
+        if self._with_usage:
+            snapshot["usage"] = usage
+        self._write(snapshot)
+        return snapshot
+
+    @contextmanager
+    def _lock(self, blocking: bool):
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        with self.lock_path.open("a") as lock_file:
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def parse_qstat_xml(output_stream: IO[bytes]) -> Dict[str, str]:
+        """
+        Maps the jobids found in ``qstat -xml`` output to their state. Array
+        jobs are listed once per task or task range; the first entry wins
+        for the job, and each task is also listed as ``<job id>.<task id>``.
+        """
+        return QstatSnapshot.parse_qstat_xml_with_usage(
+            output_stream, with_usage=False
+        )[0]
+
+    @staticmethod
+    def parse_qstat_xml_with_usage(
+        output_stream: IO[bytes],
+        with_usage: bool = True,
+    ) -> Tuple[Dict[str, str], Dict[str, List[float]]]:
+        """
+        Like parse_qstat_xml, but also returns ``[cpu, wallclock]`` in
+        seconds of the running jobs that ``qstat -xml -ext`` reports cpu
+        time for, keyed like the states. Without ``with_usage`` the usage is left empty, which
+        saves converting the start time of every job.
+        """
+        jobs = {}
+        usage = {}
+        now = time.time()
+        for record in iter_job_records(output_stream):
+            if record.jobid is None:
+                continue
+            jobid = str(record.jobid)
+            task_jobids = [
+                "{jobid}.{task_id}".format(jobid=jobid, task_id=task_id)
+                for task_id in QstatSnapshot.task_ids(record.tasks)
+            ]
+            for key in [jobid] + task_jobids:
+                jobs.setdefault(key, record.state or "")
+            if not with_usage or record.cpu is None:
+                continue
+            started = start_timestamp(record.start_time)
+            if started is not None:
+                # a running task is listed on its own, with its own usage
+                for key in [jobid] + task_jobids:
+                    usage.setdefault(key, [record.cpu, max(0.0, now - started)])
+        return jobs, usage
+
+    @staticmethod
+    def task_ids(tasks: Optional[str]) -> Iterator[int]:
+        """
+        Expands the task ids of an array job as printed by qstat, e.g. ``4``,
+        ``2-10:2`` or ``1,3-5:1``.
+        """
+        for part in (tasks or "").split(","):
+            first, _, rest = part.partition("-")
+            last, _, step = rest.partition(":")
+            if not (first + last + step).isdigit():
+                continue
+            yield from range(
+                int(first), int(last or first) + 1, int(step or 1)
+            )
@@ -0,0 +1,80 @@
+import time
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+from typing import IO, Iterator, Optional
+
+JobRecord = namedtuple(
+    "JobRecord",
+    ["jobid", "name", "owner", "state", "queue", "slots", "tasks", "start_time", "cpu"],
+)
+
+# child elements of <job_list> in `qstat -xml` and the JobRecord field they fill
+JOB_LIST_FIELDS = {
+    "JB_job_number": "jobid",
+    "JB_name": "name",
+    "JB_owner": "owner",
+    "state": "state",
+    "queue_name": "queue",
+    "slots": "slots",
+    "tasks": "tasks",
+    "JAT_start_time": "start_time",
+    "cpu_usage": "cpu",
+}
+
+
+def _number(text: Optional[str], convert=int):
+    try:
+        return convert(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def start_timestamp(start_time: Optional[str]) -> Optional[float]:
+    """
+    Converts a JAT_start_time such as ``2020-08-06T11:02:33`` (local time,
+    newer releases append milliseconds) to seconds since the epoch.
+    """
+    if not start_time:
+        return None
+    try:
+        return time.mktime(time.strptime(start_time[:19], "%Y-%m-%dT%H:%M:%S"))
+    except ValueError:
+        return None
+
+
+def iter_job_records(stream: IO[bytes]) -> Iterator[JobRecord]:
+    """
+    Parses the output of ``qstat -xml`` (optionally with ``-ext``) one
+    <job_list> element at a time and yields a JobRecord per element, so
+    the document is never held in memory as a whole. Array jobs yield one
+    record per line qstat prints for them, with the task range in ``tasks``.
+    """
+    fields = {}
+    # the elements that have started but not ended, so a finished <job_list>
+    # can be taken off its parent
+    open_elements = []
+    for event, element in ElementTree.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            open_elements.append(element)
+            continue
+        open_elements.pop()
+        tag = element.tag
+        if tag in JOB_LIST_FIELDS:
+            fields[JOB_LIST_FIELDS[tag]] = element.text
+        elif tag == "job_list":
+            yield JobRecord(
+                jobid=_number(fields.get("jobid")),
+                name=fields.get("name"),
+                owner=fields.get("owner"),
+                state=fields.get("state"),
+                queue=fields.get("queue"),
+                slots=_number(fields.get("slots")),
+                tasks=fields.get("tasks"),
+                start_time=fields.get("start_time"),
+                cpu=_number(fields.get("cpu"), float),
+            )
+            fields = {}
+            # memory stays flat only if nothing is kept of the finished
+            # element; it is the last child of its parent, so this is cheap
+            if open_elements:
+                open_elements[-1].remove(element)
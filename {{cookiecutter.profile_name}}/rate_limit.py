@@ -0,0 +1,114 @@
+import fcntl
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Union
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from metrics import SCHEDULER_COMMANDS, command_kind
+else:
+    from .OSLayer import OSLayer
+    from .metrics import SCHEDULER_COMMANDS, command_kind
+
+# tokens left and time of the last refill of every scheduler command
+BUCKET = struct.Struct("dd")
+
+
+def rate_limit_path() -> Path:
+    """
+    The buckets are shared by all workflows the user runs on this host, so
+    they live in the temporary directory rather than in a log directory.
+    """
+    return Path(tempfile.gettempdir()) / "uge-rate-limit-{uid}".format(uid=os.getuid())
+
+
+class RateLimiter:
+    """
+    Token buckets limiting the rate of each scheduler command, shared by all
+    processes through a small memory-mapped file.
+
+    Every command takes a token from the bucket of its kind; a bucket holds
+    at most ``max(1, rate)`` tokens and refills at ``rate`` tokens per second.
+    If the bucket is empty the token is taken in advance, so waiting callers
+    are served in order, and the caller sleeps until it is due. The file is
+    only locked while a bucket is updated, never while sleeping.
+    """
+
+    def __init__(self, path: Path, rates: Dict[str, float]):
+        self._path = Path(path)
+        self._rates = {
+            kind: rate for kind, rate in rates.items() if kind in SCHEDULER_COMMANDS
+        }
+        self._fd = None
+        self._map = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def _open(self):
+        if self._map is None:
+            size = BUCKET.size * len(SCHEDULER_COMMANDS)
+            fd = os.open(
+                str(self._path), os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600
+            )
+            try:
+                if os.fstat(fd).st_size < size:
+                    # a new file is all zeros: buckets that are due a full refill
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+            except OSError:
+                os.close(fd)
+                raise
+            self._fd = fd
+        return self._map
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = None
+            self._fd = None
+
+    def reserve(self, kind: str) -> float:
+        """
+        Takes a token for a command of the given kind and returns the
+        seconds to wait before running it.
+        """
+        rate = self._rates.get(kind)
+        if not rate or rate <= 0:
+            return 0.0
+        capacity = max(1.0, rate)
+        offset = SCHEDULER_COMMANDS.index(kind) * BUCKET.size
+        buckets = self._open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            tokens, refilled = BUCKET.unpack_from(buckets, offset)
+            now = time.time()
+            tokens = min(capacity, tokens + max(0.0, now - refilled) * rate) - 1
+            BUCKET.pack_into(buckets, offset, tokens, now)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return -tokens / rate if tokens < 0 else 0.0
+
+    def acquire(self, cmd: Union[str, List[str]]):
+        kind = command_kind(cmd)
+        try:
+            delay = self.reserve(kind)
+        except OSError:
+            # an unusable buckets file must not stop the workflow
+            return
+        if delay > 0:
+            time.sleep(delay)
+
+
+def install_rate_limiter(rates: Dict[str, float]) -> RateLimiter:
+    """Makes OSLayer wait for a token before every scheduler command it runs."""
+    OSLayer.rate_limiter = RateLimiter(rate_limit_path(), rates)
+    return OSLayer.rate_limiter
@@ -0,0 +1,289 @@
+import hashlib
+import json
+import math
+import os
+import time
+from collections import namedtuple
+from contextlib import closing
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
+
+if TYPE_CHECKING:
+    import sqlite3
+
+PathLike = Union[str, Path]
+
+
+class ResourceHistoryError(Exception):
+    pass
+
+
+ResourceUsage = namedtuple("ResourceUsage", ["maxvmem_mb", "cpu", "wallclock"])
+# properties that can grow with the attempt of a job
+ATTEMPT_PROPERTIES = ("jobid", "threads", "resources", "cluster")
+
+
+def retry_key(job_properties: dict) -> str:
+    """Identifies a job across its attempts, by its rule, wildcards, files etc."""
+    properties = {
+        key: value
+        for key, value in job_properties.items()
+        if key not in ATTEMPT_PROPERTIES
+    }
+    return hashlib.sha1(
+        json.dumps(properties, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def input_size_bucket(paths: Iterable[str]) -> int:
+    """
+    Jobs of a rule are compared with jobs of similar total input size: the
+    bucket is the number of binary digits of the size in megabytes, so each
+    bucket spans a factor of two.
+    """
+    size = 0
+    for path in paths:
+        try:
+            size += os.stat(path).st_size
+        except (OSError, TypeError):
+            pass
+    return int(size // 2 ** 20).bit_length()
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of a non-empty list of values."""
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+class ResourceHistory:
+    """
+    Memory and cpu used by the finished jobs of the workflow, per rule and
+    input size bucket, kept in an SQLite database in the log directory.
+
+    A job is registered when it is submitted, with its rule, input size
+    bucket, retry key and requested memory. Once the status check has found
+    that it succeeded, its usage from the accounting records or qacct is
+    added as a sample. A failed job stays registered, so its retries are
+    recognized; if it used the memory it requested, it was most likely
+    killed for it, and the request is added as a sample the estimates have
+    to exceed. Only the most recent ``MAX_SAMPLES`` samples of a rule are
+    kept.
+    """
+
+    DATABASE_NAME = ".resource_history.sqlite"
+    MAX_SAMPLES = 100
+    # the share of its memory request a job that was killed for it has used
+    KILLED_MEMORY_FRACTION = 0.95
+
+    def __init__(self, directory: PathLike):
+        self._path = Path(directory) / self.DATABASE_NAME
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def record_submission(
+        self,
+        jobid: Union[int, str],
+        rule: str,
+        input_bucket: int,
+        key: Optional[str] = None,
+        mem_mb: Optional[float] = None,
+    ):
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (jobid, rule, input_bucket, retry_key, "
+            "mem_mb, failed) VALUES (?, ?, ?, ?, ?, 0)",
+            (str(jobid), rule, input_bucket, key, mem_mb),
+        )
+
+    def is_registered(self, jobid: Union[int, str]) -> bool:
+        """Whether the job was submitted and has not been seen to finish."""
+        return bool(
+            self._execute(
+                "SELECT 1 FROM jobs WHERE jobid = ? AND failed = 0", (str(jobid),)
+            )
+        )
+
+    def is_retry(self, key: str) -> bool:
+        """Whether an earlier attempt of the job with the retry key failed."""
+        return bool(
+            self._execute(
+                "SELECT 1 FROM jobs WHERE retry_key = ? AND failed = 1 LIMIT 1",
+                (key,),
+            )
+        )
+
+    def record_usage(self, jobid: Union[int, str], usage: ResourceUsage):
+        """
+        Adds the usage of a successful job if it was registered on submission,
+        and forgets its failed attempts.
+        """
+        import sqlite3
+
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                job = conn.execute(
+                    "SELECT rule, input_bucket, retry_key FROM jobs WHERE jobid = ?",
+                    (str(jobid),),
+                ).fetchone()
+                if job is not None:
+                    rule, input_bucket, key = job
+                    self._add_sample(conn, rule, input_bucket, usage, killed=False)
+                    conn.execute(
+                        "DELETE FROM jobs WHERE jobid = ? OR retry_key = ?",
+                        (str(jobid), key),
+                    )
+                conn.execute("COMMIT")
+        except sqlite3.Error as error:
+            raise ResourceHistoryError(error)
+
+    def record_failure(self, jobid: Union[int, str], usage: Optional[ResourceUsage]):
+        """
+        Marks a registered job as failed and, if its usage shows that it ran
+        out of the memory it requested, adds the request as a sample.
+        """
+        import sqlite3
+
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                job = conn.execute(
+                    "SELECT rule, input_bucket, mem_mb FROM jobs "
+                    "WHERE jobid = ? AND failed = 0",
+                    (str(jobid),),
+                ).fetchone()
+                if job is not None:
+                    rule, input_bucket, mem_mb = job
+                    if (
+                        usage is not None
+                        and mem_mb
+                        and usage.maxvmem_mb >= mem_mb * self.KILLED_MEMORY_FRACTION
+                    ):
+                        self._add_sample(
+                            conn,
+                            rule,
+                            input_bucket,
+                            usage._replace(maxvmem_mb=mem_mb),
+                            killed=True,
+                        )
+                    conn.execute(
+                        "UPDATE jobs SET failed = 1 WHERE jobid = ?", (str(jobid),)
+                    )
+                conn.execute("COMMIT")
+        except sqlite3.Error as error:
+            raise ResourceHistoryError(error)
+
+    def _add_sample(
+        self,
+        conn: "sqlite3.Connection",
+        rule: str,
+        input_bucket: int,
+        usage: ResourceUsage,
+        killed: bool,
+    ):
+        conn.execute(
+            "INSERT INTO samples (rule, input_bucket, maxvmem_mb, cpu, wallclock, "
+            "killed, recorded) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (rule, input_bucket) + tuple(usage) + (int(killed), time.time()),
+        )
+        conn.execute(
+            "DELETE FROM samples WHERE rule = ? AND rowid NOT IN (SELECT rowid "
+            "FROM samples WHERE rule = ? ORDER BY recorded DESC LIMIT ?)",
+            (rule, rule, self.MAX_SAMPLES),
+        )
+
+    def estimate_memory(
+        self,
+        rule: str,
+        input_bucket: int,
+        percent: float,
+        headroom: float,
+        min_samples: int,
+    ) -> Optional[int]:
+        """
+        Returns the given percentile of the memory used by earlier jobs of
+        the rule, but at least the largest request a job was killed for, plus
+        ``headroom`` (a fraction), in megabytes. Jobs of the same input size
+        bucket are used if there are at least ``min_samples`` of them,
+        otherwise all jobs of the rule. Returns None if the rule has fewer
+        samples than that.
+        """
+        samples = self._samples(rule, input_bucket, min_samples)
+        if samples is None:
+            return None
+        mem_mb = max(
+            [percentile([sample[0] for sample in samples], percent)]
+            + [sample[0] for sample in samples if sample[3]]
+        )
+        return math.ceil(mem_mb * (1 + headroom))
+
+    def estimate_runtime(
+        self,
+        rule: str,
+        input_bucket: int,
+        percent: float,
+        headroom: float,
+        min_samples: int,
+    ) -> Optional[int]:
+        """
+        Returns the given percentile of the wallclock of earlier jobs of the
+        rule plus ``headroom``, in whole minutes, chosen like ``estimate``.
+        """
+        samples = self._samples(rule, input_bucket, min_samples)
+        # killed jobs did not run for as long as they needed
+        wallclocks = [sample[2] for sample in samples or [] if not sample[3]]
+        if not wallclocks:
+            return None
+        wallclock = percentile(wallclocks, percent)
+        return max(1, math.ceil(wallclock * (1 + headroom) / 60))
+
+    def _samples(self, rule: str, input_bucket: int, min_samples: int) -> Optional[list]:
+        query = (
+            "SELECT maxvmem_mb, cpu, wallclock, killed FROM samples "
+            "WHERE rule = ? {bucket}"
+            "ORDER BY recorded DESC LIMIT {limit}"
+        )
+        for bucket, parameters in (
+            ("AND input_bucket = ? ", (rule, input_bucket)),
+            ("", (rule,)),
+        ):
+            samples = self._execute(
+                query.format(bucket=bucket, limit=self.MAX_SAMPLES), parameters
+            )
+            if len(samples) >= max(min_samples, 1):
+                return samples
+        return None
+
+    def _execute(self, statement: str, parameters: tuple) -> list:
+        import sqlite3  # only opened when auto-sizing is enabled
+
+        try:
+            with closing(self._connect()) as conn:
+                return conn.execute(statement, parameters).fetchall()
+        except sqlite3.Error as error:
+            raise ResourceHistoryError(error)
+
+    def _connect(self) -> "sqlite3.Connection":
+        import sqlite3
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (jobid TEXT PRIMARY KEY, rule TEXT, "
+            "input_bucket INTEGER, retry_key TEXT, mem_mb REAL, failed INTEGER)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_by_retry_key ON jobs (retry_key, failed)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS samples (rule TEXT, input_bucket INTEGER, "
+            "maxvmem_mb REAL, cpu REAL, wallclock REAL, killed INTEGER, recorded REAL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS samples_by_rule "
+            "ON samples (rule, input_bucket, recorded)"
+        )
+        return conn
@@ -0,0 +1,152 @@
+import fcntl
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Union
+
+PathLike = Union[str, Path]
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with jitter: the n-th retry (counting from 0) waits
+    ``base_delay * multiplier ** n`` seconds, capped at ``max_delay`` and
+    shortened by up to ``jitter`` (a fraction) at random so that concurrent
+    status checks do not retry in lockstep.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int,
+        base_delay: float,
+        max_delay: float,
+        multiplier: float = 2.0,
+        jitter: float = 0.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around qmaster queries, shared by all status checks of a
+    workflow through a state file.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and no
+    status check queries the qmaster; callers serve the last known state of
+    their job instead. After ``reset_timeout`` seconds the breaker half-opens
+    and lets a single status check probe the qmaster: success closes the
+    breaker again, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    MAX_REMEMBERED_JOBS = 1000
+    STATE_NAME = ".qmaster_breaker.json"
+    LOCK_NAME = ".qmaster_breaker.lock"
+
+    def __init__(self, directory: PathLike, failure_threshold: int, reset_timeout: float):
+        self._directory = Path(directory)
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+
+    @property
+    def path(self) -> Path:
+        return self._directory / self.STATE_NAME
+
+    @property
+    def lock_path(self) -> Path:
+        return self._directory / self.LOCK_NAME
+
+    @property
+    def state(self) -> str:
+        return self._read()["state"]
+
+    def allow_request(self) -> bool:
+        with self._locked_state() as state:
+            if state["state"] == self.CLOSED:
+                return True
+            if time.time() - state["changed"] < self._reset_timeout:
+                return False
+            # open for long enough, or the previous probe never reported back
+            state["state"] = self.HALF_OPEN
+            state["changed"] = time.time()
+            return True
+
+    def record_success(self):
+        state = self._read()
+        if state["state"] == self.CLOSED and not state["failures"]:
+            return  # nothing to reset, no need for the lock
+        with self._locked_state() as state:
+            state["state"] = self.CLOSED
+            state["failures"] = 0
+
+    def record_failure(self):
+        with self._locked_state() as state:
+            state["failures"] += 1
+            if (
+                state["state"] == self.HALF_OPEN
+                or state["failures"] >= self._failure_threshold
+            ):
+                state["state"] = self.OPEN
+                state["changed"] = time.time()
+
+    def remember(self, jobid: int, status: str):
+        """
+        Keeps the status of the job for when the breaker is open. Only the
+        ``MAX_REMEMBERED_JOBS`` most recently changed jobs are kept, so the
+        state file stays small, and the lock is only taken for changes.
+        """
+        key = str(jobid)
+        if self._read()["jobs"].get(key) == status:
+            return
+        with self._locked_state() as state:
+            jobs = state["jobs"]
+            jobs.pop(key, None)
+            jobs[key] = status
+            # JSON objects keep their order, the oldest entries come first
+            for old_key in list(jobs)[: -self.MAX_REMEMBERED_JOBS]:
+                del jobs[old_key]
+
+    def last_known(self, jobid: int) -> Optional[str]:
+        return self._read()["jobs"].get(str(jobid))
+
+    def _read(self) -> dict:
+        try:
+            with self.path.open() as stream:
+                return json.load(stream)
+        except (FileNotFoundError, ValueError):
+            return {"state": self.CLOSED, "failures": 0, "changed": 0, "jobs": {}}
+
+    def _write(self, state: dict):
+        tmp_path = self.path.with_name(
+            "{name}.{pid}".format(name=self.path.name, pid=os.getpid())
+        )
+        with tmp_path.open("w") as stream:
+            json.dump(state, stream)
+        os.replace(str(tmp_path), str(self.path))
+
+    @contextmanager
+    def _locked_state(self):
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                state = self._read()
+                before = json.dumps(state, sort_keys=True)
+                yield state
+                if json.dumps(state, sort_keys=True) != before:
+                    self._write(state)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+
+if TYPE_CHECKING:
+    import sqlite3
+
+PathLike = Union[str, Path]
+
+# the states reported to snakemake; a job is in flight until it has one of
+# the terminal ones
+RUNNING = "running"
+TERMINAL_STATES = ("success", "failed")
+
+
+class RunStateError(Exception):
+    pass
+
+
+def job_fingerprint(job_properties: dict) -> str:
+    """
+    Identifies a job across runs of the workflow by its job properties,
+    without the job id snakemake numbers the jobs of each run with.
+    """
+    properties = {
+        key: value for key, value in job_properties.items() if key != "jobid"
+    }
+    return hashlib.sha1(
+        json.dumps(properties, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+class RunState:
+    """
+    What the profile has submitted for the workflow, kept in an SQLite
+    database in the log directory: per job id handed to snakemake, the
+    snakemake job id, the fingerprint of the job, its cluster log, when it
+    was submitted with which resources, and the state the status checks last
+    reported, with the time they did.
+
+    The database is opened in WAL mode, as the submissions and the status
+    checks of many jobs write to it at the same time.
+    """
+
+    DATABASE_NAME = ".run_state.sqlite"
+
+    def __init__(self, directory: PathLike):
+        self._path = Path(directory) / self.DATABASE_NAME
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    def record_submission(
+        self,
+        jobid: Union[int, str],
+        snakemake_jobid: str,
+        fingerprint: str,
+        outlog: PathLike,
+        resources: str,
+    ):
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (jobid, snakemake_jobid, fingerprint, "
+            "outlog, resources, submitted, state, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                str(jobid),
+                snakemake_jobid,
+                fingerprint,
+                str(outlog),
+                resources,
+                now,
+                RUNNING,
+                now,
+            ),
+        )
+
+    def record_state(self, jobid: Union[int, str], state: str):
+        """Updates the last observed state of a job, if it was submitted."""
+        self._execute(
+            "UPDATE jobs SET state = ?, updated = ? WHERE jobid = ?",
+            (state, time.time(), str(jobid)),
+        )
+
+    def record_reattachment(self, jobid: Union[int, str], snakemake_jobid: str):
+        """Hands the job to the job id snakemake gave it in a later run."""
+        self._execute(
+            "UPDATE jobs SET snakemake_jobid = ?, updated = ? WHERE jobid = ?",
+            (snakemake_jobid, time.time(), str(jobid)),
+        )
+
+    def record_states(self, jobids: Iterable[str], state: str):
+        now = time.time()
+        self._execute_many(
+            "UPDATE jobs SET state = ?, updated = ? WHERE jobid = ?",
+            [(state, now, str(jobid)) for jobid in jobids],
+        )
+
+    def job(self, jobid: Union[int, str]) -> Optional[dict]:
+        rows = self._execute("SELECT * FROM jobs WHERE jobid = ?", (str(jobid),))
+        return rows[0] if rows else None
+
+    def terminal_state(
+        self, jobid: Union[int, str], outlog: PathLike
+    ) -> Optional[str]:
+        """
+        Returns the state the job was last seen in if it has finished. The
+        cluster log has to match, as UGE reuses job numbers over time.
+        """
+        job = self.job(jobid)
+        if job is None or job["outlog"] != str(outlog):
+            return None
+        return job["state"] if job["state"] in TERMINAL_STATES else None
+
+    def in_flight(self, fingerprint: str) -> Optional[dict]:
+        """The most recent job with the fingerprint that has not finished yet."""
+        rows = self._execute(
+            "SELECT * FROM jobs WHERE fingerprint = ? AND state = ? "
+            "ORDER BY submitted DESC LIMIT 1",
+            (fingerprint, RUNNING),
+        )
+        return rows[0] if rows else None
+
+    def _execute(self, statement: str, parameters: tuple) -> list:
+        import sqlite3  # only opened when the run state is kept
+
+        try:
+            with closing(self._connect()) as conn:
+                return [dict(row) for row in conn.execute(statement, parameters)]
+        except sqlite3.Error as error:
+            raise RunStateError(error)
+
+    def _execute_many(self, statement: str, parameters: list):
+        import sqlite3
+
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(statement, parameters)
+                conn.execute("COMMIT")
+        except sqlite3.Error as error:
+            raise RunStateError(error)
+
+    def _connect(self) -> "sqlite3.Connection":
+        import sqlite3
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # with WAL, readers do not wait for writers; NORMAL sync cannot
+        # corrupt a WAL database and skips most fsyncs
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (jobid TEXT PRIMARY KEY, "
+            "snakemake_jobid TEXT, fingerprint TEXT, outlog TEXT, resources TEXT, "
+            "submitted REAL, state TEXT, updated REAL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_by_fingerprint "
+            "ON jobs (fingerprint, state, submitted)"
+        )
+        return conn
@@ -0,0 +1,203 @@
+import abc
+import atexit
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+else:
+    from .OSLayer import OSLayer
+
+
+class SchedulerError(Exception):
+    pass
+
+
+class SchedulerBackend(abc.ABC):
+    """
+    The scheduler operations that can be done either with the UGE command
+    line tools or through a scheduler library.
+    """
+
+    # the scheduler no longer knows the job; its exit status has to be
+    # determined from the accounting records or the cluster log
+    FINISHED = "finished"
+
+    @abc.abstractmethod
+    def submit(self, args: List[str], jobscript: str) -> str:
+        """Submits the jobscript with the given qsub options, returns the job id."""
+
+    @abc.abstractmethod
+    def job_state(self, jobid: Union[int, str]) -> Optional[str]:
+        """
+        Returns the short qstat state of the job, FINISHED if the job has
+        left the scheduler, or None if the backend cannot tell, in which
+        case the status checks query qstat/qacct.
+        """
+
+    @abc.abstractmethod
+    def cancel(self, jobids: List[str]) -> str:
+        """Cancels the jobs and returns what the scheduler reported."""
+
+
+class CliBackend(SchedulerBackend):
+    """The default backend, running the qsub and qdel commands."""
+
+    def submit(self, args: List[str], jobscript: str) -> str:
+        returncode, output_stream, error_stream = OSLayer.run_process(
+            ["qsub"] + args + [jobscript]
+        )
+        if returncode != 0:
+            raise SchedulerError(error_stream)
+        match = re.search(r"Your job (\d+) .*", output_stream)
+        if match is None:
+            raise SchedulerError(
+                "no job id in qsub output: {output}".format(output=output_stream)
+            )
+        return match.group(1)
+
+    def job_state(self, jobid: Union[int, str]) -> Optional[str]:
+        # qstat is queried by the status checks themselves, with retries,
+        # snapshots and the hung job checks
+        return None
+
+    def cancel(self, jobids: List[str]) -> str:
+        returncode, output_stream, error_stream = OSLayer.run_process(
+            ["qdel"] + jobids
+        )
+        if returncode != 0:
+            raise SchedulerError(error_stream)
+        return output_stream
+
+
+class DrmaaBackend(SchedulerBackend):
+    """
+    Submits, queries and cancels jobs through one DRMAA 1.0 session of the
+    ``drmaa`` python bindings, without starting any process. The session is
+    kept for the lifetime of the process, which pays off in the submit
+    broker and the status server.
+    """
+
+    # the jobscript is a script to be spooled, not a binary on the exec host
+    NATIVE_DEFAULTS = "-b n"
+
+    def __init__(self, drmaa_module=None):
+        if drmaa_module is None:
+            try:
+                import drmaa as drmaa_module
+            except (ImportError, RuntimeError, OSError) as error:
+                # the bindings raise RuntimeError if libdrmaa cannot be found
+                raise SchedulerError(
+                    "drmaa is not available: {error}".format(error=error)
+                )
+        self._drmaa = drmaa_module
+        job_state = drmaa_module.JobState
+        self._states = {
+            job_state.QUEUED_ACTIVE: "qw",
+            job_state.SYSTEM_ON_HOLD: "hqw",
+            job_state.USER_ON_HOLD: "hqw",
+            job_state.USER_SYSTEM_ON_HOLD: "hqw",
+            job_state.RUNNING: "r",
+            job_state.SYSTEM_SUSPENDED: "s",
+            job_state.USER_SUSPENDED: "s",
+            job_state.USER_SYSTEM_SUSPENDED: "s",
+            job_state.DONE: self.FINISHED,
+            job_state.FAILED: self.FINISHED,
+        }  # type: Dict[str, str]
+        self._session = drmaa_module.Session()
+        try:
+            self._session.initialize()
+        except drmaa_module.DrmaaException as error:
+            raise SchedulerError(error)
+        atexit.register(self.close)
+
+    def close(self):
+        if self._session is not None:
+            try:
+                self._session.exit()
+            except self._drmaa.DrmaaException:
+                pass
+            self._session = None
+
+    def submit(self, args: List[str], jobscript: str) -> str:
+        if any(len(arg.split()) != 1 for arg in args):
+            # the native specification is split at whitespace and does not
+            # undo quotes, so such options only reach UGE through qsub
+            return CliBackend().submit(args, jobscript)
+        template = self._session.createJobTemplate()
+        try:
+            template.remoteCommand = str(jobscript)
+            template.workingDirectory = os.getcwd()
+            template.nativeSpecification = " ".join([self.NATIVE_DEFAULTS] + args)
+            return str(self._session.runJob(template))
+        except self._drmaa.DrmaaException as error:
+            raise SchedulerError(error)
+        finally:
+            self._session.deleteJobTemplate(template)
+
+    def job_state(self, jobid: Union[int, str]) -> Optional[str]:
+        try:
+            state = self._session.jobStatus(str(jobid))
+        except self._drmaa.InvalidJobException:
+            return self.FINISHED
+        except self._drmaa.DrmaaException:
+            return None
+        return self._states.get(state)
+
+    def cancel(self, jobids: List[str]) -> str:
+        errors = []
+        for jobid in jobids:
+            try:
+                self._session.control(jobid, self._drmaa.JobControlAction.TERMINATE)
+            except self._drmaa.InvalidJobException:
+                pass  # already finished
+            except self._drmaa.DrmaaException as error:
+                errors.append("{jobid}: {error}".format(jobid=jobid, error=error))
+        if errors:
+            raise SchedulerError("\n".join(errors))
+        return ""
+
+
+_backends = {}  # type: Dict[str, SchedulerBackend]
+# whether the process lives long enough for a DRMAA session to pay off
+_keep_sessions = False
+
+
+def keep_sessions():
+    """
+    Called by the submit broker and the status server, which serve the
+    whole workflow from one process. Only they get a DRMAA session; the
+    submit, status and cancel scripts run once per job and use the command
+    line tools, instead of opening a session of their own on every call.
+    """
+    global _keep_sessions
+    _keep_sessions = True
+
+
+def get_backend(name: str) -> SchedulerBackend:
+    """
+    Returns the backend of the given name, created once per process. Falls
+    back to the command line tools if DRMAA is not available, or if the
+    process does not keep sessions.
+    """
+    if not _keep_sessions:
+        name = "cli"
+    backend = _backends.get(name)
+    if backend is None:
+        if name == "drmaa":
+            try:
+                backend = DrmaaBackend()
+            except SchedulerError as error:
+                print(
+                    "{error}, using the command line tools".format(error=error),
+                    file=sys.stderr,
+                )
+                backend = CliBackend()
+        else:
+            backend = CliBackend()
+        _backends[name] = backend
+    return backend
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import re
+import sys
+from pathlib import Path
+from typing import List
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from CookieCutter import CookieCutter
+    from optional_module import optional_module
+    from scheduler_backend import SchedulerError, get_backend
+else:
+    from .CookieCutter import CookieCutter
+    from .optional_module import optional_module
+    from .scheduler_backend import SchedulerError, get_backend
+
+
+def job_ids(arguments: List[str]) -> List[str]:
+    """
+    Snakemake passes the lines printed by uge_submit.py, i.e. the job id
+    followed by the cluster log of the job. Only the job ids are cancelled.
+    """
+    return [arg for arg in arguments if re.fullmatch(r"\d+(\.\d+)?", arg)]
+
+
+def pilot_task_ids(arguments: List[str]) -> List[str]:
+    JOBID_PREFIX = optional_module("pilot").JOBID_PREFIX
+
+    return [
+        arg[len(JOBID_PREFIX):] for arg in arguments if arg.startswith(JOBID_PREFIX)
+    ]
+
+
+def local_job_ids(arguments: List[str]) -> List[str]:
+    LOCAL_JOBID_PREFIX = optional_module("local_lane").JOBID_PREFIX
+
+    return [
+        arg[len(LOCAL_JOBID_PREFIX):]
+        for arg in arguments
+        if arg.startswith(LOCAL_JOBID_PREFIX)
+    ]
+
+
+def cancel_local_jobs(local_ids: List[str]) -> List[str]:
+    """Returns the job ids of the jobs that were terminated."""
+    LOCAL_JOBID_PREFIX = optional_module("local_lane").JOBID_PREFIX
+    LocalLane = optional_module("local_lane").LocalLane
+    local_lane_directory = optional_module("local_lane").local_lane_directory
+
+    lane = LocalLane(local_lane_directory(CookieCutter.get_log_dir()))
+    return [
+        LOCAL_JOBID_PREFIX + local_id
+        for local_id in local_ids
+        if lane.cancel(local_id)
+    ]
+
+
+def cancel_pilot_tasks(task_ids: List[str]) -> List[str]:
+    """
+    Tasks still queued for the pilot workers are removed from the queue;
+    tasks a worker has started run to the end. Returns the job ids of the
+    tasks that were removed.
+    """
+    JOBID_PREFIX = optional_module("pilot").JOBID_PREFIX
+    PilotQueue = optional_module("pilot").PilotQueue
+    pilot_directory = optional_module("pilot").pilot_directory
+
+    queue = PilotQueue(pilot_directory(CookieCutter.get_log_dir()))
+    return [JOBID_PREFIX + task_id for task_id in task_ids if queue.cancel(task_id)]
+
+
+def record_cancelled_jobs(cancelled: List[str]):
+    """
+    Cancelled jobs are failed in the run state, so a restarted workflow
+    submits them again instead of waiting for them. Only jobs that were
+    actually cancelled are passed, the others still report themselves.
+    """
+    RunState = optional_module("run_state").RunState
+    RunStateError = optional_module("run_state").RunStateError
+
+    try:
+        RunState(CookieCutter.get_log_dir()).record_states(cancelled, "failed")
+    except RunStateError as error:
+        print(error, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    jobids = job_ids(sys.argv[1:])
+    cancelled = cancel_local_jobs(local_job_ids(sys.argv[1:]))
+    cancelled += cancel_pilot_tasks(pilot_task_ids(sys.argv[1:]))
+    if CookieCutter.get_use_rate_limiter():
+        install_rate_limiter = optional_module("rate_limit").install_rate_limiter
+        install_rate_limiter(CookieCutter.get_rate_limits())
+    failed = False
+    if jobids:
+        try:
+            print(get_backend(CookieCutter.get_scheduler_backend()).cancel(jobids))
+            cancelled += jobids
+        except SchedulerError as error:
+            print(error, file=sys.stderr)
+            failed = True
+    if CookieCutter.get_use_run_state():
+        record_cancelled_jobs(cancelled)
+    if failed:
+        sys.exit(1)
@@ -1,13 +1,44 @@
-from typing import TextIO, Union, List, Any
-
-import yaml
+import marshal
+import os
+import shlex
+import time
+from pathlib import Path
+from typing import TextIO, Union, List, Any, Dict, Optional, Tuple
 
 
 class Config:
-    def __init__(self, data: dict = None):
+    CACHE_VERSION = 2
+    # filesystems with coarse timestamps can give a file that is edited right
+    # after it has been cached the same mtime, so young files are not cached
+    CACHE_MIN_AGE = 2.0
+    PILOT_DEFAULTS = dict(
+        rules=[],
+        workers=4,
+        threads=1,
+        mem_mb=4000,
+        runtime=None,
+        args="",
+        idle_timeout=300,
+    )
+    LOCAL_DEFAULTS = dict(
+        rules=[],
+        max_runtime=None,
+        max_jobs=2,
+        max_threads=1,
+        max_mem_mb=2000,
+    )
+
+    def __init__(
+        self,
+        data: dict = None,
+        rule_params: Dict[str, str] = None,
+        rule_args: Dict[str, List[str]] = None,
+    ):
         if data is None:
             data = dict()
         self._data = data
+        self._rule_params = dict(rule_params or {})
+        self._rule_args = dict(rule_args or {})
 
     def __bool__(self) -> bool:
         return bool(self._data)
@@ -24,15 +55,151 @@ class Config:
             return params
         return " ".join(filter(None, params))
 
+    @staticmethod
+    def is_rule(key: Any) -> bool:
+        """Keys like ``__default__`` hold settings, not rule parameters."""
+        return isinstance(key, str) and not (
+            key.startswith("__") and key.endswith("__")
+        )
+
     def default_params(self) -> str:
         return self.concatenate_params(self.get("__default__", ""))
 
     def params_for_rule(self, rulename: str) -> str:
-        default_params = self.default_params()
-        rule_params = self.concatenate_params(self.get(rulename, ""))
-        return self.concatenate_params([default_params, rule_params])
+        params = self._rule_params.get(rulename)
+        if params is None:
+            default_params = self.default_params()
+            rule_params = self.concatenate_params(self.get(rulename, ""))
+            params = self.concatenate_params([default_params, rule_params])
+            self._rule_params[rulename] = params
+        return params
+
+    def args_for_rule(self, rulename: str) -> List[str]:
+        """
+        The parameters of the rule split into arguments like the shell would,
+        to run qsub without one. Rules that are not in the config share the
+        arguments of ``__default__``.
+        """
+        key = rulename if rulename in self._data else "__default__"
+        args = self._rule_args.get(key)
+        if args is None:
+            args = self._rule_args[key] = shlex.split(self.params_for_rule(rulename))
+        return list(args)
+
+    @staticmethod
+    def runtime_minutes(value: Union[int, float, str]) -> float:
+        """Minutes of a runtime given in minutes or like h_rt, as H:MM:SS."""
+        if isinstance(value, str) and ":" in value:
+            minutes = 0.0
+            for part in value.split(":"):
+                minutes = minutes * 60 + float(part)
+            return minutes / 60
+        return float(value)
+
+    def queue_limits(self) -> List[Tuple[str, float]]:
+        """
+        The queues jobs may be routed to by their runtime, from the
+        ``__queues__`` mapping of queue names to runtime limits, in the
+        order they are listed.
+        """
+        queues = self.get("__queues__") or {}
+        return [
+            (name, self.runtime_minutes(limit)) for name, limit in queues.items()
+        ]
+
+    def pilot(self) -> dict:
+        """
+        The pilot workers from ``__pilot__``: the rules whose jobs they run,
+        how many there are, the slots, memory (MB) and runtime each one
+        requests, extra qsub parameters, and the seconds a worker waits for
+        tasks before it exits.
+        """
+        pilot = dict(self.PILOT_DEFAULTS)
+        pilot.update(self.get("__pilot__") or {})
+        return pilot
+
+    def local(self) -> dict:
+        """
+        The local lane from ``__local__``: the rules whose jobs run on the
+        submit host, the runtime (minutes or H:MM:SS) up to which jobs of
+        other rules run there once earlier jobs show they are that short,
+        and how many jobs, slots and memory (MB) the lane may use.
+        """
+        local = dict(self.LOCAL_DEFAULTS)
+        local.update(self.get("__local__") or {})
+        return local
+
+    def compile(self) -> Dict[str, str]:
+        """
+        Returns the qsub parameters of every rule in the config, with the
+        ``__default__`` parameters merged in.
+        """
+        return {key: self.params_for_rule(key) for key in self._data if self.is_rule(key)}
+
+    def compile_args(self) -> Dict[str, List[str]]:
+        """
+        Returns the arguments of every rule in the config, and of
+        ``__default__`` for the rules that are not.
+        """
+        args = {key: self.args_for_rule(key) for key in self._data if self.is_rule(key)}
+        args["__default__"] = shlex.split(self.default_params())
+        return args
 
     @staticmethod
     def from_stream(stream: TextIO) -> "Config":
+        import yaml  # only needed when there is a uge.yaml
+
         data = yaml.safe_load(stream)
         return Config(data)
+
+    @classmethod
+    def from_file(cls, path: Path, cache_path: Optional[Path] = None) -> "Config":
+        """
+        Reads the config file. With a ``cache_path``, the parsed config and
+        the parameters of all its rules are cached there and used as long as
+        the path, modification time and size of the config file match, so
+        the YAML is only parsed and the parameters are only split into
+        arguments when the file changes.
+        """
+        path = Path(path)
+        stat = path.stat()
+        source = [str(path.resolve()), stat.st_mtime_ns, stat.st_size, cls.CACHE_VERSION]
+        if cache_path is not None:
+            cached = cls._read_cache(Path(cache_path))
+            if cached is not None and cached.get("source") == source:
+                return cls(cached["data"], cached["rule_params"], cached["rule_args"])
+
+        with path.open() as stream:
+            config = cls.from_stream(stream)
+        if cache_path is not None and time.time() - stat.st_mtime > cls.CACHE_MIN_AGE:
+            config._write_cache(Path(cache_path), source)
+        return config
+
+    @staticmethod
+    def _read_cache(cache_path: Path) -> Optional[dict]:
+        try:
+            with cache_path.open("rb") as stream:
+                cached = marshal.load(stream)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        return cached if isinstance(cached, dict) else None
+
+    def _write_cache(self, cache_path: Path, source: list):
+        cache = dict(
+            source=source,
+            data=self._data,
+            rule_params=self.compile(),
+            rule_args=self.compile_args(),
+        )
+        tmp_path = cache_path.with_name(
+            "{name}.{pid}.tmp".format(name=cache_path.name, pid=os.getpid())
+        )
+        try:
+            content = marshal.dumps(cache)
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(content)
+            os.replace(str(tmp_path), str(cache_path))
+        except (OSError, ValueError):
+            # configs with values marshal cannot store are parsed every time
+            if tmp_path.exists():
+                tmp_path.unlink()
@@ -1,6 +1,56 @@
 #!/usr/bin/env bash
 # properties = {properties}
 
+# write the job status sentinel next to the cluster logs; written to a
+# temporary file first and renamed so readers never see a partial file
+write_status_sentinel() (
+    [ -n "$SGE_STDOUT_PATH" ] || exit 0
+    status_file="$(dirname "$SGE_STDOUT_PATH")/$(basename "$SGE_STDOUT_PATH" .out).status"
+    printf 'state=%s\njob_id=%s\ntask_id=%s\nhost=%s\nstarted=%s\nfinished=%s\nexit_status=%s\n' \
+        "$1" "$JOB_ID" "$SGE_TASK_ID" "$(hostname)" "$STARTED" "$2" "$3" \
+        > "$status_file.tmp.$$" && mv -f "$status_file.tmp.$$" "$status_file"
+)
+
+# jobs submitted ahead of time are held until their parents have finished,
+# and only run if all of them succeeded. $UGE_PARENT_JOBS lists the parents as
+# <job id>=<cluster log>, separated by ':'. The sentinel of a parent that has
+# just finished may not be visible yet on a network filesystem, so a parent
+# only counts as failed without one after PARENT_SENTINEL_WAIT seconds
+PARENT_SENTINEL_WAIT=60
+parent_failed() (
+    IFS=':'
+    for parent in $UGE_PARENT_JOBS; do
+        jobid=$(echo "$parent" | cut -d= -f1)
+        outlog=$(echo "$parent" | cut -d= -f2-)
+        sentinel="$(dirname "$outlog")/$(basename "$outlog" .out).status"
+        waited=0
+        until grep -qx "job_id=$(echo "$jobid" | cut -d. -f1)" "$sentinel" 2>/dev/null \
+            && grep -qx "state=finished" "$sentinel"; do
+            if [ "$waited" -ge "$PARENT_SENTINEL_WAIT" ]; then
+                echo "Parent job $jobid left no sentinel, not running job $JOB_ID" >&2
+                exit 0
+            fi
+            sleep 5
+            waited=$((waited + 5))
+            # listing the directory makes NFS clients drop its cached entries
+            ls "$(dirname "$sentinel")" > /dev/null 2>&1
+        done
+        if ! grep -qx "exit_status=0" "$sentinel"; then
+            echo "Parent job $jobid did not succeed, not running job $JOB_ID" >&2
+            exit 0
+        fi
+    done
+    exit 1
+)
+
+STARTED=$(date +%s)
+if [ -n "$UGE_PARENT_JOBS" ] && parent_failed; then
+    write_status_sentinel finished "$(date +%s)" 1
+    echo "EXIT_STATUS: 1"
+    exit 1
+fi
+write_status_sentinel started
+
 # print cluster job id
 echo "Running cluster job $JOB_ID"
 echo "-----------------------------"
@@ -9,9 +59,14 @@ echo "-----------------------------"
 ( {exec_job} )
 EXIT_STATUS=$?  # get the exit status
 
-# print resource consumption
+write_status_sentinel finished "$(date +%s)" "$EXIT_STATUS"
+
+# print resource consumption; jobs run on the submit host have no qstat record
 echo "-----------------------------"
-qstat -j $JOB_ID | grep '^usage'
+case "$JOB_ID" in
+    local:*) ;;
+    *) qstat -j $JOB_ID | grep '^usage' ;;
+esac
 
 # print exit status
 echo "-----------------------------"
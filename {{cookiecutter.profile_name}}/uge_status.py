@@ -1,23 +1,47 @@
 #!/usr/bin/env python3
 
+import hashlib
+import os
+import subprocess
 import sys
+import tempfile
 import time
 import re
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 
 if not __name__.startswith("tests.src."):
     sys.path.append(str(Path(__file__).parent.absolute()))
     from OSLayer import OSLayer
     from CookieCutter import CookieCutter
+    from retry_policy import RetryPolicy, CircuitBreaker
+    from job_sentinel import JobSentinel
+    from optional_module import optional_module
+    from scheduler_backend import SchedulerBackend, get_backend
 else:
     from .CookieCutter import CookieCutter
     from .OSLayer import OSLayer
+    from .retry_policy import RetryPolicy, CircuitBreaker
+    from .job_sentinel import JobSentinel
+    from .optional_module import optional_module
+    from .scheduler_backend import SchedulerBackend, get_backend
+
+# the modules of the optional features are imported with optional_module where
+# their setting is checked, so a status check only pays for the features it uses
+if TYPE_CHECKING:
+    from qstat_snapshot import QstatSnapshot
+    from resource_history import ResourceHistory, ResourceUsage
+    from run_state import RunState
 
 
 class QstatError(Exception):
     pass
 
 
+class QstatEmptyOutputError(QstatError):
+    pass
+
+
 class QacctError(Exception):
     pass
 
@@ -26,6 +50,74 @@ class UnknownStatusLine(Exception):
     pass
 
 
+STATUS_SERVER_TIMEOUT = 30
+
+
+def parse_jobid(text: str) -> Union[int, str]:
+    """
+    Jobs are identified by their job number, tasks of coalesced array jobs
+    by ``<job number>.<task id>`` and jobs of the local lane by
+    ``local:<id>``.
+    """
+    if re.fullmatch(r"\d+(\.\d+)?", text):
+        return text if "." in text else int(text)
+    LOCAL_JOBID_PREFIX = optional_module("local_lane").JOBID_PREFIX
+
+    if re.fullmatch(re.escape(LOCAL_JOBID_PREFIX) + r"[0-9a-f-]+", text):
+        return text
+    raise ValueError("invalid job id '{text}'".format(text=text))
+
+
+def socket_path_for(log_dir: str) -> Path:
+    """
+    Unix socket paths are limited to ~100 characters, so the status server
+    socket lives in the temporary directory under a name derived from the
+    log directory.
+    """
+    digest = hashlib.md5(str(Path(log_dir).resolve()).encode()).hexdigest()[:12]
+    return Path(tempfile.gettempdir()) / "uge-status-{uid}-{digest}.sock".format(
+        uid=os.getuid(), digest=digest
+    )
+
+
+def query_status_server(
+    socket_path: Path, jobid: int, outlog: str, timeout: float = STATUS_SERVER_TIMEOUT
+) -> Optional[str]:
+    """
+    Asks a running status server for the status of a job. Returns None if
+    the server is not available, in which case the caller has to determine
+    the status itself.
+    """
+    import socket  # only needed with the status server
+
+    request = "{jobid} {outlog}\n".format(jobid=jobid, outlog=outlog).encode()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(str(socket_path))
+            client.sendall(request)
+            response = b""
+            while not response.endswith(b"\n"):
+                chunk = client.recv(64)
+                if not chunk:
+                    break
+                response += chunk
+    except OSError:
+        return None
+    return response.decode().strip() or None
+
+
+def start_status_server():
+    server_script = Path(__file__).parent.absolute() / "uge_status_server.py"
+    subprocess.Popen(
+        [sys.executable, str(server_script)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
 class StatusChecker:
     SUCCESS = "success"
     RUNNING = "running"
@@ -44,6 +136,11 @@ class StatusChecker:
         "SUCCESS": SUCCESS,
         "EXIT_STATUS: 0": SUCCESS,
     }
+    HUNG_JOB_POLICIES = ("off", "report", "qdel")
+    USAGE_TIME_PATTERNS = {
+        name: re.compile(r"\b{name}=([0-9:.]+)".format(name=name))
+        for name in ("wallclock", "cpu")
+    }
 
     """
     From man qstat:
@@ -55,16 +152,39 @@ class StatusChecker:
 
     def __init__(
         self,
-        jobid: int,
+        jobid: Union[int, str],
         outlog: str,
     ):
         self._jobid = jobid
         self._outlog = outlog
+        # usage of the finished job, if its accounting record has been read
+        self._usage = None  # type: Optional["ResourceUsage"]
 
     @property
-    def jobid(self) -> int:
+    def jobid(self) -> Union[int, str]:
         return self._jobid
 
+    @property
+    def is_local(self) -> bool:
+        if isinstance(self.jobid, int) or self.jobid[:1].isdigit():
+            return False  # a job or task on the cluster
+        LOCAL_JOBID_PREFIX = optional_module("local_lane").JOBID_PREFIX
+
+        return self.jobid.startswith(LOCAL_JOBID_PREFIX)
+
+    @property
+    def job_number(self) -> int:
+        return int(str(self.jobid).partition(".")[0])
+
+    @property
+    def task_id(self) -> Optional[int]:
+        task_id = str(self.jobid).partition(".")[2]
+        return int(task_id) if task_id else None
+
+    @property
+    def task_args(self) -> List[str]:
+        return ["-t", str(self.task_id)] if self.task_id else []
+
     @property
     def outlog(self) -> str:
         return self._outlog
@@ -86,16 +206,117 @@ class StatusChecker:
         return CookieCutter.get_log_status_checks()
 
     @property
-    def qstat_query_cmd(self) -> str:
-        return "qstat -j {jobid}".format(jobid=self.jobid)
+    def scheduler(self) -> SchedulerBackend:
+        return get_backend(CookieCutter.get_scheduler_backend())
+
+    @property
+    def use_qstat_snapshot(self) -> bool:
+        return CookieCutter.get_use_qstat_snapshot()
+
+    @property
+    def qstat_snapshot(self) -> "QstatSnapshot":
+        QstatSnapshot = optional_module("qstat_snapshot").QstatSnapshot
+
+        return QstatSnapshot(
+            CookieCutter.get_log_dir(),
+            CookieCutter.get_qstat_snapshot_ttl(),
+            with_usage=self.hung_job_policy != "off",
+        )
+
+    @property
+    def hung_job_policy(self) -> str:
+        policy = CookieCutter.get_hung_job_policy()
+        return policy if policy in self.HUNG_JOB_POLICIES else "off"
 
     @property
-    def qacct_query_cmd(self) -> str:
-        return "qacct -j {jobid}".format(jobid=self.jobid)
+    def cpu_hung_min_time(self) -> float:
+        return CookieCutter.get_hung_job_min_time()
+
+    @property
+    def cpu_hung_max_ratio(self) -> float:
+        return CookieCutter.get_hung_job_max_cpu_ratio()
+
+    @property
+    def use_adaptive_backoff(self) -> bool:
+        return CookieCutter.get_use_adaptive_backoff()
+
+    @property
+    def retry_policies(self) -> Dict[type, RetryPolicy]:
+        """
+        How often and after which delay qstat is retried, per error class.
+        Empty output is usually a hiccup and is retried quickly, errors
+        talking to the qmaster back off harder, and an unknown job state is
+        only given one more chance.
+        """
+        cap = self.wait_between_tries
+        if not self.use_adaptive_backoff:
+            fixed = RetryPolicy(self.max_status_checks, cap, cap, multiplier=1)
+            return {QstatError: fixed, KeyError: fixed}
+
+        base = CookieCutter.get_qstat_backoff_base_delay()
+        return {
+            QstatEmptyOutputError: RetryPolicy(
+                self.max_status_checks, base, cap, multiplier=2, jitter=0.5
+            ),
+            QstatError: RetryPolicy(
+                self.max_status_checks, 2 * base, cap, multiplier=3, jitter=0.5
+            ),
+            KeyError: RetryPolicy(2, base, cap, multiplier=1, jitter=0.5),
+        }
+
+    @staticmethod
+    def _retry_policy_for(
+        error: Exception, policies: Dict[type, RetryPolicy]
+    ) -> RetryPolicy:
+        for error_class in type(error).__mro__:
+            if error_class in policies:
+                return policies[error_class]
+        raise error
+
+    @property
+    def circuit_breaker(self) -> Optional[CircuitBreaker]:
+        if not CookieCutter.get_use_circuit_breaker():
+            return None
+        return CircuitBreaker(
+            CookieCutter.get_log_dir(),
+            failure_threshold=CookieCutter.get_circuit_breaker_threshold(),
+            reset_timeout=CookieCutter.get_circuit_breaker_reset_timeout(),
+        )
 
     @property
-    def qdel_cmd(self) -> str:
-        return "qdel -j {jobid}".format(jobid=self.jobid)
+    def use_accounting_index(self) -> bool:
+        return CookieCutter.get_use_accounting_index()
+
+    @property
+    def resource_history(self) -> Optional["ResourceHistory"]:
+        if (
+            CookieCutter.get_auto_sizing() != "memory"
+            and not CookieCutter.get_estimate_runtime()
+        ):
+            return None
+        ResourceHistory = optional_module("resource_history").ResourceHistory
+
+        return ResourceHistory(CookieCutter.get_log_dir())
+
+    @property
+    def run_state(self) -> Optional["RunState"]:
+        if not CookieCutter.get_use_run_state():
+            return None
+        RunState = optional_module("run_state").RunState
+
+        return RunState(CookieCutter.get_log_dir())
+
+    @property
+    def qstat_query_cmd(self) -> List[str]:
+        return ["qstat", "-j", str(self.job_number)]
+
+    @property
+    def qacct_query_cmd(self) -> List[str]:
+        return ["qacct", "-j", str(self.job_number)] + self.task_args
+
+    @property
+    def qdel_cmd(self) -> List[str]:
+        return ["qdel", str(self.job_number)] + self.task_args
 
     def _query_status_using_qstat(self) -> str:
         returncode, output_stream, error_stream = OSLayer.run_process(
@@ -111,24 +332,46 @@ class StatusChecker:
             )
 
         if not output_stream:
-            raise QstatError(
+            raise QstatEmptyOutputError(
                 "qstat failed on job {jobid} with empty output".format(
                     jobid=self.jobid,
                 )
             )
-        status = self._qstat_job_state(output_stream)
+        status = self._qstat_job_state(output_stream, self.task_id)
         if status not in self.STATUS_TABLE.keys():
             raise KeyError(
                 "Unknown job status '{status}' for {jobid}".format(
                     status=status, jobid=self.jobid)
             )
+        if (
+            self.STATUS_TABLE[status] == self.RUNNING
+            and self.hung_job_policy != "off"
+            and self._handle_hung_qstat(output_stream)
+        ):
+            return self.FAILED
         return self.STATUS_TABLE[status]
 
-        # hung_status = self._handle_hung_qstat(output_stream)
-        # if hung_status or self._qstat_error(output_stream):
-        #    status = "failed"
-        # else:
-        #    status = "running"
+    def _query_status_using_qstat_snapshot(self) -> Optional[str]:
+        QstatSnapshot = optional_module("qstat_snapshot").QstatSnapshot
+
+        snapshot = self.qstat_snapshot
+        state = snapshot.job_state(self.jobid)
+        if state is None or state == QstatSnapshot.FINISHED:
+            return state
+        status = self._short_state(state)
+        if status not in self.STATUS_TABLE.keys():
+            raise KeyError(
+                "Unknown job status '{status}' for {jobid}".format(
+                    status=status, jobid=self.jobid)
+            )
+        if (
+            self.STATUS_TABLE[status] == self.RUNNING
+            and self.hung_job_policy != "off"
+        ):
+            usage = snapshot.job_usage(self.jobid)
+            if usage is not None and self._handle_hung_job(*usage):
+                return self.FAILED
+        return self.STATUS_TABLE[status]
 
     def _query_status_using_qacct(self) -> str:
         returncode, output_stream, error_stream = OSLayer.run_process(
@@ -149,6 +392,7 @@ class StatusChecker:
                 )
             )
         status = self._qacct_job_state(output_stream)
+        self._usage = self._qacct_usage(output_stream)
         if status not in self.STATUS_TABLE.keys():
             raise KeyError(
                 "Unknown job status '{status}' for {jobid}".format(
@@ -156,6 +400,43 @@ class StatusChecker:
             )
         return self.STATUS_TABLE[status]
 
+    def _query_status_using_accounting(self) -> str:
+        AccountingIndex = optional_module("accounting").AccountingIndex
+        AccountingError = optional_module("accounting").AccountingError
+        ResourceUsage = optional_module("resource_history").ResourceUsage
+
+        accounting_file = AccountingIndex.default_accounting_file()
+        if accounting_file is None:
+            raise AccountingError("SGE_ROOT is not set")
+        index = AccountingIndex(accounting_file, CookieCutter.get_log_dir())
+        record = index.lookup(self.job_number, self.task_id)
+        self._usage = ResourceUsage(
+            record.maxvmem / 2 ** 20, record.cpu, record.wallclock
+        )
+        if record.failed == 0 and record.exit_status == 0:
+            return self.STATUS_TABLE["SUCCESS"]
+        return self.STATUS_TABLE["FAIL"]
+
+    def _query_status_using_sentinel(self) -> Optional[str]:
+        exit_status = JobSentinel(self.outlog).exit_status(self.jobid)
+        if exit_status is None:
+            return None
+        return self.STATUS_TABLE["SUCCESS" if exit_status == 0 else "FAIL"]
+
+    def _query_status_using_local_lane(self) -> str:
+        """
+        Jobs of the local lane run as long as their runner holds the lock of
+        the job, and the runner leaves a finished sentinel before it lets go.
+        """
+        LOCAL_JOBID_PREFIX = optional_module("local_lane").JOBID_PREFIX
+        LocalLane = optional_module("local_lane").LocalLane
+        local_lane_directory = optional_module("local_lane").local_lane_directory
+
+        lane = LocalLane(local_lane_directory(CookieCutter.get_log_dir()))
+        if lane.is_running(str(self.jobid)[len(LOCAL_JOBID_PREFIX):]):
+            return self.RUNNING
+        return self._query_status_using_sentinel() or self.FAILED
+
     def _query_status_using_cluster_log(self) -> str:
         try:
             lastline = OSLayer.tail(self.outlog, num_lines=1)
@@ -174,41 +455,61 @@ class StatusChecker:
         else:
             return self.STATUS_TABLE["r"]
 
-    @staticmethod
-    def _extract_time(line, time_name) -> float:
+    @classmethod
+    def _extract_time(cls, line, time_name) -> float:
         """ Extracts time elapsed in seconds from usage line for given name
         """
-        result = re.search(f"{time_name}=([^,]+)(,|$,\n)", line)
+        result = cls.USAGE_TIME_PATTERNS[time_name].search(line)
         if not result:
             return 0
-        time_str = re.search(f"{time_name}=([^,]+)(,|$,\n)", line).group(1)
         elapsed_time = 0
         multiplier = 1
         multipliers = (1, 60, 60, 24)
-        for t, m in zip(reversed(time_str.split(":")), multipliers):
-            elapsed_time += multiplier * m * int(t)
+        for t, m in zip(reversed(result.group(1).split(":")), multipliers):
+            elapsed_time += multiplier * m * float(t)
             multiplier *= m
         return elapsed_time
 
     @staticmethod
-    def _qstat_job_state(output_stream) -> str:
+    def _short_state(state: str) -> str:
+        return state.strip()[-2:].strip()
+
+    @staticmethod
+    def _qstat_job_state(output_stream, task_id: Optional[int] = None) -> str:
         state = ""
         for line in output_stream.split("\n"):
-            if line.startswith("job_state"):
-                state = line.strip()[-2:].strip()
-                break  # exit for loop
+            if not line.startswith("job_state"):
+                continue
+            if task_id is not None and not StatusChecker._is_task_line(line, task_id):
+                continue
+            state = StatusChecker._short_state(line)
+            break  # exit for loop
+        if not state and task_id is not None and output_stream:
+            # qstat -j only lists tasks that have been scheduled
+            state = "qw"
         return state
 
+    @staticmethod
+    def _is_task_line(line: str, task_id: int) -> bool:
+        """ Whether a per-task line of qstat -j (job_state, usage) is about task_id
+        """
+        fields = line.split()
+        return len(fields) > 1 and fields[1] == "{task_id}:".format(task_id=task_id)
+
     @staticmethod
     def _qacct_job_state(output_stream) -> str:
         exit_state = ""
         failed = ""
 
         for line in output_stream.split("\n"):
-            if line.startswith("failed"):
-                failed = line.strip()[-1]
-            if line.startswith("exit_status"):
-                exit_state = line.strip()[-1]
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            # compare whole values: "exit_status  137" must not read as 7
+            if fields[0] == "failed":
+                failed = fields[1]
+            elif fields[0] == "exit_status":
+                exit_state = fields[1]
             if failed != "" and exit_state != "":
                 break
         if failed == "0" and exit_state == "0":
@@ -216,74 +517,277 @@ class StatusChecker:
         else:
             return "FAIL"
 
-    def _handle_hung_qstat(self, output_stream) -> str:
+    @staticmethod
+    def _qacct_usage(output_stream) -> Optional["ResourceUsage"]:
+        """ Reads maxvmem, cpu and ru_wallclock from the output of qacct -j
+        """
+        # only needed for auto-sizing, not by the status checks themselves
+        InvalidMemoryString = optional_module("memory_units").InvalidMemoryString
+        Memory = optional_module("memory_units").Memory
+        Unit = optional_module("memory_units").Unit
+        ResourceUsage = optional_module("resource_history").ResourceUsage
+
+        values = {}
         for line in output_stream.split("\n"):
-            if line.startswith("usage"):
-                wallclock = self._extract_time(line, "wallclock")
-                if wallclock < self.cpu_hung_min_time * 60:
-                    return False
-                cpu = self._extract_time(line, "cpu")
-                if (cpu / wallclock) < self.cpu_hung_max_ratio:
-                    (
-                        returncode,
-                        output_stream,
-                        error_stream,
-                    ) = OSLayer.run_process(self.qdel_cmd)
-                    return True
-                return False
+            fields = line.split()
+            if len(fields) == 2 and fields[0] in ("maxvmem", "cpu", "ru_wallclock"):
+                values[fields[0]] = fields[1]
+        try:
+            return ResourceUsage(
+                maxvmem_mb=Memory.from_str(values["maxvmem"])
+                .to(Unit.MEGA, decimal_multiples=False)
+                .value,
+                cpu=float(values["cpu"].rstrip("s")),
+                wallclock=float(values["ru_wallclock"].rstrip("s")),
+            )
+        except (KeyError, ValueError, InvalidMemoryString):
+            return None
+
+    def _query_usage(self) -> Optional["ResourceUsage"]:
+        if self._usage is None and self.use_accounting_index:
+            AccountingError = optional_module("accounting").AccountingError
+
+            try:
+                self._query_status_using_accounting()
+            except AccountingError:
+                pass
+        if self._usage is None:
+            try:
+                self._query_status_using_qacct()
+            except (QacctError, KeyError):
+                pass
+        return self._usage
+
+    def get_recorded_status(self) -> Optional[str]:
+        """
+        The status of a finished job from the run state, where an earlier
+        status check has left it. Returns None if the job has not finished.
+        """
+        run_state = self.run_state
+        if run_state is None:
+            return None
+        RunStateError = optional_module("run_state").RunStateError
+
+        try:
+            return run_state.terminal_state(self.jobid, self.outlog)
+        except RunStateError as error:
+            self._report_run_state_error(error)
+            return None
+
+    def record_status(self, status: str):
+        """Keeps the status in the run state, with the time it was seen."""
+        run_state = self.run_state
+        if run_state is None:
+            return
+        RunStateError = optional_module("run_state").RunStateError
+
+        try:
+            run_state.record_state(self.jobid, status)
+        except RunStateError as error:
+            self._report_run_state_error(error)
+
+    def _report_run_state_error(self, error: Exception):
+        if self.log_status_checks:
+            print(
+                "[Predicted exception] RunStateError: {error}".format(error=error),
+                file=sys.stderr,
+            )
+
+    def record_resource_usage(self, status: str):
+        """
+        Adds the usage of a successful job, or the failure of a job, to the
+        resource history the submissions are auto-sized from.
+        """
+        history = self.resource_history
+        if history is None or status not in (self.SUCCESS, self.FAILED):
+            return
+        ResourceHistoryError = optional_module("resource_history").ResourceHistoryError
+
+        try:
+            if not history.is_registered(self.jobid):
+                return
+            usage = self._query_usage()
+            if status == self.FAILED:
+                history.record_failure(self.jobid, usage)
+            elif usage is not None:
+                history.record_usage(self.jobid, usage)
+        except ResourceHistoryError as error:
+            if self.log_status_checks:
+                print(
+                    "[Predicted exception] ResourceHistoryError: {error}".format(
+                        error=error
+                    ),
+                    file=sys.stderr,
+                )
+
+    def _is_hung(self, cpu: float, wallclock: float) -> bool:
+        if wallclock <= 0 or wallclock < self.cpu_hung_min_time * 60:
             return False
+        return cpu / wallclock < self.cpu_hung_max_ratio
 
-    def get_status(self) -> str:
-        status = None
-        for _ in range(self.max_status_checks):
+    def _handle_hung_qstat(self, output_stream) -> bool:
+        """
+        Checks the usage of every task listed by ``qstat -j`` and applies the
+        hung job policy to the first one that looks hung.
+        """
+        for line in output_stream.split("\n"):
+            if not line.startswith("usage"):
+                continue
+            if self.task_id is not None and not self._is_task_line(line, self.task_id):
+                continue
+            wallclock = self._extract_time(line, "wallclock")
+            cpu = self._extract_time(line, "cpu")
+            if self._is_hung(cpu, wallclock):
+                return self._handle_hung_job(cpu, wallclock)
+        return False
+
+    def _handle_hung_job(self, cpu: float, wallclock: float) -> bool:
+        """
+        Reports the job if it looks hung and, with the ``qdel`` policy,
+        deletes it. Returns True if the job was deleted and has to be
+        reported as failed.
+        """
+        if not self._is_hung(cpu, wallclock):
+            return False
+        print(
+            "Job {jobid} looks hung: {cpu:.0f}s cpu in {wallclock:.0f}s "
+            "wallclock".format(jobid=self.jobid, cpu=cpu, wallclock=wallclock),
+            file=sys.stderr,
+        )
+        if self.hung_job_policy != "qdel":
+            return False
+        returncode, output_stream, error_stream = OSLayer.run_process(
+            self.qdel_cmd
+        )
+        if returncode != 0:
+            print(
+                "qdel failed on job {jobid} with: {error}".format(
+                    jobid=self.jobid, error=error_stream
+                ),
+                file=sys.stderr,
+            )
+            return False
+        return True
+
+    def _query_status_using_qstat_with_retries(
+        self, breaker: Optional[CircuitBreaker]
+    ) -> Optional[str]:
+        policies = None
+        failures = {}
+        for attempt in range(self.max_status_checks):
+            if attempt and breaker is not None and not breaker.allow_request():
+                return self._last_known_status(breaker)
             try:
                 status = self._query_status_using_qstat()
-                break  # succeeded on getting the status
-            except QstatError as error:
+            except (QstatError, KeyError) as error:
                 if self.log_status_checks:
                     print(
-                        "[Predicted exception] QstatError: {error}".format(
-                            error=error
+                        "[Predicted exception] {prefix}{error}".format(
+                            prefix="QstatError: "
+                            if isinstance(error, QstatError)
+                            else "",
+                            error=error,
                         ),
                         file=sys.stderr,
                     )
                     print("Resuming...", file=sys.stderr)
-                time.sleep(self.wait_between_tries)
+                if breaker is not None and isinstance(error, QstatError):
+                    breaker.record_failure()
+                policies = policies or self.retry_policies
+                policy = self._retry_policy_for(error, policies)
+                failures[policy] = failures.get(policy, 0) + 1
+                if (
+                    failures[policy] >= policy.max_attempts
+                    or attempt + 1 == self.max_status_checks
+                ):
+                    break
+                if OSLayer.metrics is not None:
+                    OSLayer.metrics.record_retry(self.qstat_query_cmd)
+                time.sleep(policy.delay(failures[policy] - 1))
+            else:
+                if breaker is not None:
+                    self._record_reachable_qmaster(breaker, status)
+                return status
+        return None
+
+    def _record_reachable_qmaster(self, breaker: CircuitBreaker, status: Optional[str]):
+        breaker.record_success()
+        # jobs the breaker does not know are reported as running anyway
+        if status in (self.SUCCESS, self.FAILED):
+            breaker.remember(self.jobid, status)
+
+    def _last_known_status(self, breaker: CircuitBreaker) -> str:
+        status = breaker.last_known(self.jobid) or self.RUNNING
+        if self.log_status_checks:
+            print(
+                "qmaster circuit breaker is open, reporting last known "
+                "status '{status}' for job {jobid}".format(
+                    status=status, jobid=self.jobid
+                ),
+                file=sys.stderr,
+            )
+        return status
 
-            except KeyError as error:
+    def _query_status_using_scheduler(self) -> Optional[str]:
+        state = self.scheduler.job_state(self.jobid)
+        if state == SchedulerBackend.FINISHED:
+            return "finished"
+        if state is not None:
+            return self.STATUS_TABLE.get(self._short_state(state), self.RUNNING)
+
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow_request():
+            return self._last_known_status(breaker)
+
+        status = None
+        if self.use_qstat_snapshot:
+            SnapshotError = optional_module("qstat_snapshot").SnapshotError
+
+            try:
+                status = self._query_status_using_qstat_snapshot()
+                if breaker is not None:
+                    self._record_reachable_qmaster(breaker, status)
+            except (SnapshotError, KeyError) as error:
+                if breaker is not None and isinstance(error, SnapshotError):
+                    breaker.record_failure()
+                elif breaker is not None:
+                    # the snapshot was read, it just does not list the job
+                    breaker.record_success()
                 if self.log_status_checks:
                     print(
-                        "[Predicted exception] {error}".format(
-                            error=error
-                        ),
+                        "[Predicted exception] {error}".format(error=error),
                         file=sys.stderr,
                     )
-                    print("Resuming...", file=sys.stderr)
-                time.sleep(self.wait_between_tries)
+                    print("Falling back to qstat -j...", file=sys.stderr)
 
-        if status is None or status == "finished":
-            if self.log_status_checks:
-                if status is None:
+        if status is None:
+            status = self._query_status_using_qstat_with_retries(breaker)
+        return status
+
+    def get_status_of_finished_job(self) -> str:
+        """
+        Determines the final status of a job that is no longer known to the
+        scheduler, from the accounting records or, failing that, the cluster
+        log of the job.
+        """
+        status = self._query_status_using_sentinel()
+        if status is None and self.is_local:
+            status = self._query_status_using_local_lane()
+        if status is None and self.use_accounting_index:
+            AccountingError = optional_module("accounting").AccountingError
+
+            try:
+                status = self._query_status_using_accounting()
+            except AccountingError as error:
+                if self.log_status_checks:
                     print(
-                        "qstat for job {jobid} failed {try_times} times.".format(
-                            jobid=self.jobid,
-                            try_times=self.max_status_checks
+                        "[Predicted exception] AccountingError: {error}".format(
+                            error=error
                         ),
                         file=sys.stderr,
                     )
-                if status == "finished":
-                    print(
-                            "Job {jobid} finished, check status via qacct".format(
-                                jobid=self.jobid),
-                            file=sys.stderr
-                        )
-                print(
-                        "Checking exit status for job {jobid} via qacct".format(
-                            jobid=self.jobid),
-                        file=sys.stderr
-                        )
-            #time.sleep(self.latency_wait)
 
+        if status is None:
             try:
                 status = self._query_status_using_qacct()
             except QacctError as error:
@@ -313,14 +817,85 @@ class StatusChecker:
                 )
             status = self._query_status_using_cluster_log()
 
+        self.record_resource_usage(status)
+        return status
+
+    def get_status(self) -> str:
+        # finished jobs leave a sentinel, no need to ask the scheduler
+        status = self._query_status_using_sentinel()
+        if status is not None:
+            self.record_resource_usage(status)
+            return status
+        if self.is_local:
+            return self._query_status_using_local_lane()
+
+        status = self._query_status_using_scheduler()
+
+        if status is None or status == "finished":
+            if self.log_status_checks:
+                if status is None:
+                    print(
+                        "qstat for job {jobid} failed {try_times} times.".format(
+                            jobid=self.jobid,
+                            try_times=self.max_status_checks
+                        ),
+                        file=sys.stderr,
+                    )
+                if status == "finished":
+                    print(
+                            "Job {jobid} finished, check status via qacct".format(
+                                jobid=self.jobid),
+                            file=sys.stderr
+                        )
+                print(
+                        "Checking exit status for job {jobid} via qacct".format(
+                            jobid=self.jobid),
+                        file=sys.stderr
+                        )
+            #time.sleep(self.latency_wait)
+            status = self.get_status_of_finished_job()
+
         return status
 
 
 if __name__ == "__main__":
-    jobid = int(sys.argv[1])
+    try:
+        jobid = parse_jobid(sys.argv[1])
+    except ValueError:
+        # tasks of the pilot workers are looked up in their queue
+        from pilot import JOBID_PREFIX, PilotQueue, pilot_directory
+
+        if not sys.argv[1].startswith(JOBID_PREFIX):
+            raise
+        queue = PilotQueue(pilot_directory(CookieCutter.get_log_dir()))
+        status = queue.status(sys.argv[1][len(JOBID_PREFIX):])
+        StatusChecker(sys.argv[1], sys.argv[2]).record_status(status)
+        print(status)
+        sys.exit(0)
     outlog = sys.argv[2]
+    if CookieCutter.get_use_scheduler_metrics():
+        from metrics import install_metrics
+
+        install_metrics(CookieCutter.get_log_dir())
+    if CookieCutter.get_use_rate_limiter():
+        from rate_limit import install_rate_limiter
+
+        install_rate_limiter(CookieCutter.get_rate_limits())
     uge_status_checker = StatusChecker(jobid, outlog)
+    # jobs whose end has been seen before need no further queries
+    status = uge_status_checker.get_recorded_status()
+    if status is not None:
+        print(status)
+        sys.exit(0)
+    if CookieCutter.get_use_status_server():
+        socket_path = socket_path_for(CookieCutter.get_log_dir())
+        status = query_status_server(socket_path, jobid, outlog)
+        if status is None:
+            start_status_server()
     try:
-        print(uge_status_checker.get_status())
+        if status is None:
+            status = uge_status_checker.get_status()
     except KeyboardInterrupt:
         sys.exit(0)
+    uge_status_checker.record_status(status)
+    print(status)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+import asyncio
+import fcntl
+import getpass
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from xml.etree.ElementTree import ParseError
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer, ProcessStreamError
+    from CookieCutter import CookieCutter
+    from qstat_snapshot import QstatSnapshot
+    from uge_status import StatusChecker, parse_jobid, socket_path_for
+    from job_sentinel import JobSentinel
+    from log_watcher import create_watcher
+    from metrics import install_metrics
+    from rate_limit import install_rate_limiter
+    from scheduler_backend import SchedulerBackend, get_backend, keep_sessions
+else:
+    from .OSLayer import OSLayer, ProcessStreamError
+    from .CookieCutter import CookieCutter
+    from .qstat_snapshot import QstatSnapshot
+    from .uge_status import StatusChecker, parse_jobid, socket_path_for
+    from .job_sentinel import JobSentinel
+    from .log_watcher import create_watcher
+    from .metrics import install_metrics
+    from .rate_limit import install_rate_limiter
+    from .scheduler_backend import SchedulerBackend, get_backend, keep_sessions
+
+
+class TrackedJob:
+    def __init__(self, outlog: str, registered: float):
+        self.outlog = outlog
+        self.registered = registered
+        self.status = StatusChecker.RUNNING
+        self.hung = False
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in (StatusChecker.SUCCESS, StatusChecker.FAILED)
+
+
+class StatusServer:
+    """
+    Long-lived status sidecar for one workflow run.
+
+    Keeps the state of every job it has been asked about in memory and polls
+    the scheduler in bulk with one ``qstat -xml -u $USER`` per interval. Jobs that
+    disappear from qstat are resolved once via accounting/qacct/cluster log
+    and their final status is kept. Stops after ``idle_timeout`` seconds
+    without requests.
+
+    With a log watcher, status sentinels are picked up as soon as the
+    jobscript writes them instead of being read on every request.
+
+    With ``with_usage``, the poll also reports cpu time, which is used to
+    apply the hung job policy to running jobs.
+
+    With a ``scheduler`` backend that can tell job states, i.e. DRMAA, the
+    poll asks it for the state of every job in flight instead of running
+    qstat, unless the usage is needed, which only qstat reports.
+    """
+
+    def __init__(
+        self,
+        socket_path: Path,
+        poll_interval: float,
+        idle_timeout: float,
+        user: Optional[str] = None,
+        watcher=None,
+        with_usage: bool = False,
+        scheduler: Optional[SchedulerBackend] = None,
+    ):
+        self._socket_path = Path(socket_path)
+        self._poll_interval = poll_interval
+        self._idle_timeout = idle_timeout
+        self._user = user or getpass.getuser()
+        self._jobs = {}  # type: Dict[int, TrackedJob]
+        self._scheduler_jobs = {}  # type: Dict[str, str]
+        self._last_request = time.monotonic()
+        self._watcher = watcher
+        self._sentinels = {}  # type: Dict[str, int]
+        self._with_usage = with_usage
+        self._scheduler_usage = {}  # type: Dict[str, List[float]]
+        self._scheduler = scheduler
+
+    @property
+    def qstat_cmd(self) -> List[str]:
+        ext = ["-ext"] if self._with_usage else []
+        return ["qstat", "-xml"] + ext + ["-u", self._user]
+
+    @property
+    def jobs(self) -> Dict[int, TrackedJob]:
+        return self._jobs
+
+    async def serve(self):
+        server = await asyncio.start_unix_server(
+            self._handle_client, path=str(self._socket_path)
+        )
+        watching = None
+        if self._watcher is not None:
+            watching = asyncio.ensure_future(self._watch_sentinels())
+        try:
+            await self._poll_until_idle()
+        finally:
+            if watching is not None:
+                watching.cancel()
+            server.close()
+            await server.wait_closed()
+            if self._socket_path.exists():
+                self._socket_path.unlink()
+
+    async def status(self, jobid: Union[int, str], outlog: str) -> str:
+        self._last_request = time.monotonic()
+        job = self._jobs.get(jobid)
+        if job is None:
+            job = self._jobs[jobid] = TrackedJob(outlog, time.monotonic())
+            sentinel = str(JobSentinel(outlog).path.resolve())
+            self._sentinels[sentinel] = jobid
+            # jobs missing from the last poll are resolved by the next one
+            if str(jobid) in self._scheduler_jobs:
+                job.status = self._status_from_state(self._scheduler_jobs[str(jobid)])
+        elif self._watcher is not None:
+            return job.status
+        self._check_sentinel(jobid, job)
+        return job.status
+
+    def sentinels_changed(self, paths: List[str]):
+        for path in paths:
+            jobid = self._sentinels.get(path)
+            if jobid is not None:
+                self._check_sentinel(jobid, self._jobs[jobid])
+
+    def _check_sentinel(self, jobid: int, job: TrackedJob):
+        if not job.is_terminal:
+            checker = StatusChecker(jobid, job.outlog)
+            job.status = checker._query_status_using_sentinel() or job.status
+            if (
+                job.status in (StatusChecker.SUCCESS, StatusChecker.FAILED)
+                and checker.resource_history is not None
+            ):
+                # may need qacct, which must not block the event loop
+                asyncio.get_running_loop().run_in_executor(
+                    None, checker.record_resource_usage, job.status
+                )
+
+    async def _watch_sentinels(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                changed = await loop.run_in_executor(
+                    None, self._watcher.wait_for_changes, self._poll_interval
+                )
+                self.sentinels_changed(changed)
+        finally:
+            self._watcher.close()
+
+    async def poll(self):
+        loop = asyncio.get_running_loop()
+        poll_started = time.monotonic()
+        in_flight = [jobid for jobid, job in self._jobs.items() if not job.is_terminal]
+        try:
+            (
+                self._scheduler_jobs,
+                self._scheduler_usage,
+            ) = await loop.run_in_executor(None, self._read_scheduler_jobs, in_flight)
+        except (ProcessStreamError, ParseError):
+            return
+
+        checks = []
+        for jobid, job in self._jobs.items():
+            if job.is_terminal:
+                continue
+            state = self._scheduler_jobs.get(str(jobid))
+            if state is not None:
+                job.status = self._status_from_state(state)
+                usage = self._scheduler_usage.get(str(jobid))
+                if job.status == StatusChecker.RUNNING and usage and not job.hung:
+                    checks.append(self._check_hung(jobid, job, usage))
+            elif job.registered < poll_started:
+                checks.append(self._resolve_finished(jobid, job))
+        await asyncio.gather(*checks)
+
+    def _read_scheduler_jobs(
+        self, jobids: List[Union[int, str]]
+    ) -> Tuple[Dict[str, str], Dict[str, List[float]]]:
+        if self._scheduler is not None and not self._with_usage:
+            states = self._query_scheduler(jobids)
+            if states is not None:
+                return states, {}
+        with OSLayer.stream_process(self.qstat_cmd) as output_stream:
+            return QstatSnapshot.parse_qstat_xml_with_usage(
+                output_stream, with_usage=self._with_usage
+            )
+
+    def _query_scheduler(
+        self, jobids: List[Union[int, str]]
+    ) -> Optional[Dict[str, str]]:
+        """
+        The states of the jobs that are still known to the scheduler, or None
+        if the backend cannot tell, as the command line backend.
+        """
+        states = {}
+        for jobid in jobids:
+            state = self._scheduler.job_state(jobid)
+            if state is None:
+                return None
+            if state != SchedulerBackend.FINISHED:
+                states[str(jobid)] = state
+        return states
+
+    async def _poll_until_idle(self):
+        while time.monotonic() - self._last_request < self._idle_timeout:
+            if any(not job.is_terminal for job in self._jobs.values()):
+                await self.poll()
+                if OSLayer.metrics is not None:
+                    OSLayer.metrics.flush()
+            await asyncio.sleep(self._poll_interval)
+
+    async def _resolve_finished(self, jobid: int, job: TrackedJob):
+        loop = asyncio.get_running_loop()
+        checker = StatusChecker(jobid, job.outlog)
+        job.status = await loop.run_in_executor(
+            None, checker.get_status_of_finished_job
+        )
+
+    async def _check_hung(self, jobid: int, job: TrackedJob, usage: List[float]):
+        checker = StatusChecker(jobid, job.outlog)
+        if not checker._is_hung(*usage):
+            return
+        # with the report policy a hung job is reported only once
+        job.hung = True
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, checker._handle_hung_job, *usage):
+            job.status = StatusChecker.FAILED
+
+    async def _handle_client(self, reader, writer):
+        try:
+            request = (await reader.readline()).decode().split()
+            jobid, outlog = parse_jobid(request[0]), request[1]
+            status = await self.status(jobid, outlog)
+            writer.write("{status}\n".format(status=status).encode())
+            await writer.drain()
+        except (ValueError, IndexError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _status_from_state(state: str) -> str:
+        return StatusChecker.STATUS_TABLE.get(
+            StatusChecker._short_state(state), StatusChecker.RUNNING
+        )
+
+
+def main():
+    keep_sessions()
+    if CookieCutter.get_use_scheduler_metrics():
+        install_metrics(CookieCutter.get_log_dir())
+    if CookieCutter.get_use_rate_limiter():
+        install_rate_limiter(CookieCutter.get_rate_limits())
+    socket_path = socket_path_for(CookieCutter.get_log_dir())
+    lock_path = socket_path.with_suffix(".lock")
+    with lock_path.open("a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another server is already running for this workflow
+        if socket_path.exists():
+            socket_path.unlink()
+        watcher = None
+        if CookieCutter.get_use_log_watcher():
+            watcher = create_watcher(
+                CookieCutter.get_log_dir(),
+                poll_interval=CookieCutter.get_log_watcher_poll_interval(),
+            )
+        server = StatusServer(
+            socket_path,
+            poll_interval=CookieCutter.get_status_server_poll_interval(),
+            idle_timeout=CookieCutter.get_status_server_idle_timeout(),
+            watcher=watcher,
+            with_usage=CookieCutter.get_hung_job_policy() in ("report", "qdel"),
+            scheduler=get_backend(CookieCutter.get_scheduler_backend()),
+        )
+        asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,11 @@
 #!/usr/bin/env python3
 import math
 import re
+import shlex
 import subprocess
 import sys
 from pathlib import Path
-from typing import List, Union, Optional
-
-from snakemake.utils import read_job_properties
+from typing import TYPE_CHECKING, List, Union, Optional, Tuple
 
 if not __name__.startswith("tests.src."):
     sys.path.append(str(Path(__file__).parent.absolute()))
@@ -14,11 +13,26 @@ if not __name__.startswith("tests.src."):
     from OSLayer import OSLayer
     from uge_config import Config
     from memory_units import Unit, Memory
+    from job_properties import read_job_properties
+    from optional_module import optional_module
+    from scheduler_backend import SchedulerBackend, SchedulerError, get_backend
 else:
     from .CookieCutter import CookieCutter
     from .OSLayer import OSLayer
     from .uge_config import Config
     from .memory_units import Unit, Memory
+    from .job_properties import read_job_properties
+    from .optional_module import optional_module
+    from .scheduler_backend import SchedulerBackend, SchedulerError, get_backend
+
+# the modules of the optional features are imported with optional_module where
+# their setting is checked, so a submission only pays for the features it uses
+if TYPE_CHECKING:
+    from job_dependencies import JobidMap
+    from log_layout import ShardedLogLayout
+    from pilot import PilotQueue
+    from resource_history import ResourceHistory
+    from run_state import RunState
 
 PathLike = Union[str, Path]
 
@@ -28,6 +42,41 @@ class QsubInvocationError(Exception):
 class JobidNotFoundError(Exception):
     pass
 
+# precedes the job ids snakemake substitutes for {dependencies}
+DEPENDENCIES_FLAG = "--dependencies"
+
+def split_arguments(argv: List[str]) -> Tuple[List[str], Optional[List[str]]]:
+    """
+    Splits the arguments before the jobscript into the qsub parameters and,
+    after ``--dependencies``, what snakemake passes for the parents of the
+    job with ``--immediate-submit``.
+    """
+    if DEPENDENCIES_FLAG not in argv:
+        return argv, None
+    index = argv.index(DEPENDENCIES_FLAG)
+    return argv[:index], argv[index + 1:]
+
+
+def format_resources(memory: Memory, threads: int, runtime: Optional[int]) -> str:
+    """
+    The qsub resource requests for the memory, in the units of the cluster,
+    the slots and the runtime in minutes.
+    """
+    if threads > 1:
+        res_cmd = "-pe threads {threads} ".format(threads=threads)
+        per_thread = round(memory.value / threads, 2)
+        per_thread = math.ceil(per_thread)
+    else:
+        res_cmd = ""
+        per_thread = math.ceil(memory.value)
+    res_cmd += "-l h_vmem={per_thread}G ".format(per_thread=per_thread)
+    res_cmd += "-l m_mem_free={per_thread}G".format(per_thread=per_thread)
+    if runtime:
+        res_cmd += " -l h_rt={hours}:{mins:02d}:00".format(
+            hours=runtime // 60, mins=runtime % 60
+        )
+    return res_cmd
+
 class Submitter:
     def __init__(
         self,
@@ -35,6 +84,7 @@ class Submitter:
         cluster_cmds: List[str] = None,
         memory_units: Unit = Unit.GIGA,
         uge_config: Optional[Config] = None,
+        dependencies: Optional[List[str]] = None,
     ):
         if cluster_cmds is None:
             cluster_cmds = []
@@ -42,11 +92,26 @@ class Submitter:
             uge_config = Config()
 
         self._jobscript = jobscript
+        self._cluster_args = list(cluster_cmds)
         self._cluster_cmd = " ".join(cluster_cmds)
         self._memory_units = memory_units
         self._job_properties = read_job_properties(self._jobscript)
         self.uge_config = uge_config
-
+        self._input_bucket = None  # type: Optional[int]
+        self._is_retry = None  # type: Optional[bool]
+        self._memory_estimate = None  # type: Optional[int]
+        self._memory_estimate_made = False
+        self._estimated_runtime = None  # type: Optional[int]
+        self._runtime_estimate_made = False
+        self._dependencies = None if dependencies is None else list(dependencies)
+        self._parents = None  # type: Optional[List[Tuple[str, str]]]
+        # the objects of the optional features are built on first use
+        self._resource_history = None  # type: Optional[ResourceHistory]
+        self._log_layout = None  # type: Optional[ShardedLogLayout]
+        self._jobid_map = None  # type: Optional[JobidMap]
+        self._scheduler = None  # type: Optional[SchedulerBackend]
+        self._run_state = None  # type: Optional[RunState]
+        self._pilot_queue = None  # type: Optional[PilotQueue]
 
     @property
     def jobscript(self) -> str:
@@ -84,29 +149,144 @@ class Submitter:
         return self._memory_units
 
     @property
-    def runtime(self) -> int:
-        rt = self.cluster.get("runtime", None)
-        if rt:
-            rt = int(rt)
-        return rt
+    def runtime(self) -> Optional[int]:
+        """The runtime of the job in minutes, as given by the rule."""
+        rt = self.resources.get("runtime")
+        if not rt:
+            rt = self.cluster.get("runtime")
+        try:
+            return int(rt) or None
+        except (TypeError, ValueError):
+            return None  # e.g. a runtime snakemake has not converted to minutes
+
+    @property
+    def estimated_runtime(self) -> Optional[int]:
+        """What earlier jobs of the rule took, if runtime estimation is enabled."""
+        history = self.resource_history
+        if (
+            history is None
+            or not CookieCutter.get_estimate_runtime()
+            or self._runtime_estimate_made
+            or self.is_retry
+        ):
+            return self._estimated_runtime
+        self._runtime_estimate_made = True
+        ResourceHistoryError = optional_module("resource_history").ResourceHistoryError
+
+        if any(
+            arg.startswith("h_rt=")
+            for arg in self.uge_config.args_for_rule(self.rule_name)
+        ):
+            return None  # uge.yaml sets the runtime of the rule
+        try:
+            self._estimated_runtime = history.estimate_runtime(
+                self.rule_name,
+                self.input_bucket,
+                CookieCutter.get_runtime_percentile(),
+                CookieCutter.get_runtime_headroom(),
+                CookieCutter.get_auto_sizing_min_samples(),
+            )
+        except ResourceHistoryError as error:
+            print(
+                "Not estimating the runtime, the resource history cannot be read: "
+                "{error}".format(error=error),
+                file=sys.stderr,
+            )
+        return self._estimated_runtime
+
+    @property
+    def requested_runtime(self) -> Optional[int]:
+        return self.runtime or self.estimated_runtime
+
+    @property
+    def auto_sizing(self) -> str:
+        return CookieCutter.get_auto_sizing()
+
+    @property
+    def resource_history(self) -> Optional["ResourceHistory"]:
+        if self.auto_sizing != "memory" and not CookieCutter.get_estimate_runtime():
+            return None
+        if self._resource_history is None:
+            ResourceHistory = optional_module("resource_history").ResourceHistory
+            self._resource_history = ResourceHistory(CookieCutter.get_log_dir())
+        return self._resource_history
+
+    @property
+    def input_bucket(self) -> int:
+        input_size_bucket = optional_module("resource_history").input_size_bucket
+
+        if self._input_bucket is None:
+            self._input_bucket = input_size_bucket(self.job_properties.get("input", []))
+        return self._input_bucket
+
+    @property
+    def retry_key(self) -> str:
+        retry_key = optional_module("resource_history").retry_key
+
+        return retry_key(self.job_properties)
+
+    @property
+    def is_retry(self) -> bool:
+        """
+        Whether an earlier attempt of the job failed, found in the resource
+        history. Retries get what the rule asks for, not the estimates.
+        """
+        history = self.resource_history
+        if history is None:
+            return False
+        if self._is_retry is None:
+            ResourceHistoryError = optional_module("resource_history").ResourceHistoryError
+
+            try:
+                self._is_retry = history.is_retry(self.retry_key)
+            except ResourceHistoryError:
+                self._is_retry = False  # reported by the estimates
+        return self._is_retry
+
+    @property
+    def memory_estimate(self) -> Optional[int]:
+        """What earlier jobs of the rule used, if auto-sizing is enabled."""
+        history = self.resource_history
+        if (
+            history is not None
+            and self.auto_sizing == "memory"
+            and not self._memory_estimate_made
+            and not self.is_retry
+        ):
+            ResourceHistoryError = optional_module("resource_history").ResourceHistoryError
+
+            self._memory_estimate_made = True
+            try:
+                self._memory_estimate = history.estimate_memory(
+                    self.rule_name,
+                    self.input_bucket,
+                    CookieCutter.get_auto_sizing_percentile(),
+                    CookieCutter.get_auto_sizing_headroom(),
+                    CookieCutter.get_auto_sizing_min_samples(),
+                )
+            except ResourceHistoryError as error:
+                print(
+                    "Not auto-sizing, the resource history cannot be read: "
+                    "{error}".format(error=error),
+                    file=sys.stderr,
+                )
+        return self._memory_estimate
+
+    @property
+    def requested_mem_mb(self) -> Memory:
+        """The memory of the job, lowered to the auto-sized estimate."""
+        estimate = self.memory_estimate
+        if estimate is None or estimate >= self.mem_mb.to(Unit.MEGA).value:
+            return self.mem_mb
+        return Memory(estimate, unit=Unit.MEGA)
 
     @property
     def resources_cmd(self) -> str:
-        mem_in_cluster_units = self.mem_mb.to(self.memory_units)
-        if self.threads > 1:
-            res_cmd = "-pe threads {threads} ".format(threads=self.threads)
-            per_thread = round(mem_in_cluster_units.value / self.threads, 2)
-            per_thread = math.ceil(per_thread)
-        else:
-            res_cmd = ""
-            per_thread = math.ceil(mem_in_cluster_units.value)
-        res_cmd += "-l h_vmem={per_thread}G ".format(per_thread=per_thread)
-        res_cmd += "-l m_mem_free={per_thread}G".format(per_thread=per_thread)
-        if self.runtime:
-            hrs = self.runtime // 60
-            mins = runtime % 60
-            res_cmd += " -l h_rt={hours}:{min}:00".format(hours=hrs, mins=mins)
-        return res_cmd
+        return format_resources(
+            self.requested_mem_mb.to(self.memory_units),
+            self.threads,
+            self.requested_runtime,
+        )
 
     @property
     def wildcards(self) -> dict:
@@ -151,24 +331,42 @@ class Submitter:
             return self.job_properties.get("jobid", "").split("-")[0]
         return str(self.job_properties.get("jobid"))
 
+    @property
+    def log_layout(self) -> Optional["ShardedLogLayout"]:
+        if not CookieCutter.get_use_sharded_logs():
+            return None
+        if self._log_layout is None:
+            ShardedLogLayout = optional_module("log_layout").ShardedLogLayout
+            self._log_layout = ShardedLogLayout(
+                CookieCutter.get_log_dir(), CookieCutter.get_log_shard_width()
+            )
+        return self._log_layout
+
+    @property
+    def log_name(self) -> str:
+        if self.is_group_jobtype:
+            name = "groupid{groupid}_jobid{jobid}".format(
+                groupid=self.groupid, jobid=self.jobid)
+        else:
+            name = self.jobname
+        if self.log_layout is not None:
+            name += "." + self.log_layout.run_id(self.jobscript)
+        return name
+
     @property
     def logdir(self) -> Path:
+        if self.log_layout is not None:
+            return self.log_layout.directory(self.rule_name, self.log_name)
         project_logdir = CookieCutter.get_log_dir()
         return Path(project_logdir) / self.rule_name
 
     @property
     def outlog(self) -> Path:
-        if self.is_group_jobtype:
-            return self.logdir / "groupid{groupid}_jobid{jobid}.out".format(
-                groupid=self.groupid, jobid=self.jobid)
-        return self.logdir / "{jobname}.out".format(jobname=self.jobname)
+        return self.logdir / "{name}.out".format(name=self.log_name)
 
     @property
     def errlog(self) -> Path:
-        if self.is_group_jobtype:
-            return self.logdir / "groupid{groupid}_jobid{jobid}.err".format(
-                groupid=self.groupid, jobid=self.jobid)
-        return self.logdir / "{jobname}.err".format(jobname=self.jobname)
+        return self.logdir / "{name}.err".format(name=self.log_name)
 
     @property
     def jobinfo_cmd(self) -> str:
@@ -176,14 +374,42 @@ class Submitter:
             out_log=self.outlog, err_log=self.errlog, jobname=self.jobname
         )
 
+    @property
+    def jobinfo_args(self) -> List[str]:
+        return ["-o", str(self.outlog), "-e", str(self.errlog), "-N", self.jobname]
+
     @property
     def queue(self) -> str:
-        return self.cluster.get("queue", CookieCutter.get_default_queue())
+        if "queue" in self.cluster:
+            return self.cluster["queue"]
+        return self.routed_queue or CookieCutter.get_default_queue()
+
+    @property
+    def routed_queue(self) -> Optional[str]:
+        """
+        The first queue of ``__queues__`` in uge.yaml whose runtime limit
+        fits the runtime of the job, unless uge.yaml sets the queue of the
+        rule.
+        """
+        queue_limits = self.uge_config.queue_limits()
+        if not queue_limits or "-q" in self.uge_config.args_for_rule(self.rule_name):
+            return None
+        runtime = self.requested_runtime
+        if runtime is None:
+            return None
+        for queue, limit in queue_limits:
+            if runtime <= limit:
+                return queue
+        return None
 
     @property
     def queue_cmd(self) -> str:
         return "-q {}".format(self.queue) if self.queue else ""
 
+    @property
+    def queue_args(self) -> List[str]:
+        return ["-q", self.queue] if self.queue else []
+
     @property
     def rule_specific_params(self) -> str:
         return self.uge_config.params_for_rule(self.rule_name)
@@ -193,65 +419,483 @@ class Submitter:
         return self._cluster_cmd
 
     @property
-    def submit_cmd(self) -> str:
-        params = [
-            "qsub -cwd -V -sync y",
-            self.resources_cmd,
-            self.jobinfo_cmd,
-            self.queue_cmd,
-            self.cluster_cmd,
-            self.rule_specific_params,
-            self.jobscript,
+    def is_async(self) -> bool:
+        return CookieCutter.get_submission_mode() == "async"
+
+    @property
+    def qsub_flags(self) -> List[str]:
+        if self.is_async:
+            return ["-cwd", "-V"]
+        return ["-cwd", "-V", "-sync", "y"]
+
+    @property
+    def qsub_args(self) -> List[str]:
+        """
+        The qsub options as separate arguments, so qsub runs without a shell
+        and log paths and job names need no quoting.
+        """
+        return (
+            self.qsub_flags
+            # generated from numbers only, so splitting on spaces is safe
+            + self.resources_cmd.split()
+            + self.jobinfo_args
+            + self.queue_args
+            + self.dependency_args
+            + self._cluster_args
+            + self.uge_config.args_for_rule(self.rule_name)
+        )
+
+    @property
+    def submits_ahead(self) -> bool:
+        """
+        Whether snakemake submits the job before its parents have finished,
+        with ``--immediate-submit``, so UGE has to hold it until they have.
+        """
+        return self._dependencies is not None
+
+    @property
+    def jobid_map(self) -> "JobidMap":
+        if self._jobid_map is None:
+            JobidMap = optional_module("job_dependencies").JobidMap
+            self._jobid_map = JobidMap(CookieCutter.get_log_dir())
+        return self._jobid_map
+
+    @property
+    def parents(self) -> List[Tuple[str, str]]:
+        """The job ids and cluster logs of the parents of the job."""
+        DependencyError = optional_module("job_dependencies").DependencyError
+
+        if self._parents is None:
+            try:
+                self._parents = self.jobid_map.parents(self._dependencies or [])
+            except DependencyError as error:
+                raise QsubInvocationError(error)
+        return self._parents
+
+    @property
+    def dependency_args(self) -> List[str]:
+        if not self.submits_ahead or not self.parents:
+            return []
+        parent_jobs_variable = optional_module("job_dependencies").parent_jobs_variable
+
+        return [
+            "-hold_jid",
+            ",".join(self.jobid_map.hold_jids(self.parents)),
+            "-v",
+            parent_jobs_variable(self.parents),
         ]
-        return " ".join(p for p in params if p)
+
+    @property
+    def submit_cmd(self) -> List[str]:
+        return ["qsub"] + self.qsub_args + [str(self.jobscript)]
+
+    @property
+    def scheduler(self) -> SchedulerBackend:
+        if self._scheduler is None:
+            self._scheduler = get_backend(CookieCutter.get_scheduler_backend())
+        return self._scheduler
+
+    @property
+    def use_array_coalescing(self) -> bool:
+        # jobs held on their parents each have their own -hold_jid
+        return (
+            self.is_async
+            and not self.submits_ahead
+            and CookieCutter.get_use_array_coalescing()
+        )
+
+    @property
+    def coalescing_group(self) -> str:
+        """
+        Jobs are only coalesced into one array job if they would have been
+        submitted with the same qsub parameters.
+        """
+        return "\n".join(
+            (
+                self.resources_cmd,
+                self.queue_cmd,
+                self.cluster_cmd,
+                self.rule_specific_params,
+            )
+        )
+
+    def array_submit_cmd(self, tasks: int, array_jobscript: Path) -> List[str]:
+        # every task redirects its output to the cluster logs of its own job
+        jobinfo_args = ["-o", "/dev/null", "-e", "/dev/null"]
+        jobinfo_args += ["-N", "smk.{rule_name}.array".format(rule_name=self.rule_name)]
+        # the tasks are held until the spool has handed them out
+        return (
+            ["qsub"]
+            + self.qsub_flags
+            + ["-h", "-t", "1-{tasks}".format(tasks=tasks)]
+            + self.resources_cmd.split()
+            + jobinfo_args
+            + self.queue_args
+            + self._cluster_args
+            + self.uge_config.args_for_rule(self.rule_name)
+            + [str(array_jobscript)]
+        )
+
+    def _spool_and_get_external_job_id(self) -> str:
+        SpooledJob = optional_module("array_spool").SpooledJob
+        SpoolError = optional_module("array_spool").SpoolError
+        SubmitSpool = optional_module("array_spool").SubmitSpool
+
+        spool = SubmitSpool(
+            Path(CookieCutter.get_log_dir()) / ".submit_spool",
+            self.coalescing_group,
+            window=CookieCutter.get_array_coalescing_window(),
+            max_tasks=CookieCutter.get_array_coalescing_max_tasks(),
+        )
+        job = SpooledJob(
+            str(Path(self.jobscript).resolve()),
+            str(self.outlog.resolve()),
+            str(self.errlog.resolve()),
+        )
+        try:
+            return spool.submit(job, self.array_submit_cmd)
+        except SpoolError as error:
+            raise QsubInvocationError(error)
+
+    @property
+    def local_lane(self) -> Optional[dict]:
+        """
+        The local lane of uge.yaml if the job may run on the submit host:
+        its rule is listed for the lane, or earlier jobs of the rule took at
+        most ``max_runtime``, and it fits into the slots and memory a local
+        job may use. Jobs submitted ahead of time always go to the cluster,
+        where their children can be held on them.
+        """
+        if not self.is_async or self.is_group_jobtype or self.submits_ahead:
+            return None
+        local = self.uge_config.local()
+        if self.rule_name not in local["rules"]:
+            if local["max_runtime"] is None:
+                return None
+            runtime = self.estimated_runtime
+            if runtime is None or runtime > Config.runtime_minutes(local["max_runtime"]):
+                return None
+        if self.threads > int(local["max_threads"]):
+            return None
+        if self.requested_mem_mb.to(Unit.MEGA).value > float(local["max_mem_mb"]):
+            return None
+        return local
+
+    def _start_locally(self) -> Optional[str]:
+        """Starts the job on the submit host, unless the local lane is full."""
+        local = self.local_lane
+        if local is None:
+            return None
+        LocalLane = optional_module("local_lane").LocalLane
+        local_lane_directory = optional_module("local_lane").local_lane_directory
+
+        lane = LocalLane(local_lane_directory(CookieCutter.get_log_dir()).absolute())
+        return lane.start(
+            self.jobscript, self.outlog, self.errlog, int(local["max_jobs"])
+        )
+
+    @property
+    def pilot(self) -> Optional[dict]:
+        """
+        The pilot workers of uge.yaml if they run the job instead of a job
+        of its own: its rule is listed for them and it fits into the slots
+        and memory of a worker.
+        """
+        if not self.is_async or self.is_group_jobtype or self.submits_ahead:
+            return None
+        pilot = self.uge_config.pilot()
+        if self.rule_name not in pilot["rules"]:
+            return None
+        if self.threads > int(pilot["threads"]):
+            return None
+        if self.requested_mem_mb.to(Unit.MEGA).value > float(pilot["mem_mb"]):
+            return None
+        runtime = self.requested_runtime
+        if (
+            runtime is not None
+            and pilot["runtime"] is not None
+            and runtime > Config.runtime_minutes(pilot["runtime"])
+        ):
+            return None
+        return pilot
+
+    @property
+    def run_state(self) -> Optional["RunState"]:
+        if not self.is_async or not CookieCutter.get_use_run_state():
+            return None
+        if self._run_state is None:
+            RunState = optional_module("run_state").RunState
+            self._run_state = RunState(CookieCutter.get_log_dir())
+        return self._run_state
+
+    @property
+    def fingerprint(self) -> str:
+        job_fingerprint = optional_module("run_state").job_fingerprint
+
+        return job_fingerprint(self.job_properties)
+
+    def _reattach(self) -> Optional[str]:
+        """
+        Returns the parameters to the status script of the same job
+        submitted by an earlier run of the workflow if it is still queued or
+        running, so a restarted workflow picks it up instead of submitting
+        it again. Jobs submitted ahead of time are held on the jobs of this
+        run and are always submitted.
+        """
+        run_state = self.run_state
+        if run_state is None or self.submits_ahead:
+            return None
+        RunStateError = optional_module("run_state").RunStateError
+
+        try:
+            job = run_state.in_flight(self.fingerprint)
+            if job is None or not self._is_in_flight(job["jobid"], job["outlog"]):
+                return None
+            run_state.record_reattachment(job["jobid"], self.jobid)
+        except RunStateError as error:
+            print(
+                "Cannot look up the job in the run state: {error}".format(error=error),
+                file=sys.stderr,
+            )
+            return None
+        return "{jobid} {outlog}".format(jobid=job["jobid"], outlog=job["outlog"])
+
+    def _is_in_flight(self, jobid: str, outlog: str) -> bool:
+        JobSentinel = optional_module("job_sentinel").JobSentinel
+        LOCAL_JOBID_PREFIX = optional_module("local_lane").JOBID_PREFIX
+        LocalLane = optional_module("local_lane").LocalLane
+        local_lane_directory = optional_module("local_lane").local_lane_directory
+        JOBID_PREFIX = optional_module("pilot").JOBID_PREFIX
+
+        if JobSentinel(outlog).exit_status(jobid) is not None:
+            return False
+        if jobid.startswith(LOCAL_JOBID_PREFIX):
+            lane = LocalLane(local_lane_directory(CookieCutter.get_log_dir()))
+            return lane.is_running(jobid[len(LOCAL_JOBID_PREFIX):])
+        if jobid.startswith(JOBID_PREFIX):
+            return self.pilot_queue.status(jobid[len(JOBID_PREFIX):]) == "running"
+        state = self.scheduler.job_state(jobid)
+        if state is not None:
+            return state != SchedulerBackend.FINISHED
+        returncode, _, _ = OSLayer.run_process(["qstat", "-j", jobid.partition(".")[0]])
+        return returncode == 0
+
+    @property
+    def pilot_queue(self) -> "PilotQueue":
+        if self._pilot_queue is None:
+            PilotQueue = optional_module("pilot").PilotQueue
+            pilot_directory = optional_module("pilot").pilot_directory
+            self._pilot_queue = PilotQueue(
+                pilot_directory(CookieCutter.get_log_dir()).absolute()
+            )
+        return self._pilot_queue
+
+    def pilot_worker_args(self, pilot: dict) -> List[str]:
+        """The qsub options of a worker, which runs pilot.py as a binary."""
+        DIRECTORY_VARIABLE = optional_module("pilot").DIRECTORY_VARIABLE
+        IDLE_TIMEOUT_VARIABLE = optional_module("pilot").IDLE_TIMEOUT_VARIABLE
+        RUNTIME_VARIABLE = optional_module("pilot").RUNTIME_VARIABLE
+        PilotQueue = optional_module("pilot").PilotQueue
+
+        queue = self.pilot_queue
+        runtime = pilot.get("runtime")
+        if runtime is not None:
+            runtime = math.ceil(Config.runtime_minutes(runtime))
+        args = shlex.split(Config.concatenate_params(pilot["args"]))
+        queue_args = []
+        if "-q" not in args and CookieCutter.get_default_queue():
+            queue_args = ["-q", CookieCutter.get_default_queue()]
+        environment = "{directory}={path},{idle_timeout}={seconds}".format(
+            directory=DIRECTORY_VARIABLE,
+            path=queue.directory,
+            idle_timeout=IDLE_TIMEOUT_VARIABLE,
+            seconds=pilot["idle_timeout"],
+        )
+        if runtime is not None:
+            # workers only take tasks that end before their h_rt
+            environment += ",{variable}={seconds}".format(
+                variable=RUNTIME_VARIABLE, seconds=runtime * 60
+            )
+        memory = Memory(float(pilot["mem_mb"]), unit=Unit.MEGA).to(self.memory_units)
+        return (
+            ["-cwd", "-V", "-b", "y", "-j", "y", "-N", "smk.pilot"]
+            + ["-o", str(queue.path(PilotQueue.LOGS)), "-v", environment]
+            + format_resources(memory, int(pilot["threads"]), runtime).split()
+            + queue_args
+            + args
+        )
+
+    def _enqueue_for_pilot(self, pilot: dict) -> str:
+        JOBID_PREFIX = optional_module("pilot").JOBID_PREFIX
+
+        queue = self.pilot_queue
+        runtime = self.requested_runtime
+        if runtime is not None:
+            runtime *= 60
+        task_id = queue.enqueue(self.jobscript, self.outlog, self.errlog, runtime)
+        worker_script = str(Path(__file__).parent.absolute() / "pilot.py")
+        try:
+            queue.ensure_workers(
+                int(pilot["workers"]),
+                lambda: self.scheduler.submit(self.pilot_worker_args(pilot), worker_script),
+                runtime,
+            )
+        except SchedulerError as error:
+            queue.cancel(task_id)
+            raise QsubInvocationError(error)
+        return JOBID_PREFIX + task_id
 
     def _create_logdir(self):
-        OSLayer.mkdir(self.logdir)
+        if self.log_layout is not None:
+            self.log_layout.prepare(self.logdir)
+        else:
+            OSLayer.mkdir(self.logdir)
 
     def _remove_previous_logs(self):
+        if self.log_layout is not None:
+            # the logs of earlier runs have other names and are swept later
+            self.log_layout.start_sweep(self.jobscript)
+            return
         OSLayer.remove_file(self.outlog)
         OSLayer.remove_file(self.errlog)
 
-    def _submit_cmd_and_get_external_job_id(self) -> int:
+    def _submit_cmd_and_get_external_job_id(self) -> Union[int, str]:
+        if self.is_async:
+            try:
+                return self.scheduler.submit(self.qsub_args, str(self.jobscript))
+            except SchedulerError as error:
+                raise QsubInvocationError(error)
+        # with -sync y the exit code is the one of the job, not of qsub
         returncode, output_stream, error_stream = OSLayer.run_process(self.submit_cmd)
         match = re.search(r"Your job (\d+) .*", output_stream)
         jobid = match.group(1)
         return int(jobid)
 
-    def _get_parameters_to_status_script(self, external_job_id: int) -> str:
+    def _record_submission(self, external_job_id: Union[int, str]):
+        history = self.resource_history
+        if history is None:
+            return
+        ResourceHistoryError = optional_module("resource_history").ResourceHistoryError
+
+        try:
+            history.record_submission(
+                external_job_id,
+                self.rule_name,
+                self.input_bucket,
+                self.retry_key,
+                self.requested_mem_mb.to(Unit.MEGA).value,
+            )
+        except ResourceHistoryError as error:
+            print(
+                "Cannot add job {jobid} to the resource history: {error}".format(
+                    jobid=external_job_id, error=error
+                ),
+                file=sys.stderr,
+            )
+
+    def _record_run_state(self, external_job_id: Union[int, str]):
+        run_state = self.run_state
+        if run_state is None:
+            return
+        RunStateError = optional_module("run_state").RunStateError
+
+        try:
+            run_state.record_submission(
+                external_job_id,
+                self.jobid,
+                self.fingerprint,
+                self.outlog,
+                self.resources_cmd,
+            )
+        except RunStateError as error:
+            print(
+                "Cannot add job {jobid} to the run state: {error}".format(
+                    jobid=external_job_id, error=error
+                ),
+                file=sys.stderr,
+            )
+
+    def _submit_to_cluster(self) -> Union[int, str]:
+        pilot = self.pilot
+        if pilot is not None:
+            # the usage of a worker is not the one of the job, so the job is
+            # not added to the resource history
+            return self._enqueue_for_pilot(pilot)
+        if self.use_array_coalescing:
+            external_job_id = self._spool_and_get_external_job_id()
+        else:
+            external_job_id = self._submit_cmd_and_get_external_job_id()
+        self._record_submission(external_job_id)
+        if self.submits_ahead:
+            self._record_dependencies(external_job_id)
+        return external_job_id
+
+    def _record_dependencies(self, external_job_id: Union[int, str]):
+        DependencyError = optional_module("job_dependencies").DependencyError
+
+        try:
+            self.jobid_map.record(external_job_id, self.outlog, self.parents)
+        except DependencyError as error:
+            raise QsubInvocationError(error)
+
+    def _get_parameters_to_status_script(
+        self, external_job_id: Union[int, str]
+    ) -> str:
         return "{external_job_id} {outlog}".format(
             external_job_id=external_job_id, outlog=self.outlog
         )
 
-    def submit(self):
+    def submit_job(self) -> str:
+        """
+        Submits the job and returns the parameters snakemake passes on to the
+        status script.
+        """
+        parameters_to_status_script = self._reattach()
+        if parameters_to_status_script is not None:
+            return parameters_to_status_script
         self._create_logdir()
         self._remove_previous_logs()
         try:
-            external_job_id = self._submit_cmd_and_get_external_job_id()
-            parameters_to_status_script = self._get_parameters_to_status_script(
-                external_job_id
-            )
-            #OSLayer.print(parameters_to_status_script)
+            external_job_id = self._start_locally()
+            if external_job_id is None:
+                external_job_id = self._submit_to_cluster()
+            self._record_run_state(external_job_id)
+            return self._get_parameters_to_status_script(external_job_id)
         except subprocess.CalledProcessError as error:
             raise QsubInvocationError(error)
         except AttributeError as error:
             raise JobidNotFoundError(error)
 
+    def submit(self):
+        parameters_to_status_script = self.submit_job()
+        if self.is_async:
+            OSLayer.print(parameters_to_status_script)
+
 
 if __name__ == "__main__":
+    if CookieCutter.get_use_scheduler_metrics():
+        from metrics import install_metrics
+
+        install_metrics(CookieCutter.get_log_dir())
+    if CookieCutter.get_use_rate_limiter():
+        from rate_limit import install_rate_limiter
+
+        install_rate_limiter(CookieCutter.get_rate_limits())
     workdir = Path().resolve()
     config_file = workdir / "uge.yaml"
     if config_file.exists():
-        with config_file.open() as stream:
-            uge_config = Config.from_stream(stream)
+        uge_config = Config.from_file(
+            config_file, cache_path=Path(CookieCutter.get_log_dir()) / ".uge.yaml.cache"
+        )
     else:
         uge_config = Config()
 
     jobscript = sys.argv[-1]
-    cluster_cmds = sys.argv[1:-1]
+    cluster_cmds, dependencies = split_arguments(sys.argv[1:-1])
     uge_submit = Submitter(
         jobscript=jobscript,
         uge_config=uge_config,
         cluster_cmds=cluster_cmds,
+        dependencies=dependencies,
     )
     uge_submit.submit()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+import asyncio
+import fcntl
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from OSLayer import OSLayer
+    from CookieCutter import CookieCutter
+    from uge_config import Config
+    from uge_submit import Submitter, split_arguments
+    from uge_submit_client import broker_socket_path
+    from metrics import install_metrics
+    from rate_limit import install_rate_limiter
+    from scheduler_backend import keep_sessions
+else:
+    from .OSLayer import OSLayer
+    from .CookieCutter import CookieCutter
+    from .uge_config import Config
+    from .uge_submit import Submitter, split_arguments
+    from .uge_submit_client import broker_socket_path
+    from .metrics import install_metrics
+    from .rate_limit import install_rate_limiter
+    from .scheduler_backend import keep_sessions
+
+
+class SubmitBroker:
+    """
+    Long-lived submit process for one workflow run.
+
+    Keeps the interpreter, snakemake, the profile modules and the parsed
+    ``uge.yaml`` loaded and submits the jobs that ``uge_submit_client.py``
+    hands over its socket, running at most ``workers`` qsub calls at a time.
+    ``uge.yaml`` is read again when it changes, through the parsed config
+    cached at ``config_cache`` if given. Stops after ``idle_timeout`` seconds
+    without requests.
+
+    The jobs are submitted with the environment of the broker, which is the
+    one of the client that started it: clients with another environment
+    connect to another broker (see ``broker_socket_path``).
+    """
+
+    IDLE_CHECK_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        socket_path: Path,
+        workers: int,
+        idle_timeout: float,
+        config_file: Path = Path("uge.yaml"),
+        config_cache: Optional[Path] = None,
+    ):
+        self._socket_path = Path(socket_path)
+        self._idle_timeout = idle_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._config_file = Path(config_file)
+        self._config_cache = config_cache
+        self._config = Config()
+        self._config_mtime = None  # type: Optional[float]
+        self._workdir = os.getcwd()
+        self._active_requests = 0
+        self._last_request = time.monotonic()
+
+    @property
+    def uge_config(self) -> Config:
+        try:
+            mtime = self._config_file.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._config_mtime:
+            if mtime is None:
+                self._config = Config()
+            else:
+                self._config = Config.from_file(
+                    self._config_file, cache_path=self._config_cache
+                )
+            self._config_mtime = mtime
+        return self._config
+
+    async def serve(self):
+        server = await asyncio.start_unix_server(
+            self._handle_client, path=str(self._socket_path)
+        )
+        try:
+            await self._serve_until_idle()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if self._socket_path.exists():
+                self._socket_path.unlink()
+            self._executor.shutdown()
+
+    def submit(self, argv: List[str]) -> dict:
+        """
+        Submits a job as ``uge_submit.py`` would with the given arguments and
+        returns what it would have exited and printed with.
+        """
+        try:
+            cluster_cmds, dependencies = split_arguments(argv[:-1])
+            submitter = Submitter(
+                jobscript=argv[-1],
+                cluster_cmds=cluster_cmds,
+                uge_config=self.uge_config,
+                dependencies=dependencies,
+            )
+            parameters_to_status_script = submitter.submit_job()
+        except Exception:
+            return dict(returncode=1, stdout="", stderr=traceback.format_exc())
+        return dict(returncode=0, stdout=parameters_to_status_script + "\n", stderr="")
+
+    async def _serve_until_idle(self):
+        while (
+            self._active_requests
+            or time.monotonic() - self._last_request < self._idle_timeout
+        ):
+            await asyncio.sleep(self.IDLE_CHECK_INTERVAL)
+            if OSLayer.metrics is not None:
+                OSLayer.metrics.flush()
+
+    async def _handle_client(self, reader, writer):
+        self._active_requests += 1
+        try:
+            request = json.loads((await reader.readline()).decode())
+            argv = [str(arg) for arg in request["argv"]]
+            if request["cwd"] != self._workdir or not argv:
+                raise ValueError("request for another working directory")
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self._executor, self.submit, argv)
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+        except (ValueError, KeyError, TypeError, ConnectionError):
+            pass
+        finally:
+            self._active_requests -= 1
+            self._last_request = time.monotonic()
+            writer.close()
+
+
+def main():
+    keep_sessions()
+    if CookieCutter.get_use_scheduler_metrics():
+        install_metrics(CookieCutter.get_log_dir())
+    if CookieCutter.get_use_rate_limiter():
+        install_rate_limiter(CookieCutter.get_rate_limits())
+    socket_path = broker_socket_path(
+        os.getcwd(), CookieCutter.get_log_dir(), os.environ
+    )
+    lock_path = socket_path.with_suffix(".lock")
+    with lock_path.open("a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another broker is already running for this workflow
+        if socket_path.exists():
+            socket_path.unlink()
+        broker = SubmitBroker(
+            socket_path,
+            workers=CookieCutter.get_submit_broker_workers(),
+            idle_timeout=CookieCutter.get_submit_broker_idle_timeout(),
+            config_cache=Path(CookieCutter.get_log_dir()) / ".uge.yaml.cache",
+        )
+        asyncio.run(broker.serve())
+
+
+if __name__ == "__main__":
+    main()
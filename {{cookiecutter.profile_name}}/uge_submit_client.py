@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Submit command used with ``use_submit_broker``. It only depends on the
+standard library, hands the job to the submit broker of the workflow and
+prints the broker's answer, so submitting a job costs one connect instead of
+an interpreter start with snakemake, yaml and the profile modules. The
+broker is started on first use; if it cannot be reached, the job is
+submitted by ``uge_submit.py`` as without the broker.
+"""
+import hashlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Mapping
+
+if not __name__.startswith("tests.src."):
+    sys.path.append(str(Path(__file__).parent.absolute()))
+    from CookieCutter import CookieCutter
+else:
+    from .CookieCutter import CookieCutter
+
+# qsub can take long on a busy qmaster, and the rate limiter can hold it back
+SUBMIT_BROKER_TIMEOUT = 600
+SUBMIT_BROKER_START_TIMEOUT = 10
+
+
+class BrokerUnavailable(Exception):
+    pass
+
+
+def broker_socket_path(
+    workdir: str, log_dir: str, environment: Mapping[str, str]
+) -> Path:
+    """
+    The broker reads ``uge.yaml`` from the working directory, and ``qsub -V``
+    hands the environment of the broker to every job it submits, so there is
+    one broker per working directory, log directory and environment.
+    """
+    key = "{workdir}\n{log_dir}\n{environment}".format(
+        workdir=Path(workdir).resolve(),
+        log_dir=Path(workdir, log_dir).resolve(),
+        environment=json.dumps(sorted(environment.items())),
+    )
+    digest = hashlib.md5(key.encode()).hexdigest()[:12]
+    return Path(tempfile.gettempdir()) / "uge-submit-{uid}-{digest}.sock".format(
+        uid=os.getuid(), digest=digest
+    )
+
+
+def submit_via_broker(
+    socket_path: Path, argv: List[str], timeout: float = SUBMIT_BROKER_TIMEOUT
+) -> dict:
+    """
+    Sends the submit arguments to the broker and returns its response with
+    the ``returncode``, ``stdout`` and ``stderr`` of the submission. Raises
+    BrokerUnavailable if the broker cannot be connected to; once the request
+    is sent, failures are reported as a failed submission, as the job may
+    have been submitted.
+    """
+    request = (json.dumps(dict(cwd=os.getcwd(), argv=argv)) + "\n").encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        try:
+            client.connect(str(socket_path))
+        except OSError as error:
+            raise BrokerUnavailable(error)
+        try:
+            client.sendall(request)
+            response = b""
+            while not response.endswith(b"\n"):
+                chunk = client.recv(4096)
+                if not chunk:
+                    break
+                response += chunk
+            return json.loads(response.decode())
+        except (OSError, ValueError) as error:
+            return dict(
+                returncode=1,
+                stdout="",
+                stderr="submit broker failed: {error}\n".format(error=error),
+            )
+
+
+def start_submit_broker():
+    # the broker inherits the environment the socket path was derived from
+    broker_script = Path(__file__).parent.absolute() / "uge_submit_broker.py"
+    subprocess.Popen(
+        [sys.executable, str(broker_script)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def submit_or_start_broker(socket_path: Path, argv: List[str]) -> dict:
+    try:
+        return submit_via_broker(socket_path, argv)
+    except BrokerUnavailable:
+        start_submit_broker()
+    deadline = time.monotonic() + SUBMIT_BROKER_START_TIMEOUT
+    while True:
+        time.sleep(0.05)
+        try:
+            return submit_via_broker(socket_path, argv)
+        except BrokerUnavailable:
+            if time.monotonic() > deadline:
+                raise
+
+
+def submit_without_broker(argv: List[str]):
+    submit_script = Path(__file__).parent.absolute() / "uge_submit.py"
+    os.execv(sys.executable, [sys.executable, str(submit_script)] + argv)
+
+
+def main(argv: List[str]) -> int:
+    if CookieCutter.get_submission_mode() != "async":
+        # with qsub -sync y a submission lasts as long as the job
+        return submit_without_broker(argv)
+    socket_path = broker_socket_path(
+        os.getcwd(), CookieCutter.get_log_dir(), os.environ
+    )
+    try:
+        response = submit_or_start_broker(socket_path, argv)
+    except BrokerUnavailable:
+        return submit_without_broker(argv)
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    return response["returncode"]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))